@@ -0,0 +1,110 @@
+'''Streaming aggregation of the cumulative reward curves over the repetitions'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from numpy import append, arange, array, int32, percentile, sign, sqrt, tile, unique, where, zeros
+
+EXACT = 50 # Repetitions whose quantiles are computed on the stored curves, P-square beyond
+
+
+def sampled_rounds(horizon, stride):
+    '''Rounds kept by the aggregation: one every stride rounds, plus the last one.'''
+    return unique(append(arange(0, horizon, stride), horizon - 1))
+
+
+class P2Quantile:
+    '''P-square sketch (Jain and Chlamtac, 1985) of the p-quantile of every column of a stream of vectors.
+    Five markers per column, whatever the stream length.'''
+
+    def __init__(self, p, size):
+        self.p = p
+        self._count = 0
+        self._q = zeros((size, 5)) # Markers heights
+        self._n = tile(arange(5, dtype = int32), (size, 1)) # Markers positions
+        self._desired = array([0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0])
+        self._increment = array([0.0, p / 2, p, (1 + p) / 2, 1.0])
+
+    def push(self, x):
+        # First observations stored as they are
+        if self._count < 5:
+            self._q[:, self._count] = x
+            self._count += 1
+            if self._count == 5:
+                self._q.sort(axis = 1)
+            return
+        self._count += 1
+        q, n = self._q, self._n
+
+        # Extremes update and cell of each observation
+        lower = x < q[:, 0]
+        q[lower, 0] = x[lower]
+        upper = x > q[:, 4]
+        q[upper, 4] = x[upper]
+        cell = (x[:, None] >= q[:, 1:4]).sum(axis = 1)
+        n[:, 1:] += arange(1, 5)[None, :] > cell[:, None]
+        self._desired += self._increment
+
+        # Markers adjustment: parabolic prediction, linear when it breaks the ordering
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[:, i]
+            move = ((d >= 1) & (n[:, i + 1] - n[:, i] > 1)) | ((d <= -1) & (n[:, i - 1] - n[:, i] < -1))
+            if not move.any():
+                continue
+            s = sign(d[move]).astype(int32)
+            qi, qr, ql = q[move, i], q[move, i + 1], q[move, i - 1]
+            ni, nr, nl = n[move, i], n[move, i + 1], n[move, i - 1]
+            parabolic = qi + s / (nr - nl) * ((ni - nl + s) * (qr - qi) / (nr - ni) + (nr - ni - s) * (qi - ql) / (ni - nl))
+            linear = qi + s * (where(s > 0, qr, ql) - qi) / (where(s > 0, nr, nl) - ni)
+            q[move, i] = where((ql < parabolic) & (parabolic < qr), parabolic, linear)
+            n[move, i] += s
+
+    def value(self):
+        if self._count <= 5: # Exact on the few stored observations, sorted at 5
+            return percentile(self._q[:, :self._count], 100 * self.p, axis = 1)
+        return self._q[:, 2].copy()
+
+
+class Aggregator:
+    '''Running mean/std (Welford) and quantiles of cumulative reward curves sampled every stride rounds.
+    The quantiles are exact over the first EXACT curves, kept as they are: five P-square markers estimate the tails
+    poorly from a few tens of observations. Beyond, the stored curves seed the sketches and are released.
+    Memory is O(EXACT * horizon / stride) whatever the number of pushed repetitions.'''
+
+    def __init__(self, horizon, stride = 1, quantiles = (0.05, 0.95)):
+        self.rounds = sampled_rounds(horizon, stride)
+        self.count = 0
+        self._mean = zeros(len(self.rounds))
+        self._m2 = zeros(len(self.rounds))
+        self._levels = tuple(quantiles)
+        self._sketches = [P2Quantile(p, len(self.rounds)) for p in quantiles]
+        self._exact = [] # First curves, until EXACT of them
+
+    def push(self, curve):
+        '''Adds the cumulative reward curve of a repetition, sampled at self.rounds.'''
+        assert len(curve) == len(self.rounds), "Aggregator.py, push(): curve not sampled at the aggregation rounds"
+        self.count += 1
+        delta = curve - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (curve - self._mean)
+        if self._exact is not None:
+            self._exact.append(array(curve)) # Copy, the curve may be a view
+            if len(self._exact) <= EXACT:
+                return
+            stored, self._exact = self._exact, None
+        else:
+            stored = [curve]
+        for sketch in self._sketches:
+            for x in stored:
+                sketch.push(x)
+
+    def mean(self):
+        return self._mean.copy()
+
+    def std(self):
+        return sqrt(self._m2 / max(self.count, 1))
+
+    def quantiles(self):
+        if self._exact is not None:
+            return dict((p, percentile(self._exact, 100 * p, axis = 0)) for p in self._levels)
+        return dict((sketch.p, sketch.value()) for sketch in self._sketches)
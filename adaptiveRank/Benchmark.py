@@ -0,0 +1,189 @@
+'''Throughput and memory benchmarks of the simulator, stored as JSON and compared with a previous run'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+import json
+import platform
+import resource
+import time
+from copy import deepcopy
+
+import numpy as np
+from adaptiveRank.Experiment import configuration
+from adaptiveRank.policies import REGISTRY, register
+from adaptiveRank.Task import make_environment, make_policy
+from adaptiveRank.tools.io import c_print
+from adaptiveRank.tools.kernels import NUMBA
+from adaptiveRank.version import VERSION
+
+POLICIES = ['RStar', 'Ghost', 'UCB', 'Greedy', 'FPO_UCB', 'ORE2']
+BASE = {'T': 100000, 'k': 8, 'fra_top': 0.2, 'max_delay': 6, 'tau': 7, 'n_rep': 1}
+# Values taken by each parameter, the others staying at BASE: one scaling curve per parameter
+SCALE = {'k': [4, 16], 'fra_top': [0.5], 'max_delay': [3, 12], 'tau': [4, 10], 'T': [1000000], 'n_rep': [4]}
+# Names MAB.play() treats specially: RStar is the Ghost benchmark, the Ghost class finds the rank by itself
+NAMES = {'RStar': 'Ghost', 'Ghost': 'Ghost RR', 'FPO_UCB': 'PI ucb', 'ORE2': 'PI Low'}
+MICRO_SECONDS = 0.2 # Shortest timed loop of a micro-benchmark
+
+
+def _environment(name, config):
+    return make_environment(NAMES.get(name, name), config, recordChoices = False)
+
+def _peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0 # kB on Linux
+
+
+def cases(policies = POLICIES, base = BASE, scale = SCALE):
+    '''(name, policy, parameters) of the play benchmarks: the base point, then every parameter over its scale.'''
+    points = [dict(base)]
+    for key in sorted(scale):
+        for value in scale[key]:
+            point = dict(base)
+            point[key] = value
+            if key == 'max_delay': # Sampling delay past the memory, as by default
+                point['tau'] = value + 1
+            points.append(point)
+    named = []
+    for policy in policies:
+        for point in points:
+            label = "play/{}/k{}_ft{}_d{}_tau{}_T{}_rep{}".format(policy, point['k'], point['fra_top'], point['max_delay'], point['tau'], point['T'], point['n_rep'])
+            if label not in [case[0] for case in named]:
+                named.append((label, policy, point))
+    return named
+
+
+def play_case(policy, params, path = None):
+    '''MAB.play() of the n_rep repetitions of the case, one after the other. Run in a fresh process:
+    the peak resident memory is the one of the case only. path is the registry entry of policy, which
+    a spawned process does not inherit when it was registered at run time.'''
+    if path is not None:
+        register(policy, path)
+    config = configuration(**params)
+    environment, template = _environment(policy, config), make_policy(policy, config)
+    before = _peak_mb()
+    start = time.perf_counter()
+    for rep in range(config['n_rep']):
+        environment.play(deepcopy(template), config['T'], rep)
+    seconds = time.perf_counter() - start
+    pulls = config['T'] * config['n_rep']
+    return {'pulls': pulls, 'seconds': seconds, 'pulls_per_s': pulls / seconds, 'peak_mb': _peak_mb(), 'grown_mb': _peak_mb() - before}
+
+
+def _timed(call):
+    # Best of 3 loops lasting at least MICRO_SECONDS each
+    n = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(n):
+            call()
+        if time.perf_counter() - start >= MICRO_SECONDS:
+            break
+        n *= 4
+    best = min(_loop(call, n) for _ in range(3))
+    return {'calls': n, 'seconds': best, 'calls_per_s': n / best}
+
+def _loop(call, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        call()
+    return time.perf_counter() - start
+
+def _played(name, params, horizon):
+    # Policy and environment after horizon rounds, in the state the decision helpers are called from
+    config = configuration(**params)
+    environment, policy = _environment(name, config), make_policy(name, config)
+    environment.play(policy, horizon, 0)
+    return environment, policy
+
+def micro_cases(base = BASE):
+    '''(name, setup) of the micro-benchmarks: setup() returns the call to time.'''
+    def bernoulli():
+        from adaptiveRank.arm.Bernoulli import Bernoulli
+        from adaptiveRank.tools.streams import Stream
+        arm, stream = Bernoulli(0.8, 0.999, 1, base['max_delay'], False), Stream(0, 0, 0)
+        return lambda: arm.draw(3, stream)
+
+    def bank():
+        environment = _environment('UCB', configuration(**base))
+        environment._arm_creation(0)
+        rng, indexes = np.random.default_rng(0), np.arange(len(environment.arms))
+        delays = np.full(len(indexes), 3)
+        return lambda: environment.arms.draw(indexes, delays, rng)
+
+    def states():
+        environment, _ = _played('UCB', base, 1000)
+        return lambda: environment.compute_states(1000)
+
+    def helper(name, method, stage = 0, horizon = 20000):
+        def setup():
+            params = dict(base, stage = stage)
+            _, policy = _played(name, params, horizon)
+            function = getattr(policy, method)
+            if method == '_bucketing':
+                return lambda: function(list(policy._activeArms))
+            return function
+        return setup
+
+    return [('micro/Bernoulli.draw', bernoulli), ('micro/ArmBank.draw', bank), ('micro/MAB.compute_states', states),
+            ('micro/FPO_UCB._bucketing', helper('FPO_UCB', '_bucketing')), ('micro/FPO_UCB._samplingRequired', helper('FPO_UCB', '_samplingRequired')),
+            ('micro/FPO_UCB._maxrank', helper('FPO_UCB', '_maxrank', stage = 2)),
+            ('micro/ORE2._bucketing', helper('ORE2', '_bucketing')), ('micro/ORE2._samplingRequired', helper('ORE2', '_samplingRequired'))]
+
+
+def run(policies = POLICIES, base = BASE, scale = SCALE, micro = True):
+    '''Report of the benchmarks: machine description and one entry per case. Every play case runs in its own
+    spawned process, failures are recorded instead of stopping the suite.'''
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    report = {'version': VERSION, 'python': platform.python_version(), 'numpy': np.__version__, 'numba': NUMBA,
+            'machine': platform.machine(), 'processor': platform.processor(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'cases': {}}
+    context = get_context('spawn')
+    for label, policy, params in cases(policies, base, scale):
+        try:
+            with ProcessPoolExecutor(1, mp_context = context) as pool:
+                entry = pool.submit(play_case, policy, params, REGISTRY.get(policy)).result()
+        except Exception as e: # e.g. a policy not supporting the parameters
+            entry = {'error': "{}: {}".format(type(e).__name__, e)}
+        entry['params'] = params
+        report['cases'][label] = entry
+        c_print(5, "BENCH: {} {}", label, _describe(entry))
+    if micro:
+        for label, setup in micro_cases(base):
+            try:
+                entry = _timed(setup())
+            except Exception as e:
+                entry = {'error': "{}: {}".format(type(e).__name__, e)}
+            report['cases'][label] = entry
+            c_print(5, "BENCH: {} {}", label, _describe(entry))
+    return report
+
+def _describe(entry):
+    if 'error' in entry:
+        return "failed ({})".format(entry['error'])
+    if 'pulls_per_s' in entry:
+        return "{:.0f} pulls/s, peak {:.1f} MB".format(entry['pulls_per_s'], entry['peak_mb'])
+    return "{:.0f} calls/s".format(entry['calls_per_s'])
+
+def rate(entry):
+    return entry.get('pulls_per_s', entry.get('calls_per_s'))
+
+
+def regressions(report, baseline, threshold = 0.1):
+    '''(case, old rate, new rate) of the cases of both reports whose throughput dropped by more than threshold.'''
+    slower = []
+    for label, entry in sorted(report['cases'].items()):
+        old = baseline['cases'].get(label)
+        if old is None or rate(old) is None or rate(entry) is None:
+            continue
+        if rate(entry) < (1.0 - threshold) * rate(old):
+            slower.append((label, rate(old), rate(entry)))
+    return slower
+
+def save(path, report):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent = 1, sort_keys = True)
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,66 @@
+'''Periodic snapshots of a repetition being played, to resume it after a crash'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+import json
+import os
+import pickle
+import time
+from hashlib import sha256
+from adaptiveRank.tools.io import c_print
+
+CHECK_ROUNDS = 1 << 16 # Rounds between two looks at the clock
+OVERHEAD = 0.01 # Largest fraction of the running time spent writing snapshots
+
+
+class Checkpoint:
+    '''Snapshot file of a single repetition in directory, named after its identity (everything the outcome of the
+    run depends on), which is checked again on loading. due(t) is an integer comparison, the clock is read every CHECK_ROUNDS
+    rounds and a snapshot is written once interval seconds have passed since the previous one. The interval grows
+    when needed to keep the writing time within OVERHEAD.'''
+
+    def __init__(self, directory, identity, interval = 60.0):
+        self.identity = sha256(json.dumps(identity, sort_keys = True, default = repr).encode()).hexdigest()
+        self.path = os.path.join(directory, self.identity[:24] + '.ckpt')
+        os.makedirs(directory, exist_ok = True)
+        self.interval = interval
+        self._next = CHECK_ROUNDS
+        self._last = time.monotonic()
+
+    def due(self, t):
+        if t < self._next:
+            return False
+        self._next = t + CHECK_ROUNDS
+        return time.monotonic() - self._last >= self.interval
+
+    def save(self, state):
+        # Written aside and renamed, a crash while writing leaves the previous snapshot
+        start = time.monotonic()
+        tmp = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump((self.identity, state), f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        self._last = time.monotonic()
+        self.interval = max(self.interval, (self._last - start) / OVERHEAD)
+        c_print(2, "CHECKPOINT: round {} stored in {}", state['t'], self.path)
+
+    def remove(self):
+        '''Drops the snapshot of a completed run.'''
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def load(self):
+        '''State of the last snapshot of this run, None if there is none.'''
+        try:
+            with open(self.path, 'rb') as f:
+                identity, state = pickle.load(f)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+        if identity != self.identity:
+            c_print(4, "CHECKPOINT: {} belongs to another run, ignored", self.path)
+            return None
+        c_print(4, "CHECKPOINT: resuming from round {} of {}", state['t'], self.path)
+        return state
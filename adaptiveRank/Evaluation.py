@@ -4,20 +4,106 @@ __author__ = "Leonardo Cella"
 __version__ = "0.1"
 
 import numpy as np
-from adaptiveRank.tools.io import c_print
-from joblib import Parallel, delayed
+from copy import deepcopy
+from numpy.lib.format import open_memmap
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp
+from adaptiveRank.Aggregator import Aggregator, sampled_rounds
+from adaptiveRank.Scheduler import Scheduler, available_cpus
+from adaptiveRank.tools.io import c_print, TRACE
+
+
+class SharedCurves:
+    '''Sampled cumulative reward curves of the repetitions, row i for repetition i, in a .npy file memory-mapped
+    by the parent and by the workers. Workers write their rows in place and only the row indexes go back through
+    the pool: the curves are neither pickled nor copied, and the parent reads them where they were written.
+    Pickled, only the path travels.'''
+
+    def __init__(self, nbRepetitions, nbRounds):
+        self._directory = mkdtemp(prefix = 'adaptiveRank_') # TMPDIR
+        self.path = join(self._directory, 'curves.npy')
+        self._curves = open_memmap(self.path, mode = 'w+', dtype = np.float64, shape = (nbRepetitions, nbRounds))
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self._curves = None # Mapped on first write
+
+    def write(self, i, curve):
+        if self._curves is None:
+            self._curves = np.load(self.path, mmap_mode = 'r+')
+        self._curves[i] = curve
+
+    def read(self, i):
+        return self._curves[i]
+
+    def close(self):
+        self._curves = None
+        rmtree(self._directory, ignore_errors = True)
+
+
+def _summary(i, result, rounds, curves):
+    # The sampled cumulative reward curve is written in place, the rest goes back to the parent
+    if TRACE:
+        c_print(1, "Evaluation.py\n{}", result)
+    curves.write(i, result.getCumSumRwd(rounds))
+    return (i, result.getNbArms(), result.getReward())
+
+# Workers: environment and policies are built from the task (Task.Task or Instances), fresh for every repetition,
+# the sampled rounds are derived from the stride
+def parallel_repetitions(task, horizon, indexes, stride, curves):
+    c_print(2, "EVALUATION: parallel_repetition indexes {}, T: {}", indexes, horizon)
+    rounds = sampled_rounds(horizon, stride)
+    return [_summary(i, task.environment().play(task.policy(), horizon, i), rounds, curves) for i in indexes]
+
+def batch_repetitions(task, horizon, indexes, stride, curves):
+    c_print(2, "EVALUATION: batch_repetitions indexes {}, T: {}", indexes, horizon)
+    rounds = sampled_rounds(horizon, stride)
+    results = task.environment().play_batch([task.policy() for _ in indexes], horizon, indexes)
+    return [_summary(i, result, rounds, curves) for i, result in zip(indexes, results)]
+
+def cyclic_repetitions(task, horizon, indexes, stride, curves):
+    c_print(2, "EVALUATION: cyclic_repetitions indexes {}, T: {}", indexes, horizon)
+    rounds = sampled_rounds(horizon, stride)
+    summaries = []
+    for i in indexes:
+        environment = task.environment()
+        reward, curve, _ = environment.play_cyclic(task.policy(), horizon, i, rounds)
+        curves.write(i, curve)
+        summaries.append((i, environment.nbArms, reward))
+    return summaries
+
+
+class Instances:
+    '''Task of the environment and policy objects given to an Evaluation without a spec: both are shipped to
+    the workers, every repetition gets copies of them.'''
+
+    def __init__(self, environment, policy):
+        self._environment = environment
+        self._policy = policy
+
+    def environment(self):
+        return deepcopy(self._environment)
+
+    def policy(self):
+        return deepcopy(self._policy)
 
-import sys
-sys.maxsize = 1000000 # Avoid truncations in print
-
-def parallel_repetitions(evaluation, policy, horizon, i):
-    c_print(2, "EVALUATION: parallel_repetition index {}, T: {}".format(i+1, horizon))
-    result = evaluation.environment.play(policy, horizon, i)
-    return (i,result)
 
 class Evaluation:
-    def __init__(self, env, pol, horizon, policyName, nbRepetitions ):
-        ''' Initialized in the run.py file.'''
+    def __init__(self, env, pol, horizon, policyName, nbRepetitions, batch = False, nbJobs = None, stride = 1, quantiles = (0.05, 0.95), run = True, cache = None, task = None, closedForm = False):
+        ''' Initialized in the run.py file.
+        With batch, the repetitions of the policies vectorized over them (batch(): UCB, Greedy) are split in nbJobs
+        chunks, each one stepped together by MAB.play_batch(). The other policies would be asked one repetition at
+        a time there, no faster than play(): their repetitions are played one by one anyway.
+        The cumulative rewards are aggregated on the fly, one sample every stride rounds.
+        Without run, the tasks are left to a Scheduler shared with other evaluations.
+        With a ResultCache, a stored evaluation is loaded instead of being run.
+        With a Task (the spec env and pol were built from), the workers get the spec instead of the objects.
+        With closedForm, the policies with cycle() are played by MAB.play_cyclic(): the expected curve is exact,
+        the sampled one has the distribution of play() but not its samples (own random stream).'''
 
         # Associated learning problem: policy, environment
         self.environment = env
@@ -27,44 +113,104 @@ class Evaluation:
         self.horizon = horizon
         self.polName = policyName
         self.nbRepetitions = nbRepetitions
+        self.task = Instances(env, pol) if task is None else task
 
         # Data Structurs to store the results of different reward samples
         self.rewards = np.zeros(self.nbRepetitions)
-        self.cumSumRwd = np.zeros((self.nbRepetitions, self.horizon))
-
-        c_print(4,"===Evaluation.py, INIT: {} over {} rounds for {} nbRepetitions".format(self.polName, self.horizon, self.nbRepetitions))
-
-        # Parallel call to the policy run over the number of repetitions
-        with Parallel(n_jobs = self.nbRepetitions) as parallel:
-            repetitionIndex_results = parallel(delayed(parallel_repetitions)(self, self.policy, self.horizon, i) for i in range(nbRepetitions))
-
-        # Results extrapolation
-        for i, result in repetitionIndex_results:
-            self.rewards[i] = result.getReward() # Over the flattened array
-            self.cumSumRwd[i] = result.getCumSumRwd()
-            self.nbArms = result.getNbArms()
-
-        # Additional Result Visualization 
-        if len(repetitionIndex_results) == 1:
-            c_print(1,"Evaluation.py\n{}".format(repr(repetitionIndex_results[0][1])))
-
-        c_print(2, "EVALUATION: End iteration over {} repetitions for {}".format(nbRepetitions, policyName))
+        self._collected = np.zeros(self.nbRepetitions, dtype = bool)
+        self._next = 0 # First repetition not aggregated yet
+        self.aggregator = Aggregator(self.horizon, stride, quantiles)
+        self.stride = stride
+
+        c_print(4, "===Evaluation.py, INIT: {} over {} rounds for {} nbRepetitions", self.polName, self.horizon, self.nbRepetitions)
+
+        # Work units: single repetitions or, with batch, chunks of repetitions
+        self._cyclic = closedForm and hasattr(pol, 'cycle') and getattr(env, 'traceDir', None) is None and getattr(env, 'profileDir', None) is None
+        if self._cyclic: # Periodic policies: closed form beyond the first cycle
+            self._chunks = [c.tolist() for c in np.array_split(np.arange(self.nbRepetitions), min(nbJobs or available_cpus(), self.nbRepetitions))]
+            self._worker = cyclic_repetitions
+        elif batch and hasattr(pol, 'batch'):
+            nbChunks = min(nbJobs or available_cpus(), self.nbRepetitions)
+            self._chunks = [c.tolist() for c in np.array_split(np.arange(self.nbRepetitions), nbChunks)]
+            self._worker = batch_repetitions
+        else:
+            self._chunks = [[i] for i in range(self.nbRepetitions)]
+            self._worker = parallel_repetitions
+
+        # Cached outcome of the same evaluation
+        self._cache = cache
+        self._cached = None
+        self._curves = None # SharedCurves of the running tasks
+        if cache is not None:
+            self._key = cache.key(env, pol, horizon, nbRepetitions, self.aggregator.rounds, quantiles, self._worker.__name__)
+            self._cached = cache.get(self._key)
+
+        if run:
+            with Scheduler(min(nbJobs or available_cpus(), len(self._chunks))) as scheduler:
+                scheduler.run([self])
+
+    def tasks(self):
+        '''(cost estimate, worker, arguments) of every work unit.'''
+        if self._cached is not None:
+            return []
+        cost = 1.0 if self._cyclic else getattr(self.policy, 'COST', 1.0) * self.horizon # Cyclic: independent of the horizon
+        if self._curves is None:
+            self._curves = SharedCurves(self.nbRepetitions, len(self.aggregator.rounds))
+        return [(cost * len(c), self._worker, (self.task, self.horizon, c, self.stride, self._curves)) for c in self._chunks]
+
+    def collect(self, summaries):
+        '''Outcomes of a task, in any order: the curves are aggregated by repetition index, the quantile sketches
+        depend on the order. The ones waiting for an earlier repetition stay in the shared file.'''
+        for i, nbArms, reward in summaries:
+            self.rewards[i] = reward
+            self._collected[i] = True
+            self.nbArms = nbArms
+        while self._next < self.nbRepetitions and self._collected[self._next]:
+            self.aggregator.push(self._curves.read(self._next)) # In place
+            self._next += 1
+
+    def finalize(self):
+        c_print(2, "EVALUATION: End iteration over {} repetitions for {}", self.nbRepetitions, self.polName)
 
         # Averaged best Expectation
+        if self._cached is not None:
+            self.rewards = self._cached['rewards']
+            self.nbArms = int(self._cached['nbArms'])
+            self.meanCumSumRwd = self._cached['mean']
+            self.stdCumSumRwd = self._cached['std']
+            self.quantilesCumSumRwd = dict(zip(self._cached['levels'].tolist(), self._cached['quantiles']))
+        else:
+            self.close()
+            self.meanCumSumRwd = self.aggregator.mean()
+            self.stdCumSumRwd = self.aggregator.std()
+            self.quantilesCumSumRwd = self.aggregator.quantiles()
+            if self._cache is not None:
+                levels = sorted(self.quantilesCumSumRwd)
+                self._cache.put(self._key, rewards = self.rewards, nbArms = self.nbArms, mean = self.meanCumSumRwd, std = self.stdCumSumRwd,
+                        levels = np.array(levels), quantiles = np.array([self.quantilesCumSumRwd[q] for q in levels]))
         self.meanReward = np.mean(self.rewards)
-        self.meanCumSumRwd = np.mean(self.cumSumRwd, axis = 0)
-        self.stdCumSumRwd = np.std(self.cumSumRwd, axis = 0)
 
         # Results visualization
-        c_print(4, "Evaluation.py, Pol: {}, Rewards: {} Average: {}".format(policyName, self.rewards, self.meanReward))
-        c_print(2, "Evaluation.py, Pol: {}, Cumulative Rewards:\n{}".format(policyName, self.cumSumRwd))
-        c_print(2, "Evaluation.py, Pol: {}, Mean CumulativeReward:\n{}".format(policyName, self.meanCumSumRwd))
-        c_print(2, "Evaluation.py, Pol: {}, Std CumulativeReward:\n{}".format(policyName, self.stdCumSumRwd))
+        c_print(4, "Evaluation.py, Pol: {}, Rewards: {} Average: {}", self.polName, self.rewards, self.meanReward)
+        c_print(2, "Evaluation.py, Pol: {}, Mean CumulativeReward:\n{}", self.polName, self.meanCumSumRwd)
+        c_print(2, "Evaluation.py, Pol: {}, Std CumulativeReward:\n{}", self.polName, self.stdCumSumRwd)
+
+        self.result = (self.polName, self.meanCumSumRwd, self.stdCumSumRwd)
 
-        self.result = (policyName, self.meanCumSumRwd, self.stdCumSumRwd)
+    def close(self):
+        '''Removes the curves of the tasks, once collected or when the run failed.'''
+        if self._curves is not None:
+            self._curves.close()
+            self._curves = None
 
     def getResults(self):
         return self.result 
 
+    def getRounds(self):
+        return self.aggregator.rounds
+
+    def getQuantiles(self):
+        return self.quantilesCumSumRwd
+
     def getNbArms(self):
         return self.nbArms
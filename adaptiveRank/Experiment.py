@@ -0,0 +1,104 @@
+'''Experiment configurations: policies, evaluations and stored results of a parameter point'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+import json
+from itertools import product
+import numpy as np
+from math import sqrt
+from os.path import join
+from adaptiveRank.Evaluation import Evaluation
+from adaptiveRank.Task import Task, make_policy
+
+# Parameters of an experiment, same defaults as run.py (tau None: max_delay + 1)
+DEFAULTS = {'gamma': 0.999, 'max_delay': 6, 'tau': None, 'T': 500000, 'k': 8, 'fra_top': 0.2, 'delta': 0.1,
+        'n_rep': 1, 'rounding': 5, 'bin': 1, 'stage': 0, 'switch': 0, 'sc': 0, 'seed': 0, 'stride': 1,
+        'alpha': sqrt(2), 'shrink': 1, 'closed_form': 0}
+PREFIX = ['full', 'arm_ordering', 'rank_estimation']
+NAMED = ['n_rep', 'alpha', 'seed', 'switch', 'closed_form'] # Appended to the experiment name when not default
+
+
+def configuration(**params):
+    '''Full configuration: the given parameters over the defaults.'''
+    unknown = set(params) - set(DEFAULTS)
+    assert not unknown, "Experiment.py, configuration(): unknown parameters {}".format(sorted(unknown))
+    config = dict(DEFAULTS)
+    config.update(params)
+    if config['tau'] is None:
+        config['tau'] = config['max_delay'] + 1
+    return config
+
+def expand(spec):
+    '''Configurations of a sweep spec: {"fixed": {...}, "grid": {parameter: [values]}}, grid can be a list of grids.'''
+    grids = spec.get('grid', {})
+    configs = []
+    for grid in (grids if isinstance(grids, list) else [grids]):
+        keys = sorted(grid)
+        for values in product(*[grid[key] for key in keys]):
+            params = dict(spec.get('fixed', {}))
+            params.update(zip(keys, values))
+            configs.append(configuration(**params))
+    return configs
+
+def experiment_name(config):
+    '''Same naming scheme of the run.py figures.'''
+    name = "{}{}_g{}_ft{}_d{}_dUB{}_dBar{}_bin{}_T{}_k{}".format(PREFIX[config['stage']], '_SC' if config['sc'] else '',
+            config['gamma'], config['fra_top'], config['delta'], config['max_delay'], config['tau'], config['bin'], config['T'], config['k'])
+    for key in NAMED:
+        if config[key] != DEFAULTS[key]:
+            name += "_{}{}".format(key, config[key])
+    return name
+
+def roster(config):
+    '''(name, registered policy) pairs of the experiment, the ghost benchmark only when meaningful.'''
+    pairs = []
+    if config['stage'] != 1: # Useless benchmark for the arm ordering estimation problem
+        pairs.append(('Ghost', 'RStar'))
+    pairs.append(('PI ucb', 'FPO_UCB'))
+    pairs.append(('PI Low', 'ORE2'))
+    return pairs
+
+def policies(config):
+    '''(name, policy) pairs of the experiment.'''
+    return [(name, make_policy(policy, config)) for name, policy in roster(config)]
+
+def evaluations(config, nbJobs = None, traceDir = None, cache = None, checkpointDir = None, checkpointInterval = 60.0, profileDir = None, profileMemory = False):
+    '''Evaluations of the experiment, to be run by a Scheduler (cached ones are only loaded).
+    With checkpointDir, the repetitions are snapshotted every checkpointInterval seconds and resumed from there.
+    With profileDir, the phase profile of every repetition is stored in its experiment_name() subdirectory.'''
+    if profileDir is not None:
+        profileDir = join(profileDir, experiment_name(config))
+    evals = []
+    for name, policy in roster(config):
+        # Only the spec goes to the workers, the objects built here are for the cache key and the dispatch
+        task = Task(policy, name, config, recordChoices = traceDir is not None, traceDir = traceDir,
+                checkpointDir = checkpointDir, checkpointInterval = checkpointInterval, profileDir = profileDir, profileMemory = profileMemory)
+        evals.append(Evaluation(task.environment(), task.policy(), config['T'], name, config['n_rep'], nbJobs = nbJobs, stride = config['stride'],
+                run = False, cache = cache, task = task, closedForm = bool(config['closed_form'])))
+    return evals
+
+def save(path, config, evals):
+    '''Aggregated curves of the evaluations, one row per policy.'''
+    keys = sorted(evals[0].getQuantiles())
+    np.savez_compressed(path, config = json.dumps(config, sort_keys = True),
+            names = np.array([e.polName for e in evals]), rounds = evals[0].getRounds(), nbArms = evals[0].getNbArms(),
+            rewards = np.array([e.rewards for e in evals]), mean = np.array([e.meanCumSumRwd for e in evals]),
+            std = np.array([e.stdCumSumRwd for e in evals]), levels = np.array(keys),
+            quantiles = np.array([[e.getQuantiles()[q] for q in keys] for e in evals]))
+
+def load(path):
+    '''Inverse of save(): dictionary of the stored arrays, with the configuration decoded.'''
+    with np.load(path) as data:
+        stored = {key: data[key] for key in data.files}
+    stored['config'] = json.loads(str(stored['config']))
+    stored['names'] = stored['names'].tolist()
+    return stored
+
+def stored_config(path):
+    '''Configuration of the experiment stored in path, without loading its curves.'''
+    with np.load(path) as data:
+        return json.loads(str(data['config']))
+
+def result_path(directory, config):
+    return join(directory, experiment_name(config) + '.npz')
@@ -0,0 +1,114 @@
+'''Figures of the stored experiments, rendered headless from the saved curves'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from os.path import getmtime, exists, join
+from shutil import which
+import matplotlib
+matplotlib.use('Agg') # No display needed
+from matplotlib import rc
+import matplotlib.pyplot as plt
+
+from adaptiveRank.Experiment import NAMED, DEFAULTS, PREFIX, load, stored_config
+from adaptiveRank.tools.downsample import log_indexes, lttb
+from adaptiveRank.tools.io import c_print
+
+POINTS = 2000 # Points kept per curve
+COLORS = ['b', 'g', 'r', 'y', 'k', 'c', 'm']
+MARKERS = ['o', '+', 'x', 'v', 'o', '+', 'x']
+LABELS = {'Ghost': '\\pi_{ghost}', 'PI Low': '\\pi_{low}', 'PI ucb': '\\pi_{ucb}'}
+USETEX = which('latex') is not None # Mathtext labels otherwise
+
+rc('font',**{'family':'sans-serif','sans-serif':['Helvetica'], 'size':'15.0'})
+rc('text', usetex=USETEX)
+
+
+def _label(name):
+    symbol = LABELS.get(name, '\\pi_{ghost}')
+    return '$\\displaystyle{}$'.format(symbol) if USETEX else '${}$'.format(symbol)
+
+def _suffix(config):
+    return ''.join("_{}{}".format(key, config[key]) for key in NAMED if config[key] != DEFAULTS[key])
+
+def figure_names(config):
+    '''File names of the figures of an experiment, as the ones run.py used to write.'''
+    names = ["{}{}_g{}_ft{}_d{}_dUB{}_dBar{}_bin{}_T{}_k{}{}.png".format(PREFIX[config['stage']], '_SC' if config['sc'] else '', config['gamma'],
+            config['fra_top'], config['delta'], config['max_delay'], config['tau'], config['bin'], config['T'], config['k'], _suffix(config))]
+    if config['stage'] != 1: # Not Arm Ordering
+        cost = 'SC' if config['sc'] else 'NOSC'
+        if config['switch']:
+            names.append("regret_SWITCHING_{}_bin{}_T{}{}.png".format(cost, config['bin'], config['T'], _suffix(config)))
+        else:
+            names.append("regret_{}_g{}_ft{}_d{}_dUB{}_dBar{}_bin{}_T{}_k{}{}.png".format(cost, config['gamma'], config['fra_top'], config['delta'],
+                config['max_delay'], config['tau'], config['bin'], config['T'], config['k'], _suffix(config)))
+    return names
+
+def up_to_date(path, directory):
+    '''The figures of the stored experiment in path are newer than it.'''
+    figures = [join(directory, name) for name in figure_names(stored_config(path))]
+    return all(exists(figure) and getmtime(figure) >= getmtime(path) for figure in figures)
+
+
+def _band(ax, x, low, high, color, kept, label = None):
+    ax.fill_between(x[kept], low[kept], high[kept], alpha = 0.5, color = color, label = label)
+
+def render(stored, directory, bands = 0, points = POINTS):
+    '''Figures of a stored experiment (Experiment.load()) written in directory, every curve reduced to about
+    points points: LTTB for the cumulative rewards, log spaced rounds for the log-x regret. Returns their paths.'''
+    config = stored['config']
+    names = stored['names']
+    rounds = stored['rounds']
+    levels = stored.get('levels')
+    percentiles = bands and levels is not None and len(levels) > 1 # Std band otherwise
+    if percentiles: # Widest stored band
+        low, high = int(levels.argmin()), int(levels.argmax())
+        bandLabel = '{:g}th-{:g}th percentiles'.format(100 * levels[low], 100 * levels[high])
+    elif bands:
+        c_print(4, "Plot.py, render(): no stored percentiles, mean +- std/2 bands")
+    paths = [join(directory, name) for name in figure_names(config)]
+
+    # Cumulative rewards
+    fig = plt.figure()
+    ax = fig.add_subplot(1,1,1)
+    for i, name in enumerate(names):
+        avg, std = stored['mean'][i], stored['std'][i]
+        kept = lttb(rounds, avg, points)
+        if percentiles:
+            _band(ax, rounds, stored['quantiles'][i][low], stored['quantiles'][i][high], COLORS[i], kept, bandLabel if i == 0 else None)
+        else:
+            _band(ax, rounds, avg - (std/2), avg + (std/2), COLORS[i], kept)
+        ax.plot(rounds[kept], avg[kept], color = COLORS[i], marker = MARKERS[i], markevery = 0.05, label = _label(name))
+    ax.legend(loc=2)
+    ax.grid()
+    fig.savefig(paths[0])
+    plt.close(fig)
+
+    # Regret with respect to Ghost
+    if len(paths) > 1 and 'Ghost' in names:
+        ghost = names.index('Ghost')
+        kept = log_indexes(len(rounds), points)
+        fig = plt.figure()
+        ax = fig.add_subplot(1,1,1)
+        for name in ('PI ucb', 'PI Low'):
+            if name not in names:
+                continue
+            i = names.index(name)
+            avg_regret = stored['mean'][ghost] - stored['mean'][i]
+            std_regret = stored['std'][ghost] + stored['std'][i]
+            _band(ax, rounds, avg_regret - (std_regret/2), avg_regret + (std_regret/2), COLORS[i], kept)
+            ax.plot(rounds[kept], avg_regret[kept], color = COLORS[i], marker = MARKERS[i], markevery = 0.05, label = _label(name))
+        ax.legend(loc = 3 if config['switch'] else 2) # lower left, upper left
+        ax.autoscale(enable = True, axis ='x', tight=True)
+        ax.grid()
+        ax.set_xscale('log')
+        fig.savefig(paths[1])
+        plt.close(fig)
+    else:
+        paths = paths[:1]
+    c_print(2, "Plot.py, render(): {}", paths)
+    return paths
+
+def render_file(path, directory, bands = 0, points = POINTS):
+    '''render() of the experiment stored in path (worker of plot.py).'''
+    return render(load(path), directory, bands, points)
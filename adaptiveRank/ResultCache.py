@@ -0,0 +1,77 @@
+'''Content-addressed on-disk cache of the aggregated evaluations'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+import json
+import os
+import time
+import numpy as np
+from hashlib import sha256
+from adaptiveRank.version import VERSION
+from adaptiveRank.tools.io import c_print
+
+FORMAT = 2 # Layout of the stored entries, 2: exact quantiles of the first repetitions
+
+
+class ResultCache:
+    '''Aggregated curves (and per repetition rewards) keyed by the hash of everything they depend on:
+    environment configuration, seed, policy class and parameters, repetitions, sampling and package version.
+    Entries are npz files, the least recently used ones are evicted beyond maxBytes or after maxAge seconds.'''
+
+    def __init__(self, directory, maxBytes = None, maxAge = None):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.maxAge = maxAge
+        os.makedirs(directory, exist_ok = True)
+
+    @staticmethod
+    def key(environment, policy, horizon, nbRepetitions, rounds, quantiles, engine = 'play'):
+        '''Hex digest of the evaluation content (the policy before any play), engine is the simulation used.'''
+        content = {'version': VERSION, 'format': FORMAT, 'environment': environment.config(),
+                'policy': type(policy).__module__ + '.' + type(policy).__name__, 'parameters': vars(policy),
+                'engine': engine, 'horizon': horizon, 'repetitions': nbRepetitions, 'quantiles': sorted(quantiles),
+                'rounds': sha256(np.ascontiguousarray(rounds, dtype = np.int64).tobytes()).hexdigest()}
+        return sha256(json.dumps(content, sort_keys = True, default = repr).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key):
+        '''Stored arrays of the key, None on a miss.'''
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                entry = {name: data[name] for name in data.files}
+        except (IOError, ValueError):
+            return None
+        os.utime(path) # Recently used
+        c_print(2, "CACHE: hit {}", key[:12])
+        return entry
+
+    def put(self, key, **arrays):
+        # Written aside and renamed, concurrent readers never see partial entries
+        path = self._path(key)
+        tmp = "{}.{}.tmp.npz".format(path[:-4], os.getpid())
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+        c_print(2, "CACHE: stored {}", key[:12])
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz') and '.tmp.' not in name:
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, name in entries: # Oldest first
+            expired = self.maxAge is not None and now - mtime > self.maxAge
+            oversized = self.maxBytes is not None and total > self.maxBytes
+            if not (expired or oversized):
+                continue
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+            c_print(2, "CACHE: evicted {}", name)
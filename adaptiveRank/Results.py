@@ -1,24 +1,91 @@
 'Utility class that manages the results of MAB experiments'
 
 import numpy as np
+from numpy.lib.format import open_memmap
 from adaptiveRank.tools.io import c_print
-import sys
-sys.maxsize = 1000000 # Avoid truncations in print
+
+CHUNK = 1 << 20 # Rounds processed at once by the accessors (multiple of 8)
 
 
 class Result:
-    """Class that analyzes the outcome of a bandit experiment"""
+    """Class that analyzes the outcome of a bandit experiment.
+    Compact storage: choices in the narrowest unsigned dtype, rewards (and switching costs) packed as bits
+    with binary rewards, float32 otherwise. With path the traces are .npy memory-mapped files."""
 
-    def __init__(self, horizon):
+    def __init__(self, horizon, nbArms = 1 << 16, binary = False, costs = False, path = None, recordChoices = True):
         # Initially all the rounds have no choices or rewards.
-        self.choices = np.zeros(horizon, dtype=np.int)
-        self.rewards = np.zeros(horizon)
+        self.horizon = horizon
         self.nbArms = 0
+        self._bits = bool(binary)
+        choiceType = np.min_scalar_type(max(nbArms - 1, 0))
+        self.choices = self._array(path, 'choices', horizon, choiceType) if recordChoices else None
+        if self._bits:
+            self.rewards = self._array(path, 'rewards', (horizon + 7) >> 3, np.uint8)
+            self.costs = self._array(path, 'costs', (horizon + 7) >> 3, np.uint8) if costs else None
+        else:
+            self.rewards = self._array(path, 'rewards', horizon, np.float32)
+            self.costs = None # Costs are subtracted from the stored float rewards
+
+    @staticmethod
+    def _array(path, name, size, dtype):
+        if path is None:
+            return np.zeros(size, dtype = dtype)
+        return open_memmap("{}.{}.npy".format(path, name), mode = 'w+', dtype = dtype, shape = (size,))
 
     # Store the info for round t
-    def store(self, t, choice, reward):
-        self.choices[t] = choice
-        self.rewards[t] = reward
+    def store(self, t, choice, reward, cost = 0.0):
+        if self.choices is not None:
+            self.choices[t] = choice
+        if self._bits:
+            if reward:
+                self.rewards[t >> 3] |= 128 >> (t & 7)
+            if cost:
+                self.costs[t >> 3] |= 128 >> (t & 7)
+        else:
+            self.rewards[t] = reward - cost
+
+    # Store the info for the rounds t0, t0+1, ...
+    def storeRange(self, t0, choices, rewards, costs = None):
+        t1 = t0 + len(rewards)
+        if self.choices is not None:
+            self.choices[t0:t1] = choices
+        if self._bits:
+            self._setBits(self.rewards, t0, rewards)
+            if costs is not None and self.costs is not None:
+                self._setBits(self.costs, t0, costs)
+        else:
+            self.rewards[t0:t1] = rewards if costs is None else np.asarray(rewards) - costs
+
+    @staticmethod
+    def _setBits(bits, t0, values):
+        values = np.asarray(values) != 0
+        if t0 % 8 == 0: # Whole bytes, the rounds beyond are still unset
+            packed = np.packbits(values)
+            bits[t0 >> 3 : (t0 >> 3) + len(packed)] = packed
+        else:
+            rounds = np.flatnonzero(values) + t0
+            np.bitwise_or.at(bits, rounds >> 3, (128 >> (rounds & 7)).astype(np.uint8))
+
+    def _values(self, start, stop):
+        # Rewards of the rounds [start, stop), start multiple of 8
+        if not self._bits:
+            return self.rewards[start:stop]
+        values = np.unpackbits(self.rewards[start >> 3 : (stop + 7) >> 3])[:stop - start].astype(np.int8)
+        if self.costs is not None:
+            values -= np.unpackbits(self.costs[start >> 3 : (stop + 7) >> 3])[:stop - start].astype(np.int8)
+        return values
+
+    def snapshot(self, t):
+        '''Copies of the stored rounds [0, t), for restore().'''
+        stop = (t + 7) >> 3 if self._bits else t
+        return {'choices': None if self.choices is None else np.array(self.choices[:t]), 'rewards': np.array(self.rewards[:stop]),
+                'costs': None if self.costs is None else np.array(self.costs[:stop])}
+
+    def restore(self, arrays):
+        for name in ('choices', 'rewards', 'costs'):
+            target = getattr(self, name)
+            if target is not None and arrays[name] is not None:
+                target[:len(arrays[name])] = arrays[name]
 
     def setNbArms(self, n):
         self.nbArms = n
@@ -26,11 +93,24 @@ class Result:
     def getNbArms(self):
         return self.nbArms
 
-    def getCumSumRwd(self):
-        return np.cumsum(self.rewards)
+    def getCumSumRwd(self, rounds = None):
+        '''Cumulative reward at the given rounds (all of them by default), computed chunk by chunk.'''
+        rounds = np.arange(self.horizon) if rounds is None else np.asarray(rounds)
+        cumSum = np.zeros(len(rounds))
+        total = 0.0
+        for start in range(0, self.horizon, CHUNK):
+            stop = min(start + CHUNK, self.horizon)
+            lo, hi = np.searchsorted(rounds, [start, stop])
+            if lo == hi and hi == len(rounds):
+                break
+            partial = np.cumsum(self._values(start, stop), dtype = np.float64)
+            partial += total
+            cumSum[lo:hi] = partial[rounds[lo:hi] - start]
+            total = partial[-1]
+        return cumSum
 
     def getReward(self):
-        return np.sum(self.rewards)
+        return float(sum(np.sum(self._values(start, min(start + CHUNK, self.horizon)), dtype = np.float64) for start in range(0, self.horizon, CHUNK)))
 
     def __repr__(self):
-        return "<Result choices:%s \n reward %s>" % (self.choices, self.rewards)
+        return "<Result choices:%s \n reward %s>" % (self.choices, self._values(0, self.horizon))
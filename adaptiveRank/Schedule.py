@@ -0,0 +1,58 @@
+'''Run-length encoded pull schedules'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from numpy import asarray, int64
+
+
+class Schedule:
+    '''Pulls of a choice: the prefix, then the block repeated count times.
+    It stands for the equivalent list (len, indexing, iteration) without materializing it.'''
+
+    def __init__(self, block, count, prefix = ()):
+        self.block = list(block)
+        self.count = count
+        self.prefix = list(prefix)
+
+    def __len__(self):
+        return len(self.prefix) + len(self.block) * self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Schedule index out of range")
+        if i < len(self.prefix):
+            return self.prefix[i]
+        return self.block[(i - len(self.prefix)) % len(self.block)]
+
+    def __iter__(self):
+        for arm in self.prefix:
+            yield arm
+        for _ in range(self.count):
+            for arm in self.block:
+                yield arm
+
+    def distinct(self):
+        '''Number of different arms.'''
+        return len(set(self.prefix) | set(self.block if self.count else ()))
+
+    def __repr__(self):
+        return "<Schedule prefix:{} block:{} x {}>".format(self.prefix, self.block, self.count)
+
+
+def segments(choice):
+    '''Consecutive int64 arrays making up the pulls of a list or Schedule choice.'''
+    if not isinstance(choice, Schedule):
+        yield asarray(choice, dtype = int64)
+        return
+    if choice.prefix:
+        yield asarray(choice.prefix, dtype = int64)
+    block = asarray(choice.block, dtype = int64)
+    for _ in range(choice.count):
+        yield block
+
+def distinct(choice):
+    '''len(set(choice)) of a list or Schedule choice.'''
+    return choice.distinct() if isinstance(choice, Schedule) else len(set(choice))
@@ -0,0 +1,98 @@
+'''Process pool shared by the evaluations of a run'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+import os
+from adaptiveRank.tools.io import c_print
+
+# Thread pools of the numerical libraries, one thread per worker process
+THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS']
+_limits = None
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def _limit_threads():
+    '''Worker initializer: the parallelism comes from the processes, not from BLAS.
+    The forked workers inherit the libraries loaded by the parent, whose thread pools were sized when they were
+    loaded: only threadpoolctl resizes them. The variables cover the libraries loaded later by the worker.'''
+    global _limits
+    from threadpoolctl import threadpool_limits
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = '1'
+    _limits = threadpool_limits(1)
+
+
+class Scheduler:
+    '''Bounded, reusable process pool. The tasks of all the given evaluations are submitted together,
+    longest first according to their cost estimate, so the cores stay busy until the very end.'''
+
+    def __init__(self, nbWorkers = None):
+        self.nbWorkers = nbWorkers or available_cpus()
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            from concurrent.futures import ProcessPoolExecutor # Not needed by the in process runs and the workers
+            self._pool = ProcessPoolExecutor(max_workers = self.nbWorkers, initializer = _limit_threads)
+        return self._pool
+
+    def run(self, evaluations, done = None):
+        ''' Runs the tasks of the evaluations and hands every outcome back to its evaluation.
+        An evaluation is finalized, and passed to done, as soon as its last task is over.
+        If the run fails, the evaluations are closed and the tasks not started are cancelled.'''
+        try:
+            tasks = [(cost, n, evaluation, worker, args) for n, evaluation in enumerate(evaluations) for cost, worker, args in evaluation.tasks()]
+            tasks.sort(key = lambda task: (-task[0], task[1]))
+            pending = [0] * len(evaluations)
+            for task in tasks:
+                pending[task[1]] += 1
+            c_print(2, "SCHEDULER: {} tasks over {} workers", len(tasks), self.nbWorkers)
+
+            def collect(n, summaries):
+                evaluations[n].collect(summaries)
+                pending[n] -= 1
+                if pending[n] == 0:
+                    evaluations[n].finalize()
+                    if done is not None:
+                        done(evaluations[n])
+
+            for n in range(len(evaluations)): # Nothing to run, e.g. cached
+                if pending[n] == 0:
+                    pending[n] = 1
+                    collect(n, [])
+
+            if self.nbWorkers == 1: # In process
+                for _, n, _, worker, args in tasks:
+                    collect(n, worker(*args))
+            else:
+                from concurrent.futures import as_completed
+                pool = self._executor()
+                futures = {pool.submit(worker, *args): n for _, n, _, worker, args in tasks}
+                try:
+                    for future in as_completed(futures):
+                        collect(futures.pop(future), future.result()) # Outcomes released once collected
+                finally:
+                    for future in futures:
+                        future.cancel()
+        except BaseException: # Worker failure, interruption: no curve file left behind
+            for evaluation in evaluations:
+                evaluation.close()
+            raise
+        return evaluations
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,44 @@
+'''Picklable specs of the evaluations and factories of their environment and policies'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from adaptiveRank.environment import MAB
+from adaptiveRank.policies import policy_class
+
+
+def make_policy(name, config):
+    '''Fresh instance of the registered policy name with the parameters of an experiment configuration.'''
+    T = config['T']
+    if name == 'FPO_UCB':
+        return policy_class(name)(T, config['tau'], config['delta'], config['rounding'], 5, config['bin'], config['stage'], config['alpha'])
+    if name == 'ORE2':
+        return policy_class(name)(T, config['tau'], config['delta'], config['shrink'], config['rounding'], 5, config['bin'], config['stage'])
+    return policy_class(name)(T, 2)
+
+def make_environment(label, config, **options):
+    '''Fresh MAB of an experiment configuration for the policy label (the name MAB.play() dispatches on),
+    options are the keyword arguments of MAB (traces, checkpoints, profiles).'''
+    return MAB(config['T'], config['k'], config['gamma'], config['fra_top'], config['max_delay'], config['bin'], config['stage'],
+            label, config['switch'], config['sc'], config['seed'], **options)
+
+
+class Task:
+    '''Spec of an evaluation: registered policy name, label, configuration and MAB options, a few hundred bytes
+    once pickled. The workers build their own environment and policies from it, one per repetition: nothing of the
+    parent is shipped and no state is shared between the repetitions played by the same worker.'''
+
+    def __init__(self, name, label, config, **options):
+        self.name = name
+        self.label = label
+        self.config = dict(config)
+        self.options = options
+
+    def environment(self):
+        return make_environment(self.label, self.config, **self.options)
+
+    def policy(self):
+        return make_policy(self.name, self.config)
+
+    def __repr__(self):
+        return "<Task {} ({}) T:{}>".format(self.label, self.name, self.config['T'])
@@ -0,0 +1,9 @@
+'''python -m adaptiveRank {simulate, sweep, plot, bench} [options]'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+import sys
+from adaptiveRank.cli import main
+
+sys.exit(main())
@@ -3,11 +3,20 @@ __author__ = "Leonardo Cella"
 __version__ = "0.1"
 
 class Arm:
+    '''Arms are described by their payoff table: the expected reward for each delay, built once.
+    Delays beyond the table share its last entry.'''
+
     def __init__(self, mean, gamma, maxDelay):
-        pass
+        self._payoffs = []
 
-    def draw(self, currentDelay, repIndex):
-        pass
+    def draw(self, currentDelay, stream):
+        '''Expected reward at currentDelay and a Bernoulli sample read from the arm's random stream.'''
+        expectedReward = self.computeState(currentDelay)
+        return (expectedReward, stream.bernoulli(expectedReward))
 
     def computeState(self, currentDelay):
-        pass
+        return self._payoffs[min(currentDelay, len(self._payoffs) - 1)]
+
+    def payoffs(self, nbDelays):
+        '''Payoff table row for the delays 0..nbDelays-1.'''
+        return [self.computeState(d) for d in range(nbDelays)]
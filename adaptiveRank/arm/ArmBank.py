@@ -0,0 +1,58 @@
+'''Arms of a repetition as arrays.'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from numpy import arange, asarray, minimum, ones, unique, where, zeros
+
+
+class ArmBank:
+    '''Structure of arrays of the arms: means, gammas and [minDelay, maxDelay] discount windows.
+    Their K x nbDelays payoff table holds the expected reward of each arm for the delays 0..nbDelays-1,
+    larger delays share the last column.'''
+
+    def __init__(self, table, means, gammas, minDelays, maxDelays):
+        self.table = table
+        self.means = means
+        self.gammas = gammas
+        self.minDelays = minDelays
+        self.maxDelays = maxDelays
+
+    @classmethod
+    def discounted(cls, means, gammas, minDelays, maxDelays, nbDelays):
+        '''Bernoulli arms: mean * (1 - gamma^delay) within the window, the plain mean elsewhere.'''
+        means, gammas = asarray(means, dtype = float), asarray(gammas, dtype = float)
+        minDelays, maxDelays = asarray(minDelays, dtype = int), asarray(maxDelays, dtype = int)
+        delays = arange(nbDelays)
+        window = (delays >= minDelays[:, None]) & (delays <= maxDelays[:, None])
+        # gamma^delay once per distinct gamma, with the scalar pow (numpy's may differ in the last bit)
+        levels, inverse = unique(gammas, return_inverse = True)
+        powers = asarray([[gamma ** d for d in range(nbDelays)] for gamma in levels.tolist()]).reshape(len(levels), nbDelays)[inverse]
+        table = where(window, means[:, None] * (1.0 - powers), means[:, None])
+        return cls(table, means, gammas, minDelays, maxDelays)
+
+    @classmethod
+    def given(cls, rows, nbDelays):
+        '''HashBernoulli arms: explicit payoff rows for the delays 0, 1, ..., the last entry repeated beyond.'''
+        table = asarray([[row[min(d, len(row) - 1)] for d in range(nbDelays)] for row in rows], dtype = float)
+        nbArms = len(table)
+        return cls(table, table[:, 0].copy(), zeros(nbArms), ones(nbArms, dtype = int), zeros(nbArms, dtype = int)) # Empty windows
+
+    def __len__(self):
+        return len(self.table)
+
+    def describe(self, arm):
+        return "Arm {}. mu: {} gamma: {} min_delay {}: max_delay: {} payoffs: {}".format(arm, self.means[arm], self.gammas[arm],
+                self.minDelays[arm], self.maxDelays[arm], self.table[arm])
+
+    def states(self, delays, indexes = None):
+        '''Expected rewards of the arms in indexes (all of them by default) at the given delays.'''
+        if indexes is None:
+            indexes = arange(len(self.table))
+        return self.table[indexes, minimum(delays, self.table.shape[1] - 1)]
+
+    def draw(self, indexes, delays, rng):
+        '''Expected rewards and Bernoulli samples of the arms in indexes at the given delays, one uniform of
+        rng (a numpy Generator or any object with random(n)) per arm.'''
+        expected = self.states(delays, indexes)
+        return expected, 1.0 * (rng.random(len(expected)) < expected)
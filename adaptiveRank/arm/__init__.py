@@ -5,3 +5,4 @@ __version__ = "0.1"
 
 from .Arm import Arm
 
+from .ArmBank import ArmBank
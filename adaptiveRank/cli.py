@@ -0,0 +1,284 @@
+'''Command line entry point: python -m adaptiveRank {simulate, sweep, plot, bench} [options]'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+import sys
+from optparse import OptionParser
+from adaptiveRank.tools.io import c_print
+
+# numpy, the policies, the process pool and matplotlib are imported by the subcommands needing them
+
+def _parser(command, usage):
+    return OptionParser(prog = "python -m adaptiveRank " + command, usage = "usage: %prog " + usage, version = "%prog 1.0")
+
+
+def simulate(argv):
+    '''Single experiment: runs its policies, stores the curves and renders the figures (former run.py).'''
+    #====================
+    # RUNNING PARAMETERS
+    #====================
+    parser = _parser('simulate', "[options]")
+    parser.add_option('--gamma', dest = 'GAMMA', default = 0.999, type = "float", help = "Discount parameter")
+    parser.add_option('--max_delay', dest = 'MAX_DELAY', default = 6, type = "int", help = "Memory size for the discount")
+    parser.add_option('--tau', dest = 'TAU', default = '7', type = 'int', help = 'Sampling delay')
+    parser.add_option('-T', dest = 'T', default = 500000, type = "int", help = "Time horizon")
+    parser.add_option('-k', dest = 'N_BUCKETS', default = 8, type = "int", help = "Number of buckets")
+    parser.add_option('--fra_top', dest = 'FRA_TOP', default = 0.2, type = "float", help = "Fraction of top arms")
+    #parser.add_option('--delay_ub', dest = 'DELAY_UB', default = 2, type = "int", help = "Gap from the delay bar")
+    parser.add_option('--delta', dest = "DELTA", default = 0.1, type = "float", help = "confidence in estimates")
+    parser.add_option('--n_rep', dest = 'N_REP', default = 1, type = "int", help = "Number of repetitions")
+    parser.add_option('--rounding', dest = 'ROUNDING', default = 5, type = "int", help = "Number of kept decimals")
+    parser.add_option('--bin', dest = 'BINARY', default = 1, type = "int", help = "Binary rewards")
+    parser.add_option('-v', dest = 'VERBOSE', default = '1', type = 'int', help = "Verbose in terms of plots")
+    parser.add_option('-s', dest = 'STORE', default = '1', type = 'int', help = "Storing results and plots")
+    parser.add_option('--stage', dest = 'MOD', default = '0', type = 'int', help = "0 - full learning, 1 arm ordering, 2 rank estimation")
+    parser.add_option('--switch', dest = 'SWITCH', default = '0', type = 'int', help = "Testing with specified means")
+    parser.add_option('--sc', dest = 'SC', default = '0', type = 'int', help = "With switching costs")
+    parser.add_option('--stride', dest = 'STRIDE', default = '1', type = 'int', help = "Rounds between two aggregated samples of the curves")
+    parser.add_option('--bands', dest = 'BANDS', default = '0', type = 'int', help = "Reward plot bands: 0 mean +- std/2, 1 lowest-highest stored percentiles (5th-95th by default)")
+    parser.add_option('--seed', dest = 'SEED', default = '0', type = 'int', help = "Seed of the reward streams")
+    parser.add_option('--closed_form', dest = 'CLOSED_FORM', default = '0', type = 'int', help = "Closed form past the first cycle for RStar and Ghost: other samples than the simulation with the same seed (ignored with traces or profiles)")
+    parser.add_option('--trace_dir', dest = 'TRACE_DIR', default = None, type = 'string', help = "Directory of the memory-mapped per-repetition traces (choices recorded only there)")
+    parser.add_option('--cache_dir', dest = 'CACHE_DIR', default = 'output/cache', type = 'string', help = "Directory of the cached evaluations ('' disables the cache)")
+    parser.add_option('--cache_mb', dest = 'CACHE_MB', default = '1024', type = 'int', help = "Size of the cache, least recently used evaluations are evicted")
+    parser.add_option('--n_jobs', dest = 'N_JOBS', default = '0', type = 'int', help = "Number of worker processes shared by all the policies (0: one per core)")
+    parser.add_option('--checkpoint_dir', dest = 'CHECKPOINT_DIR', default = None, type = 'string', help = "Directory of the snapshots of the repetitions being played, resumed from after a crash")
+    parser.add_option('--checkpoint_s', dest = 'CHECKPOINT_S', default = '60', type = 'float', help = "Seconds between two snapshots of a repetition")
+    parser.add_option('--profile_dir', dest = 'PROFILE_DIR', default = None, type = 'string', help = "Directory of the JSON phase profiles of the repetitions (cache bypassed)")
+    parser.add_option('--profile_memory', dest = 'PROFILE_MEMORY', default = '0', type = 'int', help = "Traced allocations peak of every phase in the profiles (slow)")
+    (opts, args) = parser.parse_args(argv)
+
+    from adaptiveRank.Experiment import configuration, evaluations, result_path, save
+    from adaptiveRank.ResultCache import ResultCache
+    from adaptiveRank.Scheduler import Scheduler
+
+    N_JOBS = opts.N_JOBS or None
+    CACHE = None # Traces and profiles require a real run
+    if opts.CACHE_DIR and opts.TRACE_DIR is None and opts.PROFILE_DIR is None:
+        CACHE = ResultCache(opts.CACHE_DIR, opts.CACHE_MB << 20)
+
+    #=====================
+    # INITIALIZATION
+    #=====================
+    # Policies: Ghost benchmark (not for the arm ordering problem), PI ucb and PI Low, see Experiment.roster()
+    config = configuration(gamma = opts.GAMMA, max_delay = opts.MAX_DELAY, tau = opts.TAU, T = opts.T, k = opts.N_BUCKETS, fra_top = opts.FRA_TOP,
+            delta = opts.DELTA, n_rep = opts.N_REP, rounding = opts.ROUNDING, bin = opts.BINARY, stage = opts.MOD, switch = opts.SWITCH,
+            sc = opts.SC, seed = opts.SEED, stride = opts.STRIDE,
+            closed_form = opts.CLOSED_FORM)
+
+    #=====================
+    # RUN OVER POLICIES
+    #=====================
+    evals = evaluations(config, N_JOBS, opts.TRACE_DIR, CACHE, opts.CHECKPOINT_DIR, opts.CHECKPOINT_S, opts.PROFILE_DIR, opts.PROFILE_MEMORY)
+
+    # All the (policy, repetition) tasks share one pool
+    c_print(5, "=========RUN_POLICIES=========")
+    with Scheduler(N_JOBS) as scheduler:
+        scheduler.run(evals)
+
+    #=====================
+    # STORING RESULTS
+    #=====================
+    if opts.STORE > 0: # Curves reused by sweep and plot
+        from os import makedirs
+        makedirs('output', exist_ok = True)
+        path = result_path('output', config)
+        save(path, config, evals)
+        c_print(5, "simulate: results stored in {}", path)
+
+        #=====================
+        # PLOTTING RESULTS
+        #=====================
+        if opts.VERBOSE: # Same figures of plot, rendered from the stored curves
+            try:
+                from adaptiveRank.Plot import render_file
+                render_file(path, 'output', opts.BANDS)
+            except Exception as e: # The results are safe anyway
+                c_print(5, "simulate: figures not rendered ({}), retry with: python -m adaptiveRank plot {}", e, path)
+    return 0
+
+
+def sweep(argv):
+    '''Grid of experiments of JSON specs on one shared worker pool, every cell stored when over (former sweep.py).'''
+    #====================
+    # SWEEP PARAMETERS
+    #====================
+    parser = _parser('sweep', "[options] spec.json [spec.json ...]")
+    parser.add_option('--n_jobs', dest = 'N_JOBS', default = '0', type = 'int', help = "Number of worker processes shared by all the cells (0: one per core)")
+    parser.add_option('--output', dest = 'OUTPUT', default = 'output', type = 'string', help = "Directory of the stored results")
+    parser.add_option('--cache_dir', dest = 'CACHE_DIR', default = 'output/cache', type = 'string', help = "Directory of the cached evaluations ('' disables the cache)")
+    parser.add_option('--cache_mb', dest = 'CACHE_MB', default = '1024', type = 'int', help = "Size of the cache, least recently used evaluations are evicted")
+    parser.add_option('--force', dest = 'FORCE', default = '0', type = 'int', help = "Recompute the cells already stored")
+    parser.add_option('--dry', dest = 'DRY', default = '0', type = 'int', help = "Only list the cells to compute")
+    parser.add_option('--checkpoint_dir', dest = 'CHECKPOINT_DIR', default = None, type = 'string', help = "Directory of the snapshots of the repetitions being played, resumed from after a crash")
+    parser.add_option('--checkpoint_s', dest = 'CHECKPOINT_S', default = '60', type = 'float', help = "Seconds between two snapshots of a repetition")
+    parser.add_option('--profile_dir', dest = 'PROFILE_DIR', default = None, type = 'string', help = "Directory of the JSON phase profiles of the repetitions (cache bypassed)")
+    parser.add_option('--profile_memory', dest = 'PROFILE_MEMORY', default = '0', type = 'int', help = "Traced allocations peak of every phase in the profiles (slow)")
+    (opts, args) = parser.parse_args(argv)
+    if not args:
+        parser.error("a sweep spec is required")
+
+    import json
+    from os import makedirs
+    from os.path import exists
+    from adaptiveRank.Experiment import evaluations, expand, experiment_name, result_path, save
+
+    #=====================
+    # GRID EXPANSION
+    #=====================
+    cells = []
+    for spec in args:
+        with open(spec) as f:
+            cells.extend(expand(json.load(f)))
+    makedirs(opts.OUTPUT, exist_ok = True)
+    todo = [config for config in cells if opts.FORCE or not exists(result_path(opts.OUTPUT, config))]
+    c_print(5, "SWEEP: {} cells, {} to compute", len(cells), len(todo))
+    for config in todo:
+        c_print(5 if opts.DRY else 2, "SWEEP: {}", experiment_name(config))
+    if opts.DRY:
+        return 0
+
+    from adaptiveRank.ResultCache import ResultCache
+    from adaptiveRank.Scheduler import Scheduler
+
+    #=====================
+    # RUN OVER THE CELLS
+    #=====================
+    cache = ResultCache(opts.CACHE_DIR, opts.CACHE_MB << 20) if opts.CACHE_DIR and opts.PROFILE_DIR is None else None
+    evals = []
+    owners = {} # Evaluation -> cell
+    pending = []
+    for n, config in enumerate(todo):
+        cell = evaluations(config, opts.N_JOBS or None, cache = cache, checkpointDir = opts.CHECKPOINT_DIR, checkpointInterval = opts.CHECKPOINT_S,
+                profileDir = opts.PROFILE_DIR, profileMemory = opts.PROFILE_MEMORY)
+        pending.append(len(cell))
+        for evaluation in cell:
+            owners[id(evaluation)] = n
+        evals.append(cell)
+
+    def store(evaluation):
+        # A cell is saved as soon as all its policies are over
+        n = owners[id(evaluation)]
+        pending[n] -= 1
+        if pending[n] == 0:
+            save(result_path(opts.OUTPUT, todo[n]), todo[n], evals[n])
+            c_print(5, "SWEEP: stored {}", experiment_name(todo[n]))
+
+    with Scheduler(opts.N_JOBS or None) as scheduler:
+        scheduler.run([evaluation for cell in evals for evaluation in cell], store)
+    return 0
+
+
+def plot(argv):
+    '''Figures of stored results, headless and in parallel, without simulating again (former plot.py).'''
+    #====================
+    # PLOT PARAMETERS
+    #====================
+    parser = _parser('plot', "[options] [result.npz | directory | spec.json ...]")
+    parser.add_option('--output', dest = 'OUTPUT', default = 'output', type = 'string', help = "Directory of the figures")
+    parser.add_option('--results', dest = 'RESULTS', default = 'output', type = 'string', help = "Directory of the results of the sweep specs")
+    parser.add_option('--points', dest = 'POINTS', default = None, type = 'int', help = "Points kept per curve (default: Plot.POINTS)")
+    parser.add_option('--bands', dest = 'BANDS', default = '0', type = 'int', help = "Reward plot bands: 0 mean +- std/2, 1 lowest-highest stored percentiles (5th-95th by default)")
+    parser.add_option('--n_jobs', dest = 'N_JOBS', default = '0', type = 'int', help = "Number of processes rendering the figures (0: one per core)")
+    parser.add_option('--force', dest = 'FORCE', default = '0', type = 'int', help = "Render again the figures newer than their results")
+    (opts, args) = parser.parse_args(argv)
+
+    import json
+    from glob import glob
+    from os import makedirs
+    from os.path import exists, isdir, join
+    from adaptiveRank.Experiment import expand, result_path
+    from adaptiveRank.Plot import POINTS, render_file, up_to_date
+    from adaptiveRank.Scheduler import available_cpus
+
+    #=====================
+    # STORED RESULTS
+    #=====================
+    # Results of the given files, of the directories (default: output/) or of the cells of sweep specs
+    paths = []
+    for arg in args or ['output']:
+        if isdir(arg):
+            paths.extend(sorted(glob(join(arg, '*.npz'))))
+        elif arg.endswith('.json'):
+            with open(arg) as f:
+                paths.extend(result_path(opts.RESULTS, config) for config in expand(json.load(f)))
+        else:
+            paths.append(arg)
+    missing = [path for path in paths if not exists(path)]
+    for path in missing:
+        c_print(5, "PLOT: {} not stored yet, skipped", path)
+    paths = [path for path in paths if exists(path)]
+    makedirs(opts.OUTPUT, exist_ok = True)
+    todo = [path for path in paths if opts.FORCE or not up_to_date(path, opts.OUTPUT)]
+    c_print(5, "PLOT: {} results, {} to render", len(paths), len(todo))
+    points = opts.POINTS or POINTS
+
+    #=====================
+    # RENDERING
+    #=====================
+    nbJobs = min(opts.N_JOBS or available_cpus(), len(todo))
+    if nbJobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(nbJobs) as pool:
+            figures = list(pool.map(render_file, todo, [opts.OUTPUT] * len(todo), [opts.BANDS] * len(todo), [points] * len(todo)))
+    else:
+        figures = [render_file(path, opts.OUTPUT, opts.BANDS, points) for path in todo]
+    for path, names in zip(todo, figures):
+        c_print(5, "PLOT: {} -> {}", path, names)
+    return 0
+
+
+def bench(argv):
+    '''Pulls per second and peak memory of MAB.play() per policy and parameter, micro-benchmarks of the hot helpers,
+    stored as JSON and compared with a previous report.'''
+    #====================
+    # BENCHMARK PARAMETERS
+    #====================
+    parser = _parser('bench', "[options]")
+    parser.add_option('--output', dest = 'OUTPUT', default = 'output/bench.json', type = 'string', help = "Report of the run")
+    parser.add_option('--baseline', dest = 'BASELINE', default = None, type = 'string', help = "Previous report: throughput regressions are flagged")
+    parser.add_option('--threshold', dest = 'THRESHOLD', default = 0.1, type = 'float', help = "Relative throughput drop flagged as a regression")
+    parser.add_option('--policies', dest = 'POLICIES', default = None, type = 'string', help = "Comma separated registry names (default: all the benchmarked ones)")
+    parser.add_option('-T', dest = 'T', default = None, type = 'int', help = "Horizon of the base point")
+    parser.add_option('--scale', dest = 'SCALE', default = '1', type = 'int', help = "Scaling curves over k, fra_top, max_delay, tau, T and n_rep")
+    parser.add_option('--micro', dest = 'MICRO', default = '1', type = 'int', help = "Micro-benchmarks of the hot helpers")
+    (opts, args) = parser.parse_args(argv)
+
+    from os import makedirs
+    from os.path import dirname
+    from adaptiveRank import Benchmark
+    from adaptiveRank.policies import REGISTRY
+
+    base = dict(Benchmark.BASE)
+    if opts.T:
+        base['T'] = opts.T
+    policies = opts.POLICIES.split(',') if opts.POLICIES else Benchmark.POLICIES
+    unknown = [name for name in policies if name not in REGISTRY]
+    if unknown:
+        parser.error("unknown policies {}, registered: {}".format(', '.join(unknown), ', '.join(sorted(REGISTRY))))
+    report = Benchmark.run(policies, base, Benchmark.SCALE if opts.SCALE else {}, opts.MICRO)
+    makedirs(dirname(opts.OUTPUT) or '.', exist_ok = True)
+    Benchmark.save(opts.OUTPUT, report)
+    c_print(5, "BENCH: report stored in {}", opts.OUTPUT)
+
+    if opts.BASELINE:
+        slower = Benchmark.regressions(report, Benchmark.load(opts.BASELINE), opts.THRESHOLD)
+        for label, old, new in slower:
+            c_print(5, "BENCH: REGRESSION {}: {:.0f} -> {:.0f} per second ({:+.1%})", label, old, new, new / old - 1.0)
+        c_print(5, "BENCH: {} regressions beyond {:.0%} against {}", len(slower), opts.THRESHOLD, opts.BASELINE)
+        return 1 if slower else 0
+    return 0
+
+
+COMMANDS = {'simulate': simulate, 'sweep': sweep, 'plot': plot, 'bench': bench}
+
+def main(argv = None):
+    '''Dispatches argv (default: the command line) to its subcommand.'''
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS:
+        if argv and argv[0] not in ('-h', '--help'):
+            sys.stderr.write("Unknown command {}\n".format(argv[0]))
+        sys.stderr.write("usage: python -m adaptiveRank {{{}}} [options]\n".format(', '.join(COMMANDS)))
+        return 0 if argv and argv[0] in ('-h', '--help') else 2
+    return COMMANDS[argv[0]](argv[1:])
@@ -0,0 +1,39 @@
+'''Lazy view over the arm states of a MAB round'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from numpy import arange, asarray
+
+class ArmStates:
+    '''Expected rewards of the arms at the current delays, passed to policy.choice().
+    A state is computed only when the policy reads it: compute maps arm indexes to their states.'''
+
+    def __init__(self, compute, nbArms):
+        self._compute = compute
+        self._nbArms = nbArms
+        self._states = None # All the states, once materialized
+
+    def __len__(self):
+        return self._nbArms
+
+    def __getitem__(self, index):
+        if self._states is not None:
+            return self._states[index]
+        if isinstance(index, slice):
+            return self._compute(arange(self._nbArms)[index])
+        return self._compute(asarray([index]))[0]
+
+    def __array__(self, dtype = None, copy = None):
+        if self._states is None:
+            self._states = asarray(self._compute(arange(self._nbArms)))
+        return self._states if dtype is None else self._states.astype(dtype)
+
+    def __iter__(self):
+        return iter(self.__array__())
+
+    def __repr__(self):
+        return repr(self.__array__())
+
+    def argmax(self):
+        return self.__array__().argmax()
@@ -0,0 +1,59 @@
+'''Closed form evaluation of periodic schedules'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from numpy import arange, asarray, concatenate, cumsum, diff, searchsorted, zeros
+
+NEVER_PULLED = -1
+
+
+class Cyclic:
+    '''Block of single-arm pulls repeated from round t0 up to the horizon.
+    Once the block has been played a whole time, each arm sees the same delay at every cycle:
+    its expected rewards are computed once and the cumulative curves are obtained in closed form.'''
+
+    def __init__(self, table, maxDelay, lastPull, block, t0, horizon):
+        self.block = list(block)
+        self.t0 = t0
+        self.horizon = horizon
+        last = list(lastPull)
+        expected = []
+        for j, arm in enumerate(self.block):
+            t = t0 + j
+            delay = 0 if last[arm] == NEVER_PULLED else min(t - last[arm], maxDelay + 1)
+            expected.append(table[arm][delay])
+            last[arm] = t
+        self.expected = asarray(expected, dtype = float) # Expected reward of every block position
+        self._prefix = concatenate(([0.0], cumsum(self.expected)))
+
+    def _counts(self, rounds):
+        # Pulls of every block position in [t0, t] for each of the rounds
+        m = asarray(rounds) - self.t0 + 1
+        L = len(self.block)
+        return m[:, None] // L + (arange(L)[None, :] < (m % L)[:, None])
+
+    def expectedCurve(self, rounds):
+        '''Expected reward gathered by the periodic part up to each round (rounds >= t0).'''
+        m = asarray(rounds) - self.t0 + 1
+        L = len(self.block)
+        return (m // L) * self._prefix[-1] + self._prefix[m % L]
+
+    def sampledCurve(self, rounds, rng):
+        '''Binary rewards gathered up to each round (rounds >= t0, sorted): the pulls of a block position
+        between two consecutive rounds are Bernoulli with the same mean, drawn at once as a binomial.'''
+        counts = self._counts(rounds)
+        segments = diff(concatenate((zeros((1, len(self.block)), dtype = counts.dtype), counts)), axis = 0)
+        return cumsum(rng.binomial(segments, self.expected).sum(axis = 1)).astype(float)
+
+
+def explicit_curve(rewards, rounds):
+    '''Cumulative rewards of the explicitly simulated rounds (rounds < len(rewards)).'''
+    return cumsum(rewards)[asarray(rounds, dtype = int)] if len(rounds) else zeros(0)
+
+
+def split(rounds, t0):
+    '''Rounds before t0 and from t0 on.'''
+    rounds = asarray(rounds)
+    k = searchsorted(rounds, t0)
+    return rounds[:k], rounds[k:]
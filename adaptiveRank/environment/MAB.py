@@ -4,20 +4,48 @@ __author__ = "Leonardo Cella"
 __version__ = "0.1"
 
 from adaptiveRank.environment.Environment import Environment
+from adaptiveRank.environment.ArmStates import ArmStates
+from adaptiveRank.environment.Cyclic import Cyclic, explicit_curve, split
+from adaptiveRank.Checkpoint import Checkpoint
 from adaptiveRank.Results import *
-from adaptiveRank.tools.io import c_print
-from adaptiveRank.arm.Bernoulli import Bernoulli
-from adaptiveRank.arm.HashBernoulli import HashBernoulli
-
-from numpy import arange, argmax, around, array, linspace, unique, where, zeros
-from random import seed, randint
-import sortednp as snp
+from adaptiveRank.Schedule import Schedule, distinct, segments
+from adaptiveRank.tools.io import c_print, TRACE
+from adaptiveRank.arm.ArmBank import ArmBank
+from adaptiveRank.tools.streams import BLOCK_SIZE, generator, read, repetition_streams, StreamBank
+from adaptiveRank.tools.kernels import NUMBA, pull_choice
+from adaptiveRank.tools.profiling import PhaseProfiler, Profiled, unwrapped
+
+from functools import lru_cache, partial
+from os import makedirs
+from os.path import join
+from numpy import append, arange, argmax, around, array, asarray, concatenate, empty, frombuffer, full, int64, linspace, minimum, ones, resize, take_along_axis, unique, where, zeros
+from random import getstate, seed, setstate, randint, Random
+
+NEVER_PULLED = -1 # Last pull round of the arms not pulled yet (null delay)
+FLUSH = 4096 # Rounds buffered by play_batch() before being written to the Results (multiple of 8)
+BULK = 1 << 16 # Rounds per chunk of the bulk pulls of a repeated block
+
+
+def best_rank(table, maxDelay):
+    '''r_star of a payoff table: index of the last r maximizing the average payoff, rounded to 3 decimals, of the
+    first r + 1 arms pulled at the delay min(r + 1, maxDelay + 1). Shared by the repetitions with the same arms.'''
+    return _best_rank(table.tobytes(), table.shape, maxDelay)
+
+@lru_cache(maxsize = 256)
+def _best_rank(data, shape, maxDelay):
+    # Prefix sums over the arms, for every delay: the averages of all the ranks at once
+    table = frombuffer(data).reshape(shape)
+    ranks = arange(1, shape[0] + 1)
+    avgs = around(table.cumsum(axis = 0)[ranks - 1, minimum(ranks, maxDelay + 1)] / ranks, 3)
+    if TRACE:
+        c_print(1, "MAB.py, best_rank(), Obtained avgs: {}", avgs)
+    return len(avgs) - 1 - int(argmax(avgs[::-1])) # Ties: the largest rank
 
 class MAB(Environment):
     """Multi-armed bandit problem with arms given in the 'arms' list"""
 
-    def __init__(self, horizon, nbBuckets, gamma, fraTop, maxDelay, binary_rewards, modality, policy_name, SWITCHING, SC):
-        c_print(4, "MAB.py, INIT horizon {}, nbBuckets {}, gamma {}, fraTop {}, maxDelay {}, binary_rewards {}, policy {}, switching {}".format(horizon, nbBuckets, gamma, fraTop, maxDelay, binary_rewards,  policy_name, SWITCHING))
+    def __init__(self, horizon, nbBuckets, gamma, fraTop, maxDelay, binary_rewards, modality, policy_name, SWITCHING, SC, seed = 0, recordChoices = True, traceDir = None, kernel = NUMBA, checkpointDir = None, checkpointInterval = 60.0, profileDir = None, profileMemory = False):
+        c_print(4, "MAB.py, INIT horizon {}, nbBuckets {}, gamma {}, fraTop {}, maxDelay {}, binary_rewards {}, policy {}, switching {}", horizon, nbBuckets, gamma, fraTop, maxDelay, binary_rewards,  policy_name, SWITCHING)
         self.horizon = horizon
         self.nbBuckets = nbBuckets
         self.gamma = gamma
@@ -26,9 +54,17 @@ class MAB(Environment):
         self._binary_rewards = binary_rewards # Specifies whether to use binary rewards or not
         self._modality = modality # Specifies the learning problem: 0 full, 1 arm ordering, 2 rank estimation
         self.policy_name = policy_name
-        self.arms = [] # List of Bernoulli/HashBernoulli objects
+        self.arms = None # ArmBank of the current repetition
         self.nbArms = 0
         self.r_star = 0
+        self.seed = seed # Root of the (repetition, arm) random streams
+        self.recordChoices = recordChoices # Store the pulled arms, not only the rewards
+        self.traceDir = traceDir # Directory of the memory-mapped traces (None: in memory)
+        self.kernel = kernel # Compiled pulls for the policies with updateBlock() (default: Numba installed)
+        self.checkpointDir = checkpointDir # Snapshots of the repetitions being played, resumed from (None: disabled)
+        self.checkpointInterval = checkpointInterval # Seconds between two snapshots
+        self.profileDir = profileDir # Phase profiles of the repetitions, as JSON (None: not profiled)
+        self.profileMemory = profileMemory # Traced allocations peak of every phase in the profiles (slow)
 
         ### Switching Costs
         self._SC = SC
@@ -36,177 +72,491 @@ class MAB(Environment):
         self._SWITCHING = SWITCHING # Canary for given means
 
 
-    def compute_states(self):
-        '''Called at every step in the play() method. Manages the trajectory evolution.'''
-        assert len(self._armsDelay) == len(self._armsStates), "MAB compute_states: Incoherent size"
+    def config(self):
+        '''Parameters the outcome of play() depends on.'''
+        return {'horizon': self.horizon, 'nbBuckets': self.nbBuckets, 'gamma': self.gamma, 'fraTop': self.fraTop,
+                'maxDelay': self.maxDelay, 'binary': self._binary_rewards, 'modality': self._modality,
+                'policy': self.policy_name, 'switching': self._SWITCHING, 'SC': self._SC, 'seed': self.seed}
+
+
+    def compute_states(self, t, indexes = None):
+        '''Expected rewards at round t of the arms in indexes (all of them by default).'''
+        if indexes is None:
+            indexes = self._armsIndexes
+        states = self.arms.states(self._delays_of(asarray(self._lastPull)[indexes], t), indexes)
+        if TRACE:
+            c_print(1, "MAB.py, states() round {}, indexes {}, states {}", t, indexes, states)
+        return states
 
-        for i, arm, delay in zip(self._armsIndexes, self.arms, self._armsDelay):
-            if self._SWITCHING == True and delay > self.maxDelay:
-                self._armsStates[i] = arm.computeState(0)
-            else:
-                self._armsStates[i] = arm.computeState(int(delay))
-            c_print(1, "MAB.py, states() Index {}, arm {}, delay {}".format(i, arm, delay))
 
-        c_print(1, "MAB.py, states() {}".format(self._armsStates))
-        return
+    def _delay(self, arm, t):
+        '''Delay suffered by arm at round t: rounds since its last pull, saturated at maxDelay + 1.'''
+        last = self._lastPull[arm]
+        if last == NEVER_PULLED:
+            return 0
+        return min(t - last, self.maxDelay + 1)
 
 
     def play(self, policy, horizon, nbRepetition):
-        ''' Called once per policy from __init__ of Evaluation. Rounds scheduler.'''
-        c_print(1, "MAB.py, play()")
+        ''' Called once per policy from __init__ of Evaluation. Rounds scheduler.
+        Only the last pull round of each arm is tracked: delays and states are derived on demand.'''
+        if TRACE:
+            c_print(1, "MAB.py, play()")
 
-        # Result data structure initialization
-        result = Result(horizon)
         t = 0
+        kernel = self.kernel and hasattr(policy, 'updateBlock') and not TRACE
+        checkpoint = self._checkpoint(policy, horizon, nbRepetition, kernel)
+        profiler = PhaseProfiler(self.profileMemory) if self.profileDir is not None else None
 
         # Arm Creation
         self.nbArms = self._arm_creation(nbRepetition)
-        self._armsDelay = [0]*self.nbArms
+        result = self._new_result(horizon, nbRepetition)
+        self._lastPull = [NEVER_PULLED] * self.nbArms
         self._armsIndexes = arange(self.nbArms)
         assert self._armsIndexes[-1] == self.nbArms -1, "Wrong arm creation"
-        c_print(4, "MAB.py, play(), init: Arm Indexes {} Binary Rewards {}".format(self._armsIndexes, self._binary_rewards))
-        self._armsStates = zeros(self.nbArms) # Expected rewards of each arm according to suffered delays
+        c_print(4, "MAB.py, play(), init: Arm Indexes {} Binary Rewards {}", self._armsIndexes, self._binary_rewards)
+        self._streams = repetition_streams(self.seed, nbRepetition, self.nbArms)
         self.r_star = self._r_star_computation()
-
-        result.setNbArms(self.nbArms)
+        payoffs = self._payoffRows
 
         # Learning Modality Message Passing
         if self._modality == 2 and self.policy_name in ['PI Low', 'PI ucb']: # Rank Estimation 
             policy.overwriteArmMeans(self._meanArms)
 
-        while t < horizon:
-            c_print(1, "\n===\nMAB.py, play(): round {}\n===".format(t))
+        # RStar policy update
+        if self.policy_name == "Ghost":
+            policy.initialize(self.r_star)
 
-            if t == 0:
-                self.compute_states()
-                c_print(1, "MAB.py, play(): current delays: {}".format(self._armsDelay))
-                c_print(1, "MAB.py, play(): arm states: {}".format(self._armsStates))
-                # RStar policy update
-                if self.policy_name == "Ghost":
-                    policy.initialize(self.r_star)
+        if profiler is not None: # Choices and updates timed, phases followed
+            policy = profiler.wrap(policy)
+
+        if kernel:
+            result = self._play_kernel(policy, horizon, nbRepetition, result, checkpoint)
+            return self._profiled(profiler, result, horizon, nbRepetition)
+
+        # Resumed run: the state of the last snapshot replaces the one just built
+        self._past_len = 0
+        uniforms = lambda c, m: self._streams[c].uniforms(m)
+        snapshot = lambda t, **pending: self._state(t, policy, result, lastPull = self._lastPull, pastLen = self._past_len, streams = self._streams, **pending)
+        state = checkpoint.load() if checkpoint is not None else None
+        if state is not None:
+            t, policy = state['t'], self._resume(policy, state, result)
+            self._lastPull, self._past_len, self._streams = state['lastPull'], state['pastLen'], state['streams']
+            if 'pending' in state: # Taken within the repeated passes of a block
+                t = self._pull_repeated(policy, result, state['pending']['block'], state['pending']['passes'], t, horizon, uniforms, checkpoint, snapshot)
+
+        while t < horizon:
+            if checkpoint is not None and checkpoint.due(t): # Between two choices
+                checkpoint.save(snapshot(t))
+            if TRACE:
+                c_print(1, "\n===\nMAB.py, play(): round {}\n===", t)
+                c_print(1, "MAB.py, play(): current delays: {}", [self._delay(i, t) for i in self._armsIndexes])
 
             # Structured Choice and Feedback 
-            choice = policy.choice(self._armsStates)
-            current_len = len(set(choice))
+            choice = policy.choice(ArmStates(partial(self.compute_states, t), self.nbArms))
+            current_len = distinct(choice)
 
             # Cost computation
             cost = 0.0
             if self._SC and t != 0 and self._past_len != current_len:
-                c_print(1, "Past len {} current len {}".format(self._past_len, current_len))
+                if TRACE:
+                    c_print(1, "Past len {} current len {}", self._past_len, current_len)
                 cost = 1.0
+            self._past_len = current_len
+            passes = self._bulk_passes(policy, choice)
+            if passes: # Repeated block: only its first pass is played one pull at a time
+                choice = Schedule(choice.block, choice.count - passes, choice.prefix)
 
-            tmp = 0
             for c in choice:
-                tmp = tmp + 1
-                if self._SWITCHING == True and self._armsDelay[c] > self.maxDelay:
-                    expected_reward, reward = self.arms[c].draw(0, nbRepetition)
-                else:
-                    expected_reward, reward = self.arms[c].draw(self._armsDelay[c], nbRepetition)
+                delay = self._delay(c, t)
+                expected_reward = payoffs[c][delay]
+                reward = self._streams[c].bernoulli(expected_reward)
 
-                c_print(1, "\nMAB.py, play(): Chosen arm: {} at round: {} with rwd {}".format(c, t, reward))
-                c_print(1, "MAB.py, play(): Arm {}".format(self.arms[c]))
-                c_print(1, "MAB.py, play(): arm states: {}".format(self._armsStates))
-                c_print(1, "MAB.py, play(): Suffered delays: {}".format(self._armsDelay))
+                if TRACE:
+                    c_print(1, "\nMAB.py, play(): Chosen arm: {} at round: {} with rwd {}", c, t, reward)
+                    c_print(1, "MAB.py, play(): {}, suffered delay {}", self.arms.describe(c), delay)
 
-                policy.update(c, reward, self._armsDelay[c])
+                policy.update(c, reward, delay)
 
                 # Reward with (possible) cost penalization
-                if self._SC == 1:
-                    if self._binary_rewards:
-                        result.store(t, c, (1.0*reward) - cost)
-                    else:
-                        result.store(t, c, (1.0*expected_reward) - cost)
-                    cost = 0.0
+                if self._binary_rewards:
+                    result.store(t, c, reward, cost)
                 else:
-                    if self._binary_rewards:
-                        result.store(t, c, reward)
-                    else:
-                        result.store(t, c, expected_reward)
-
-                # Delays update
-                for i in self._armsIndexes:
-                    d = int(self._armsDelay[i])
-                    # Not the chosen arm and already pulled once
-                    if d != 0 and i != c:
-                        self._armsDelay[i] = int(self._armsDelay[i]) + 1
-                    # I cannot put it to zero or it seems like an unpulled arm
-                    if d > self.maxDelay:
-                        self._armsDelay[i] = int(self.maxDelay) + 1
-                    if i == c:
-                        self._armsDelay[i] = 1
-
-                # States update
-                self.compute_states()
+                    result.store(t, c, expected_reward, cost)
+                cost = 0.0
+
+                # Delays update: O(1), the other arms age implicitly
+                self._lastPull[c] = t
 
                 # Additional termination condition due to finite horizon
-                if t == horizon - 1:
-                    return result
                 t = t + 1
-                self._past_len = len(set(choice))
+                if t == horizon:
+                    break
+
+            if passes:
+                t = self._pull_repeated(policy, result, choice.block, passes, t, horizon, uniforms, checkpoint, snapshot)
+
+        if checkpoint is not None: # The result is handed back, nothing left to resume
+            checkpoint.remove()
+        return self._profiled(profiler, result, horizon, nbRepetition)
+
+
+    def _play_kernel(self, policy, horizon, nbRepetition, result, checkpoint = None):
+        ''' Round loop of play() with the pulls of each choice run by the compiled kernel and the policy
+        fed through updateBlock(). Same uniforms in the same order: the trajectories are identical.'''
+        nbArms = self.nbArms
+        generators = [generator(self.seed, nbRepetition, arm) for arm in range(nbArms)]
+        buffers = empty((nbArms, BLOCK_SIZE))
+        positions = full(nbArms, BLOCK_SIZE, dtype = int64) # Filled on first read
+        lastPull = full(nbArms, NEVER_PULLED, dtype = int64)
+        self._lastPull = lastPull
+        table = self._payoffTable
+        t = 0
+        past_len = 0
+        uniforms = lambda c, m: self._read(generators, buffers, positions, c, m)
+        snapshot = lambda t, **pending: self._state(t, policy, result, lastPull = lastPull, pastLen = past_len, generators = generators, buffers = buffers, positions = positions, **pending)
+        state = checkpoint.load() if checkpoint is not None else None
+        if state is not None:
+            t, policy, past_len = state['t'], self._resume(policy, state, result), state['pastLen']
+            generators, buffers, positions = state['generators'], state['buffers'], state['positions']
+            lastPull = self._lastPull = state['lastPull']
+            if 'pending' in state: # Taken within the repeated passes of a block
+                t = self._pull_repeated(policy, result, state['pending']['block'], state['pending']['passes'], t, horizon, uniforms, checkpoint, snapshot)
+        while t < horizon:
+            if checkpoint is not None and checkpoint.due(t):
+                checkpoint.save(snapshot(t))
+            choice = policy.choice(ArmStates(partial(self._states_of, table, lastPull, t), nbArms))
+            current_len = distinct(choice)
+            cost = 1.0 if self._SC and t != 0 and past_len != current_len else 0.0
+            past_len = current_len
+            passes = self._bulk_passes(policy, choice)
+            if passes:
+                choice = Schedule(choice.block, choice.count - passes, choice.prefix)
+
+            for segment in segments(choice): # A Schedule block is pulled count times, never expanded
+                m = len(segment)
+                arms, delays = empty(m, dtype = int64), empty(m, dtype = int64)
+                rewards, expected = empty(m), empty(m)
+                start = 0
+                while start < m and t < horizon:
+                    n = pull_choice(segment, start, t, horizon, table, lastPull, self.maxDelay, buffers, positions, arms, delays, rewards, expected)
+                    if n == 0: # Next arm stream exhausted
+                        c = segment[start]
+                        generators[c].random(BLOCK_SIZE, out = buffers[c])
+                        positions[c] = 0
+                        continue
+                    stop = start + n
+                    policy.updateBlock(arms[start:stop], rewards[start:stop], delays[start:stop])
+                    costs = zeros(n)
+                    costs[0] = cost
+                    cost = 0.0
+                    result.storeRange(t, arms[start:stop], rewards[start:stop] if self._binary_rewards else expected[start:stop], costs)
+                    t += n
+                    start = stop
+                if t == horizon:
+                    break
+            if passes and t < horizon:
+                t = self._pull_repeated(policy, result, choice.block, passes, t, horizon, uniforms, checkpoint, snapshot)
+        if checkpoint is not None:
+            checkpoint.remove()
+        return result
+
+
+    def _checkpoint(self, policy, horizon, nbRepetition, kernel):
+        '''Checkpoint of the repetition, identified by everything its outcome depends on (policy not played yet).'''
+        if self.checkpointDir is None:
+            return None
+        identity = {'environment': self.config(), 'policy': type(policy).__module__ + '.' + type(policy).__name__,
+                'parameters': vars(policy), 'horizon': horizon, 'repetition': nbRepetition, 'engine': 'kernel' if kernel else 'play'}
+        return Checkpoint(self.checkpointDir, identity, self.checkpointInterval)
+
+
+    def _state(self, t, policy, result, **streams):
+        '''Snapshot at round t, between two choices or two chunks of repeated passes (pending block and passes left):
+        the policy, the random states (streams and the one of the policies), the last pulls and the rounds stored
+        so far. The arms are built again on resume.'''
+        state = {'t': t, 'policy': unwrapped(policy), 'random': getstate(), 'result': result.snapshot(t)}
+        state.update(streams)
+        return state
+
+
+    def _resume(self, policy, state, result):
+        '''Restores the random state and the stored rounds of the snapshot, returns its policy (profiled as policy).'''
+        setstate(state['random'])
+        result.restore(state['result'])
+        return policy.profiler.wrap(state['policy']) if isinstance(policy, Profiled) else state['policy']
+
 
+    def _profiled(self, profiler, result, horizon, nbRepetition):
+        '''Stores the profile of the repetition, if any, and returns its result.'''
+        if profiler is not None:
+            makedirs(self.profileDir, exist_ok = True)
+            path = join(self.profileDir, "{}_rep{}.json".format(self.policy_name.replace(' ', '_'), nbRepetition))
+            profiler.save(path, policy = self.policy_name, repetition = nbRepetition, horizon = horizon, environment = self.config())
+            c_print(2, "MAB.py, play(): profile stored in {}", path)
         return result
 
 
+    def _read(self, generators, buffers, positions, arm, m):
+        u, positions[arm] = read(generators[arm], buffers[arm], positions[arm], m)
+        return u
+
+
+    def _bulk_passes(self, policy, choice):
+        '''Passes of a Schedule block left to _pull_repeated(): all but the first one, after which the delays
+        of its (distinct) arms are constant. 0 without the aggregated updates of the policy or when tracing.'''
+        if TRACE or not isinstance(choice, Schedule) or not hasattr(policy, 'updateAggregate'):
+            return 0
+        if choice.count < 2 or len(set(choice.block)) != len(choice.block):
+            return 0
+        return choice.count - 1
+
+
+    def _pull_repeated(self, policy, result, block, passes, t, horizon, uniforms, checkpoint = None, snapshot = None):
+        ''' Pulls passes repetitions of block from round t on, right after a whole pass of it: every arm suffers
+        the delay min(len(block), maxDelay + 1), so its rewards are a vector of Bernoulli draws with a fixed mean,
+        read from its stream with uniforms(arm, m) in the same order as one pull at a time.
+        The policy receives one aggregated (arm, delay, sum, count) update per arm and chunk. With a checkpoint,
+        snapshot(t, pending = ...) is saved when due between two chunks. Returns the round reached.'''
+        L = len(block)
+        block = asarray(block, dtype = int64)
+        delays = full(L, min(L, self.maxDelay + 1), dtype = int64)
+        means = self._payoffTable[block, delays]
+        first = t
+        stop = min(t + passes * L, horizon)
+        while t < stop:
+            if checkpoint is not None and t > first and checkpoint.due(t): # Whole passes pulled so far
+                checkpoint.save(snapshot(t, pending = {'block': block.tolist(), 'passes': passes - (t - first) // L}))
+            n = min(stop - t, max(BULK // L, 1) * L)
+            rewards = empty(n)
+            sums, counts = zeros(L), zeros(L, dtype = int64)
+            for j in range(min(L, n)):
+                c = block[j]
+                sampled = 1.0 * (uniforms(c, len(range(j, n, L))) < means[j])
+                rewards[j::L] = sampled
+                sums[j], counts[j] = sampled.sum(), len(sampled)
+                self._lastPull[c] = int(t + j + (counts[j] - 1) * L)
+            policy.updateAggregate(block, delays, sums, counts)
+            result.storeRange(t, resize(block, n), rewards if self._binary_rewards else resize(means, n))
+            t += n
+        return t
+
+
+    def play_cyclic(self, policy, horizon, nbRepetition, rounds):
+        ''' Counterpart of play() for the policies whose pulls become periodic (policy.cycle() is not None).
+        The rounds are simulated as in play() until the cycle has been played once, then the expected and the
+        sampled cumulative rewards at the given (sorted) rounds come in closed form from Cyclic.
+        Returns the total reward and the two curves. Past the explicit rounds, the sampled curve has the distribution
+        of what play() would store but is drawn from its own generator: the same seed gives other samples.'''
+        self.nbArms = self._arm_creation(nbRepetition)
+        self._lastPull = [NEVER_PULLED] * self.nbArms
+        self._armsIndexes = arange(self.nbArms)
+        streams = repetition_streams(self.seed, nbRepetition, self.nbArms)
+        self.r_star = self._r_star_computation()
+        payoffs = self._payoffRows
+        if self._modality == 2 and self.policy_name in ['PI Low', 'PI ucb']: # Rank Estimation
+            policy.overwriteArmMeans(self._meanArms)
+        if self.policy_name == "Ghost":
+            policy.initialize(self.r_star)
+
+        # Explicit rounds: up to one whole cycle of single-arm pulls
+        stored, expected = [], []
+        t = 0
+        start = None # First round of the detected cycle
+        past_len = 0
+        while t < horizon:
+            block = policy.cycle()
+            if block is not None and past_len == 1:
+                if start is None:
+                    start = t
+                elif t - start >= len(block):
+                    break
+            choice = policy.choice(ArmStates(partial(self.compute_states, t), self.nbArms))
+            current_len = distinct(choice)
+            cost = 1.0 if self._SC and t != 0 and past_len != current_len else 0.0
+            past_len = current_len
+            for c in choice:
+                delay = self._delay(c, t)
+                expected_reward = payoffs[c][delay]
+                reward = streams[c].bernoulli(expected_reward)
+                policy.update(c, reward, delay)
+                stored.append((reward if self._binary_rewards else expected_reward) - cost)
+                expected.append(expected_reward - cost)
+                cost = 0.0
+                self._lastPull[c] = t
+                t += 1
+                if t == horizon:
+                    break
+
+        # Closed form beyond the explicit rounds
+        rounds = append(asarray(rounds, dtype = int), horizon - 1)
+        before, after = split(rounds, t)
+        curve, expectedCurve = explicit_curve(stored, before), explicit_curve(expected, before)
+        if len(after):
+            cyclic = Cyclic(payoffs, self.maxDelay, self._lastPull, block, t, horizon)
+            if self._binary_rewards:
+                periodic = cyclic.sampledCurve(after, generator(self.seed, nbRepetition, self.nbArms))
+            else:
+                periodic = cyclic.expectedCurve(after)
+            curve = concatenate((curve, sum(stored) + periodic))
+            expectedCurve = concatenate((expectedCurve, sum(expected) + cyclic.expectedCurve(after)))
+        return curve[-1], curve[:-1], expectedCurve[:-1]
+
+
+    def play_batch(self, policies, horizon, repIndexes):
+        ''' Batched counterpart of play(): steps the repetitions in repIndexes together, one policy each.
+        Last pulls and rewards are held as R x K arrays, so the delays of the chosen arms and the reward
+        draw are computed once per round for all the repetitions. The policies with batch() (UCB, Greedy) are
+        vectorized too: their choices and updates are array operations over the repetitions, with the
+        trajectories of play(). The others are still asked one by one, which leaves them as slow as play().'''
+        nbReps = len(policies)
+        assert nbReps == len(repIndexes), "MAB play_batch: one policy per repetition is required"
+        if TRACE:
+            c_print(1, "MAB.py, play_batch() over {} repetitions", nbReps)
+
+        # Per repetition arm creation: payoff tables R x K x (maxDelay + 2)
+        tables = []
+        randoms = [] # Global random state each repetition would start from in play()
+        for policy, rep in zip(policies, repIndexes):
+            self.nbArms = self._arm_creation(rep)
+            tables.append(self._payoffTable)
+            if self._SWITCHING == False or not randoms: # Given means: no reseeding, play() goes on with the same state
+                randoms.append(Random())
+                randoms[-1].setstate(getstate())
+            else:
+                randoms.append(randoms[-1])
+            self.r_star = self._r_star_computation()
+            if self._modality == 2 and self.policy_name in ['PI Low', 'PI ucb']: # Rank Estimation
+                policy.overwriteArmMeans(self._meanArms)
+            if self.policy_name == "Ghost":
+                policy.initialize(self.r_star)
+        tables = array(tables)
+        nbArms = self.nbArms
+
+        # Repetitions data structures: the outcomes are buffered for FLUSH rounds
+        rows = arange(nbReps)
+        lastPull = full((nbReps, nbArms), NEVER_PULLED)
+        results = [self._new_result(horizon, rep) for rep in repIndexes]
+        choices = zeros((nbReps, FLUSH), dtype = int)
+        rewards = zeros((nbReps, FLUSH))
+        costs = zeros((nbReps, FLUSH))
+        chosen = zeros(nbReps, dtype = int)
+        cost = zeros(nbReps)
+        queues = [[] for _ in rows]
+        positions = [0] * nbReps
+        past_len = [0] * nbReps
+        streams = StreamBank(self.seed, repIndexes, nbArms)
+        batch = policies[0].batch(policies, nbArms, randoms) if hasattr(policies[0], 'batch') and not TRACE else None
+
+        for t in range(horizon):
+            # Structured Choices: a new one is asked only once the previous one is exhausted
+            if batch is not None: # Single arm choices of all the repetitions at once
+                chosen = batch.choice(partial(self._batch_states, tables, lastPull, t))
+            else:
+                for r in rows:
+                    if positions[r] == len(queues[r]):
+                        states = ArmStates(partial(self._states_of, tables[r], lastPull[r], t), nbArms)
+                        queues[r] = policies[r].choice(states)
+                        positions[r] = 0
+                        current_len = distinct(queues[r])
+                        if self._SC and t != 0 and past_len[r] != current_len:
+                            cost[r] = 1.0
+                        past_len[r] = current_len
+                    chosen[r] = queues[r][positions[r]]
+                    positions[r] += 1
+
+            # Vectorized feedback over the repetitions
+            delays = self._delays_of(lastPull[rows, chosen], t)
+            expected_rewards = tables[rows, chosen, delays]
+            sampled = streams.bernoulli(chosen, expected_rewards)
+
+            if batch is not None:
+                batch.update(chosen, sampled)
+            else:
+                for policy, c, reward, delay in zip(policies, chosen.tolist(), sampled.tolist(), delays.tolist()):
+                    policy.update(c, reward, delay)
+
+            # Reward with (possible) cost penalization
+            b = t % FLUSH
+            choices[:, b] = chosen
+            rewards[:, b] = sampled if self._binary_rewards else expected_rewards
+            costs[:, b] = cost
+            cost[:] = 0.0
+
+            # Delays update: only the chosen arms are touched
+            lastPull[rows, chosen] = t
+
+            if b == FLUSH - 1 or t == horizon - 1:
+                for r in rows:
+                    results[r].storeRange(t - b, choices[r, :b + 1], rewards[r, :b + 1], costs[r, :b + 1])
+
+        if batch is not None:
+            batch.close()
+        return results
+
+
+    def _new_result(self, horizon, rep):
+        '''Empty Result of a repetition, memory-mapped in traceDir if given.'''
+        path = None
+        if self.traceDir is not None:
+            path = join(self.traceDir, "{}_rep{}".format(self.policy_name.replace(' ', '_'), rep))
+        result = Result(horizon, self.nbArms, self._binary_rewards, self._SC, path, self.recordChoices)
+        result.setNbArms(self.nbArms)
+        return result
+
+
+    def _delays_of(self, lastPull, t):
+        return where(lastPull == NEVER_PULLED, 0, minimum(t - lastPull, self.maxDelay + 1))
+
+
+    def _states_of(self, table, lastPull, t, indexes):
+        return table[indexes, self._delays_of(lastPull[indexes], t)]
+
+
+    def _batch_states(self, tables, lastPull, t):
+        # R x K states of all the repetitions
+        return take_along_axis(tables, self._delays_of(lastPull, t)[:, :, None], axis = 2)[:, :, 0]
+
+
     def _arm_creation(self, seed_init):
+        '''Creates the ArmBank of a repetition and its K x (maxDelay + 2) payoff table.'''
         if self._SWITCHING == False:
             self._meanArms = []
             seed(seed_init)
             starting_grid = linspace(0.0, 1.0, self.nbBuckets, endpoint = True)
-            c_print(4, "MAB.py arm_creation() Buckets: {}".format(starting_grid))
+            c_print(4, "MAB.py arm_creation() Buckets: {}", starting_grid)
             delta = 1.0/(self.nbBuckets) # Previously adopted delta
             new_extreme = delta*(self.fraTop)*self.nbBuckets
             good_arms = linspace(0, new_extreme, self.nbBuckets, endpoint = False)
-            c_print(4, "MAB.py arm_creation() Good arms: {} with extreme point: {}".format(good_arms, new_extreme))
-            means = array(snp.merge(starting_grid, good_arms)) # evenly round to 2 decimals 
-            means = around(unique(means), 3)
+            c_print(4, "MAB.py arm_creation() Good arms: {} with extreme point: {}", good_arms, new_extreme)
+            means = around(unique(concatenate((starting_grid, good_arms))), 3) # merged sorted grids
             self._meanArms = 1 - means
             nbArms = len(means)
             c_print(4, "\n=========MAB_INIT=========")
-            c_print(4, "MAB.py, arm_creation(), Arm means: {}".format(self._meanArms))
-            for i in range(nbArms):
-                mu = self._meanArms[i]
-                #if self._SWITCHING == False:
-                delayLB = 1
-                delayUB = 1 + randint(seed_init, self.maxDelay - 1)
-                gamma = self.gamma
-                #else:
-                #    delayLB = self._given_delaysLB[i]
-                #    delayUB = self._given_delaysUB[i]
-                #    gamma = self._given_gamma
-                tmpArm = Bernoulli(mu, gamma, delayLB, delayUB, self._binary_rewards)
-                c_print(1, "MAB.py, arm_creation(), Created arm: {}".format(tmpArm))
-                self.arms.append(tmpArm)
+            c_print(4, "MAB.py, arm_creation(), Arm means: {}", self._meanArms)
+            delaysUB = [1 + randint(seed_init, self.maxDelay - 1) for _ in range(nbArms)]
+            self.arms = ArmBank.discounted(self._meanArms, full(nbArms, self.gamma), ones(nbArms, dtype = int), delaysUB, self.maxDelay + 2)
         else:
-            #1
-            self.arms.append(HashBernoulli(0.7, 0.75, 1.0, self._binary_rewards))
-            self.arms.append(HashBernoulli(0.606, 0.65, 0.86, self._binary_rewards))
-            #2
-            #self.arms.append(HashBernoulli(0.65, 0.6, 1.0, self._binary_rewards))
-            #self.arms.append(HashBernoulli(0.55, 0.5, 0.84, self._binary_rewards))
-            #3
-            #self.arms.append(HashBernoulli(0.5, 0.55, 1.0, self._binary_rewards))
-            #self.arms.append(HashBernoulli(0.4, 0.45, 0.81, self._binary_rewards))
+            # Given payoff rows for the delays 0, 1, 2
+            self.arms = ArmBank.given([[1.0, 0.7, 0.75], [0.86, 0.606, 0.65]], 4) #1
+            #self.arms = ArmBank.given([[1.0, 0.65, 0.6], [0.84, 0.55, 0.5]], 4) #2
+            #self.arms = ArmBank.given([[1.0, 0.5, 0.55], [0.81, 0.4, 0.45]], 4) #3
             self.maxDelay = 2
             self._meanArms = [1.0, 0.8]
             nbArms = len(self._meanArms)
+        if TRACE:
+            for arm in range(nbArms):
+                c_print(1, "MAB.py, arm_creation(), Created {}", self.arms.describe(arm))
+
+        # Payoff table: expected reward of each arm for every reachable delay 0..maxDelay+1
+        self._payoffTable = self.arms.table
+        if self._SWITCHING == True: # Beyond maxDelay the arms are back to their delay 0 payoff
+            self._payoffTable[:, self.maxDelay + 1] = self._payoffTable[:, 0]
+        self._payoffRows = self._payoffTable.tolist() # Scalar lookups
         return nbArms
 
 
     def _r_star_computation(self):
-        avgs = [self._avg(i) for i in  np.arange(1,len(self.arms) + 1,1)]
-        max_element = array(avgs).max()
-        bin_mask = where(array(avgs)==max_element)[0]
-        r_star = max(bin_mask)
-        c_print(4, "MAB.py, r_star_comp(), Obtained avgs: {}, max_el {}, bin_mask {}, r_star: {}".format(avgs, max_element, bin_mask, r_star))
+        r_star = best_rank(self._payoffTable, self.maxDelay)
+        c_print(4, "MAB.py, r_star_comp(), r_star: {}", r_star)
         return r_star
-
-
-    def _avg(self, r):
-        c_print(1, "\nMAB.py, _avg(), Computing rank {}'s average".format(r))
-        delayed_means = [arm.computeState(r) for arm in self.arms[:r]]
-        c_print(1, "MAB.py, _avg(), First {} arm means: {}".format(r, delayed_means[:r]))
-        partial_sum = sum(delayed_means[:r])
-        avg = around(partial_sum / r, 3)
-        c_print(1, "MAB.py, _avg(), Partial Sum {:f}, Average {:f}. over {} arms".format(partial_sum, avg, r))
-        return avg
-
@@ -0,0 +1,199 @@
+''' Arms sorted by mean with the gaps between neighbours, shared by FPO_UCB and ORE2'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from bisect import bisect_left
+from math import inf
+from numpy import concatenate, full, maximum, minimum, ones, where
+
+
+class _Tree:
+    '''Segment tree of op (minimum or maximum) over positions. The leaves are written in place, pull() then
+    recomputes the nodes above a range of them with one slice operation per level. The queries walk O(log n) nodes.'''
+
+    def __init__(self, op, scalar, neutral, size):
+        self._op, self._scalar, self._neutral = op, scalar, neutral
+        self._size = 1 << max(size - 1, 0).bit_length()
+        self._tree = full(2 * self._size, neutral)
+
+    @property
+    def leaves(self):
+        # A view, not kept: a pickled copy would not share the tree
+        return self._tree[self._size:]
+
+    def pull(self, lo, hi):
+        if lo >= hi:
+            return
+        t = self._tree
+        l, h = lo + self._size, hi - 1 + self._size
+        while l > 1:
+            l, h = l >> 1, h >> 1
+            t[l:h+1] = self._op(t[2*l:2*h+2:2], t[2*l+1:2*h+2:2])
+
+    def _nodes(self, lo, hi):
+        # Nodes covering [lo, hi), left to right
+        left, right = [], []
+        l, h = lo + self._size, hi + self._size
+        while l < h:
+            if l & 1:
+                left.append(l)
+                l += 1
+            if h & 1:
+                h -= 1
+                right.append(h)
+            l, h = l >> 1, h >> 1
+        return left + right[::-1]
+
+    def reduce(self, lo, hi):
+        result = self._neutral
+        for node in self._nodes(lo, hi):
+            result = self._scalar(result, self._tree[node])
+        return float(result)
+
+    def first(self, lo, hi, bound):
+        '''First position in [lo, hi) whose value exceeds bound (maximum tree), None if there is none.'''
+        t = self._tree
+        for node in self._nodes(lo, hi):
+            if t[node] > bound:
+                while node < self._size:
+                    node = 2 * node if t[2 * node] > bound else 2 * node + 1
+                return node - self._size
+        return None
+
+
+class GapIndex:
+    '''All the arms sorted by decreasing mean, ties by decreasing index (argsort(means)[::-1] of a stable sort),
+    with the gap between the arms in positions k and k+1 rounded as the arm ordering checks compare it.
+    New means are applied when the index is read: each changed arm moves with two bisections, touching the gaps
+    around its old and new positions, unless so many arms changed that sorting again is cheaper.
+    The gaps are the leaves of a minimum segment tree, which gives the smallest gap of any prefix. A maximum tree
+    holds the smallest gap of every active arm with its neighbours, searched for the first one above the
+    confidence bound. Both answer in O(log n) steps; a move shifts the leaves in between with slice copies, as the
+    list insertion does, and the nodes above the moved positions are recomputed once per read.'''
+
+    def __init__(self, means, rounding):
+        self._rounding = rounding
+        self._means = list(means)
+        self._active = ones(len(self._means), dtype = bool)
+        self._dirty = set()
+        self._rebuild()
+
+    def _rebuild(self):
+        n = len(self._means)
+        self._placed = list(self._means) # means the positions refer to
+        self._arms = sorted(range(n), key = self._key)
+        self._keys = [self._key(arm) for arm in self._arms] # ascending: bisect friendly
+        self._minGaps = _Tree(minimum, min, inf, n - 1)
+        self._isolation = _Tree(maximum, max, -inf, n - 1)
+        self._gaps[:n-1] = [self._gap(k) for k in range(n - 1)]
+        self._placedActive = self._active[self._arms] # by position
+        self._sync(0, n - 1)
+        self._dirty.clear()
+
+    @property
+    def _gaps(self):
+        # gaps[k]: between positions k and k+1
+        return self._minGaps.leaves
+
+    def _key(self, arm, mean = None):
+        # Unique position key of the arm: decreasing mean, then decreasing index
+        return (-(self._means[arm] if mean is None else mean), -arm)
+
+    def _gap(self, k):
+        return round(self._means[self._arms[k]] - self._means[self._arms[k+1]], self._rounding)
+
+    def _sync(self, lo, hi):
+        '''Isolation leaves of the positions [lo, hi) from the gaps, then the nodes above them: smallest gap with
+        the neighbours (right one only for the first arm), -inf for the inactive arms.'''
+        lo, hi = max(lo, 0), min(hi, len(self._arms) - 1)
+        if lo >= hi:
+            return
+        left = self._gaps[lo-1:hi-1] if lo else concatenate(([inf], self._gaps[:hi-1]))
+        self._isolation.leaves[lo:hi] = where(self._placedActive[lo:hi], minimum(left, self._gaps[lo:hi]), -inf)
+        self._minGaps.pull(lo, hi)
+        self._isolation.pull(lo, hi)
+
+    def _move(self, arm):
+        # Lists and leaves only, returns the range of positions whose nodes need recomputing
+        gaps, placedActive, n = self._gaps, self._placedActive, len(self._arms)
+
+        # Removal: the two gaps around the arm become one
+        removed = bisect_left(self._keys, self._key(arm, self._placed[arm]))
+        del self._arms[removed], self._keys[removed]
+        placedActive[removed:n-1] = placedActive[removed+1:n]
+        k = removed
+        d = 0 if k == 0 else (n-2 if k == n-1 else k)
+        gaps[d:n-2] = gaps[d+1:n-1]
+        if 0 < k < n-1:
+            gaps[k-1] = self._gap(k-1)
+
+        # Insertion: one gap becomes two
+        key = self._key(arm)
+        self._placed[arm] = self._means[arm]
+        k = bisect_left(self._keys, key)
+        self._arms.insert(k, arm)
+        self._keys.insert(k, key)
+        placedActive[k+1:n] = placedActive[k:n-1]
+        placedActive[k] = self._active[arm]
+        slot = min(k, n-2)
+        gaps[slot+1:n-1] = gaps[slot:n-2]
+        for j in (k-1, k):
+            if 0 <= j < n-1:
+                gaps[j] = self._gap(j)
+
+        # Positions in between shifted by one
+        return min(removed, k) - 1, max(removed, k) + 2
+
+    def _refresh(self):
+        if not self._dirty:
+            return
+        if 16 * len(self._dirty) >= len(self._arms):
+            self._rebuild()
+            return
+        lo, hi = len(self._arms), 0
+        for arm in self._dirty: # The trees follow once, over all the shifted positions
+            start, stop = self._move(arm)
+            lo, hi = min(lo, start), max(hi, stop)
+        self._sync(lo, hi)
+        self._dirty.clear()
+
+    def update(self, arm, mean):
+        self._means[arm] = mean
+        self._dirty.add(arm)
+
+    def deactivate(self, arm):
+        '''The arm is no longer returned by discardable().'''
+        self._refresh()
+        self._active[arm] = False
+        k = bisect_left(self._keys, self._key(arm))
+        self._placedActive[k] = False
+        self._sync(k, k + 1)
+
+    def order(self):
+        '''Arm indexes by decreasing mean.'''
+        self._refresh()
+        return list(self._arms)
+
+    def minGap(self, stop = None):
+        '''Smallest of the gaps between the first stop + 1 arms (all of them by default), inf without gaps.'''
+        self._refresh()
+        n = len(self._arms) - 1
+        return self._minGaps.reduce(0, n if stop is None else min(stop, n))
+
+    def discardable(self, cb, nbActive):
+        '''First active arm in decreasing mean order whose gaps with both neighbours exceed cb. The first arm
+        only has the right gap, the nbActive-th one only the left one and the last arm is never returned.
+        None if no arm qualifies.'''
+        self._refresh()
+        n = len(self._arms)
+        last = nbActive - 1
+        if not 0 < last < n - 1:
+            k = self._isolation.first(0, n - 1, cb)
+            return None if k is None else self._arms[k]
+        k = self._isolation.first(0, last, cb)
+        if k is None and self._placedActive[last] and self._gaps[last-1] > cb:
+            k = last
+        if k is None:
+            k = self._isolation.first(last + 1, n - 1, cb)
+        return None if k is None else self._arms[k]
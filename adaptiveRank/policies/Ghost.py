@@ -9,6 +9,8 @@ from adaptiveRank.policies.Policy import Policy
 from adaptiveRank.tools.io import c_print
 
 class Ghost(Policy):
+    COST = 1.0 # Per round, relative to RStar
+
     def __init__(self, T, MOD):
         self.cIndex = -1 # last round robin index
         self.r = -1 # rank
@@ -20,7 +22,7 @@ class Ghost(Policy):
             index = arms.argmax()
             # RR termination condition
             if index <= self.cIndex:
-                c_print(4, "Ghost rank: {}".format(self.cIndex))
+                c_print(4, "Ghost rank: {}", self.cIndex)
                 self.r = self.cIndex
         else: # RR 
             index = self.cIndex + 1
@@ -29,3 +31,10 @@ class Ghost(Policy):
 
         self.cIndex = index
         return [index]
+
+    def cycle(self):
+        '''Next pulls, repeated forever, once the rank has been identified.'''
+        if self.r == -1:
+            return None
+        L = self.r + 1
+        return [(self.cIndex + 1 + i) % L for i in range(L)]
@@ -9,8 +9,28 @@ from adaptiveRank.policies.Policy import Policy
 from adaptiveRank.tools.io import c_print
 
 class Greedy(Policy):
+    COST = 2.5 # Per round, relative to RStar
+
     def __init__(self, T, MOD=1):
         pass
 
     def choice(self, arms):
         return [arms.argmax()]
+
+    @staticmethod
+    def batch(policies, nbArms, randoms):
+        '''Vectorized counterpart of the policies for MAB.play_batch().'''
+        return GreedyBatch()
+
+
+class GreedyBatch:
+    '''Greedy choices of R repetitions stepped together: one argmax over the R x K states per round.'''
+
+    def choice(self, states):
+        return states().argmax(axis = 1)
+
+    def update(self, chosen, rewards):
+        pass
+
+    def close(self):
+        pass
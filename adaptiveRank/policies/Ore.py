@@ -4,17 +4,21 @@ __author__ = "Leonardo Cella"
 __version__ = "0.1"
 
 from math import ceil, log, sqrt
-from random import choice
-from numpy import arange, argpartition, argmax, argsort, array, ones, where, zeros
+from numpy import argmax, argsort
 
+from adaptiveRank.policies.GapIndex import GapIndex
 from adaptiveRank.policies.Policy import Policy
-from adaptiveRank.tools.io import c_print
+from adaptiveRank.policies.RankStats import RankStats
+from adaptiveRank.Schedule import Schedule
+from adaptiveRank.tools.io import c_print, TRACE
+from adaptiveRank.tools.kernels import ore_rank_update
 
 class ORE2(Policy):
     '''Ordering and Rank Estimation via Elimination'''
+    COST = 1.1 # Per round, relative to RStar
 
     def __init__(self, T, tau, delta = 0.1, shrink = 1, rounding = 5, MOD = 2, approximate = False, lp = 0):
-        c_print(4, "\nORE2 Init. Tau {}, delta {}, LP {}".format(tau, delta, lp))
+        c_print(4, "\nORE2 Init. Tau {}, delta {}, LP {}", tau, delta, lp)
         # Non-stationarity parameters
         self._tau = tau
 
@@ -37,8 +41,7 @@ class ORE2(Policy):
         self._activeRanks = [] # rank indexes
         self._learnedPO = False # canary stating if the arm ordering was learnt
         self._learnedRank = False # canary stating if the rank was learnt
-        self._jump_list = [] # binary list denoting skipping rounds due to calibration
-        self._jump_rank = [] # rank list denoting current rank to be updated after calibration
+        self._calibration = 0 # calibration pulls at the beginning of the current rank schedule
 
 
     def choice(self, arms):
@@ -50,8 +53,7 @@ class ORE2(Policy):
             self._nbPullsArms = [0] * self._nArms
             self._nbPullsRanks = [0] * self._nArms
             self._cumRwdArms = [0.0] * self._nArms
-            self._cumRwdArmDelay = zeros((self._nArms, self._nArms))
-            self._nbPullsArmDelay = zeros((self._nArms, self._nArms))
+            self._rankStats = RankStats(self._nArms, self._nArms) # (arm, rank) rewards of the rank elimination
             self._cumRwdRanks = [0.0] * self._nArms
             self._meanRanks = [0.0] * self._nArms
 
@@ -59,23 +61,25 @@ class ORE2(Policy):
             if self.LP == 2:
                 self._learnedPO = True
                 sorted_idx = argsort(self._meanArms)[::-1]
-                c_print(4, "ORE.py, JUMPING ARM ORDERING ESTIMATION, given means {} sorted indexes {}".format(self._meanArms, sorted_idx))
+                c_print(4, "ORE.py, JUMPING ARM ORDERING ESTIMATION, given means {} sorted indexes {}", self._meanArms, sorted_idx)
                 # Variable setting for the next phase
                 self._r = 1
                 self._s = 0
                 self._activeArms = sorted_idx
             else:# Arm Ordering initialization
                 self._meanArms = [0.0] * self._nArms
+                self._gapIndex = GapIndex(self._meanArms, self._rounding) # arms sorted by mean, gaps between neighbours
                 # Each arm is played once 
                 idx = self._bucketing(self._activeArms)
-                c_print(self.MOD, "ORE.py, CHOICE(): First Pull, round {}, pulling {}".format(self._t, idx))
+                c_print(self.MOD, "ORE.py, CHOICE(): First Pull, round {}, pulling {}", self._t, idx)
                 self._r = self._r + 1
                 assert self._r == 1, "Wrong sampling counter definition"
                 return idx
 
         # Arm Elimination
         if not self._learnedPO and self._samplingRequired():
-            c_print(1, "PO.py, not ordered DISCARDING on active arms {}".format(self._activeArms))
+            if TRACE:
+                c_print(1, "PO.py, not ordered DISCARDING on active arms {}", self._activeArms)
             self._discarded() # it discards at most a single arm
             idx = self._bucketing(self._activeArms)
             self._r = self._r + 1
@@ -83,18 +87,16 @@ class ORE2(Policy):
         else: # Rank Elimination
             self._learnedPO = True
             self._roundLearnedPO = self._t
-            index = list()
-            jump_list = list()
-            jump_rank = list()
             # Stage 1: Sampling all active arms
             self._freezedTime = self._t
             nbAppends = max(int(self._Ts() / (self._r * len(self._activeRanks) * self._shrink)), 2)
 
             # Output
             if len(self._activeRanks) > 1:
-                c_print(1, "ORE.py, CHOICE INIT RANK ELIMINATION {}-ROUND with {} appends per rank".format(self._r, nbAppends))
-                c_print(1, "ORE.py, RANKS MEANS {}, Nb Pulls: {}".format(self._meanRanks, self._nbPullsRanks))
-                c_print(1, "ORE.py, choice: round {}, Active Ranks {}\n".format(self._t, self._activeRanks))
+                if TRACE:
+                    c_print(1, "ORE.py, CHOICE INIT RANK ELIMINATION {}-ROUND with {} appends per rank", self._r, nbAppends)
+                    c_print(1, "ORE.py, RANKS MEANS {}, Nb Pulls: {}", self._meanRanks, self._nbPullsRanks)
+                    c_print(1, "ORE.py, choice: round {}, Active Ranks {}\n", self._t, self._activeRanks)
 
             # Playing the less played rank among the active ones
             active_ranks_pulls = [self._nbPullsRanks[i] for i in self._activeRanks]
@@ -102,45 +104,37 @@ class ORE2(Policy):
             # Additional variables for updating with non-stationarities
             self._pulledRankIndex = rank_id
             self._nbPullsRanks[rank_id] += 1
-            # List extension: calibration + Ts
-            c_print(1, "\nORE.py, CHOICE pulled rank {}".format(rank_id))
+            # Schedule: calibration + Ts, the rank arms repeated nbAppends times
+            if TRACE:
+                c_print(1, "\nORE.py, CHOICE pulled rank {}", rank_id)
             tmp_index = list(self._activeArms[:rank_id+1])
-            jump_list += [0] * (rank_id+1)
-            jump_rank += [rank_id] * (rank_id+1)
-            index += tmp_index # Rank Calibration
-            for _ in range(nbAppends): # Effective pulls
-                index += tmp_index
-                jump_rank += [rank_id] * (rank_id+1)
-                jump_list += [1] * (rank_id+1)
-
-            c_print(1, "ORE.py, CHOICE rank_id: {} with {} appends, active ranks pulls {}".format(rank_id, nbAppends, active_ranks_pulls))
-
-            # NO RANK ELIMINATION at first round or within a window of active ranks pulls
-            if self._t == 0 or min(active_ranks_pulls)!= max(active_ranks_pulls):
-                self._jump_list = jump_list
-                self._jump_rank = jump_rank
+            index = Schedule(tmp_index, nbAppends, tmp_index) # Rank Calibration, then effective pulls
+            self._calibration = rank_id + 1 # Pulls of the schedule not used by update()
+
+            if TRACE:
+                c_print(1, "ORE.py, CHOICE rank_id: {} with {} appends, active ranks pulls {}", rank_id, nbAppends, active_ranks_pulls)
+
+            # NO RANK ELIMINATION before every active rank was pulled or within a window of active ranks pulls
+            if min(active_ranks_pulls) == 0 or min(active_ranks_pulls)!= max(active_ranks_pulls):
                 return index
 
             # Stage 2: Rank Elimination
-            c_print(1, "ORE.py Start Rank Elimination with {} active ranks".format(len(self._activeRanks)))
+            if TRACE:
+                c_print(1, "ORE.py Start Rank Elimination with {} active ranks", len(self._activeRanks))
             self._r = self._r + 1
             if len(self._activeRanks) > 1:
                 self._rankElimination()
-            self._jump_list = jump_list
-            self._jump_rank = jump_rank
             return index
 
 
     def _rankElimination(self):
         assert len(self._activeRanks) == self._nArms - self._s, "Incoherent Rank Elimination"
-        # Update Ranks Statistics
+        # Update Ranks Statistics: only the ranks pulled since the last elimination are summed again
+        self._rankStats.setOrder(self._activeArms)
+        means = self._rankStats.means()
         for rank in self._activeRanks:
-            mean_rank = 0.0
-            for i in self._activeArms[:(rank+1)]:
-                assert self._nbPullsArmDelay[i, rank] != 0, "Wrong variable update nbPullsArmDelay"
-                tmp = self._cumRwdArmDelay[i,rank] / self._nbPullsArmDelay[i,rank]
-                mean_rank = mean_rank + tmp
-            self._meanRanks[rank] = mean_rank / (rank + 1)
+            assert self._rankStats.sampled(rank), "Wrong variable update nbPullsArmDelay"
+            self._meanRanks[rank] = means[rank]
 
         # Update the set of Active Ranks 
         max_rank_id = argmax(self._meanRanks)
@@ -148,35 +142,40 @@ class ORE2(Policy):
             ranks_gap = self._meanRanks[max_rank_id] - self._meanRanks[rank_id]
             # Rank Elimination: eliminating up to 1 rank per round
             if ranks_gap > self._cb():
-                c_print(1,"\nRANK ELIMINATION(), Eliminating Rank {}, vs {}, cb {}, gap {}, means {}".format(rank_id, max_rank_id, self._cb(), ranks_gap, self._meanRanks))
+                if TRACE:
+                    c_print(1, "\nRANK ELIMINATION(), Eliminating Rank {}, vs {}, cb {}, gap {}, means {}", rank_id, max_rank_id, self._cb(), ranks_gap, self._meanRanks)
                 self._s = self._s + 1
                 self._activeRanks.remove(rank_id)
                 if len(self._activeRanks) == 1:
-                    c_print(4, "RANK Elimination(), LEARNED RANK {}".format(self._activeRanks[0]))
+                    c_print(4, "RANK Elimination(), LEARNED RANK {}", self._activeRanks[0])
         return 
 
 
     def update(self, arm, rwd, delay):
-        c_print(1, "ORE.py, update(): arm {} rwd {} delay {}".format(arm, rwd, delay))
+        if TRACE:
+            c_print(1, "ORE.py, update(): arm {} rwd {} delay {}", arm, rwd, delay)
         if not self._learnedPO:
             # Unbiased updates
             if delay == self._tau:
                 self._t = self._t + 1
-                c_print(1, "ORE.py, update(): unbiased sample")
+                if TRACE:
+                    c_print(1, "ORE.py, update(): unbiased sample")
                 self._cumRwdArms[arm] += rwd
                 self._nbPullsArms[arm] = self._nbPullsArms[arm] + 1
                 self._meanArms[arm] = self._cumRwdArms[arm]/self._nbPullsArms[arm]
+                self._gapIndex.update(arm, self._meanArms[arm])
         else: # Max Rank stage
             time_gap = self._t - self._freezedTime
             self._t = self._t + 1
-            pulledRankIndex = self._jump_rank[time_gap]
-            # Windows of acceptance
-            if self._jump_list[time_gap]:
-                c_print(1, "Storing rwd {} for Arm {} delay {}".format(rwd, arm, pulledRankIndex))
-                self._cumRwdArmDelay[arm, pulledRankIndex] += rwd
-                self._nbPullsArmDelay[arm, pulledRankIndex] += 1
+            pulledRankIndex = self._pulledRankIndex
+            # Windows of acceptance: the calibration prefix of the schedule is skipped
+            if time_gap >= self._calibration:
+                if TRACE:
+                    c_print(1, "Storing rwd {} for Arm {} delay {}", rwd, arm, pulledRankIndex)
+                self._rankStats.update(arm, pulledRankIndex, rwd)
             else:
-                c_print(1, "Discarding rwd {} for Arm {} delay {}".format(rwd, arm, pulledRankIndex))
+                if TRACE:
+                    c_print(1, "Discarding rwd {} for Arm {} delay {}", rwd, arm, pulledRankIndex)
         return
 
 
@@ -197,37 +196,20 @@ class ORE2(Policy):
 
 
     def _samplingRequired(self):
-        sorted_idx = argsort(self._meanArms)[::-1] # arm indexes sorted by mean values
-        len_activeArms = len(self._activeArms)
-
-        for i in range(self._nArms - 1):
-            # Gaps Computations
-            if i != 0:
-                gap_l = self._meanArms[sorted_idx[i-1]] - self._meanArms[sorted_idx[i]]
-                gap_l = round(gap_l, self._rounding)
-            if i != len_activeArms - 1:
-                gap_r = self._meanArms[sorted_idx[i]] - self._meanArms[sorted_idx[i+1]]
-                gap_r = round(gap_r, self._rounding)
-
-            # Checking if more Sampling is required based on Gaps
-            current_cb = self._cb()
-            if i == 0:
-                if gap_r < current_cb and not self._JUMP_ARMORDERING:
-                    c_print(1, "ORE.py, NOT ORDERED(): Gap_Right {} vs CB {}, arm 0 index: {}, activeArms {} sorted_idx {} means {}".format(gap_r, current_cb, sorted_idx[i], self._activeArms, sorted_idx, self._meanArms))
-                    return True
-            if i == len_activeArms - 1:
-                if gap_l < current_cb and not self._JUMP_ARMORDERING:
-                    c_print(1, "ORE.py, NOT ORDERED(): Gap_Left {} vs CB {}, last arm index: {}, activeArms {} sorted_idx {} means {}".format(gap_l, current_cb, sorted_idx[i], self._activeArms, sorted_idx, self._meanArms))
-                    return True
-            if i!= len_activeArms - 1 and i!= 0 and not self._JUMP_ARMORDERING:
-                if gap_l < current_cb or gap_r < current_cb:
-                    c_print(1, "ORE.py, NOT ORDERED(): Gap_Right {} Gap_Left {} vs CB {}, arm {} with Index: {}, activeArms {} sorted_idx {} means {}".format(gap_r, gap_l, current_cb, i, sorted_idx[i], self._activeArms, sorted_idx, self._meanArms))
-                    return True
+        # Smallest gap between arms consecutive in the mean order, against a single confidence bound
+        current_cb = self._cb()
+        # With one arm discarded the gap of the last two arms is not checked
+        stop = self._nArms - 2 if len(self._activeArms) == self._nArms - 1 else self._nArms - 1
+        min_gap = self._gapIndex.minGap(stop)
+        if min_gap < current_cb:
+            if TRACE:
+                c_print(1, "ORE.py, NOT ORDERED(): smallest Gap {} vs CB {}, activeArms {} sorted_idx {} means {}", min_gap, current_cb, self._activeArms, self._gapIndex.order(), self._meanArms)
+            return True
 
         # All arms are Separeted
         if not self._learnedPO:
             sorted_idx = argsort(self._meanArms)[::-1]
-            c_print(4, "\n===LEARNED ARM ORDERING\nORE.py, ORDERED(): Learned partial order. Active arms {}, sorted {}, means {}".format(self._activeArms, sorted_idx, self._meanArms))
+            c_print(4, "\n===LEARNED ARM ORDERING\nORE.py, ORDERED(): Learned partial order. Active arms {}, sorted {}, means {}", self._activeArms, sorted_idx, self._meanArms)
             # Variable setting for the next phase
             self._r = 1
             self._s = 0
@@ -237,52 +219,57 @@ class ORE2(Policy):
 
 
     def _discarded(self):
-        for i in range(self._nArms - 1):
-            len_activeArms = len(self._activeArms)
-
-            # Due to the bucketing, #activeArms >= tau
-            if len_activeArms == self._tau:
-                c_print(1, "ORE.py, DISCARDING() TAU not ordered Arms. Active arms {}, Means {}, CB {}".format(self._activeArms, self._meanArms, self._cb()))
-                return
-            assert self._nArms - self._s == len_activeArms, "Inconsistent arm elimination"
-
-            sorted_idx = argsort(self._meanArms)[::-1] # all indexes sorted desc by means   
-            arm_deletion = False # set Canary
-
-            # Gaps Computations
-            if i != 0:
-                gap_l = self._meanArms[sorted_idx[i-1]] - self._meanArms[sorted_idx[i]]
-                gap_l = round(gap_l, self._rounding)
-            if i != len_activeArms - 1:
-                gap_r = self._meanArms[sorted_idx[i]] - self._meanArms[sorted_idx[i+1]]
-                gap_r = round(gap_r, self._rounding)
-
-            # Checking Overlapping Conditions
-            current_cb = self._cb()
-            if i == 0:
-                if gap_r > current_cb and sorted_idx[i] in self._activeArms: # Discarding the first index
-                    arm_deletion = True
-                    c_print(4, "\nORE.py, DISCARDING(): Gap_Right {} vs CB {}, arm 0 index: {}, activeArms {} sorted_idx {} means {}".format(gap_r, current_cb, sorted_idx[i], self._activeArms, sorted_idx, self._meanArms))
-            if i == len_activeArms - 1:
-                if gap_l > current_cb and sorted_idx[i] in self._activeArms: # Discarding the last index
-                    arm_deletion = True
-                    c_print(4, "\nORE.py, DISCARDING(): Gap_Left {} vs CB {}, last arm index: {}, activeArms {} sorted_idx {} means {}".format(gap_l, current_cb, sorted_idx[i], self._activeArms, sorted_idx, self._meanArms))
-            if i!= len_activeArms - 1 and i!= 0:
-                if gap_l > current_cb and gap_r > current_cb and sorted_idx[i] in self._activeArms: # Discarding an index in the middle
-                    arm_deletion = True
-                    c_print(4, "\nORE.py, DISCARDING(): Gap_Right {} Gap_Left {} vs CB {}, arm {} with Index: {}, activeArms {} sorted_idx {} means {}".format(gap_r, gap_l, current_cb, i, sorted_idx[i], self._activeArms, sorted_idx, self._meanArms))
-
-            if arm_deletion: # Arm deletion based on one of previous cases
-                idx = self._activeArms.remove(sorted_idx[i])
-                self._s = self._s + 1
-                return 
+        len_activeArms = len(self._activeArms)
+
+        # Due to the bucketing, #activeArms >= tau
+        if len_activeArms == self._tau:
+            if TRACE:
+                c_print(1, "ORE.py, DISCARDING() TAU not ordered Arms. Active arms {}, Means {}, CB {}", self._activeArms, self._meanArms, self._cb())
+            return
+        assert self._nArms - self._s == len_activeArms, "Inconsistent arm elimination"
+
+        # Highest active arm separated from its neighbours in the mean order
+        current_cb = self._cb()
+        arm = self._gapIndex.discardable(current_cb, len_activeArms)
+        if arm is not None:
+            c_print(4, "\nORE.py, DISCARDING(): arm {} separated by more than CB {}, activeArms {} sorted_idx {} means {}", arm, current_cb, self._activeArms, self._gapIndex.order(), self._meanArms)
+            self._activeArms.remove(arm)
+            self._gapIndex.deactivate(arm)
+            self._s = self._s + 1
         return
 
 
+    def updateBlock(self, arms, rwds, delays):
+        '''update() over consecutive pulls of a choice (arrays), compiled in the rank elimination stage.'''
+        if not self._learnedPO:
+            for arm, rwd, delay in zip(arms.tolist(), rwds.tolist(), delays.tolist()):
+                self.update(arm, rwd, delay)
+            return
+        self._t = ore_rank_update(arms, rwds, self._t, self._freezedTime, self._calibration, self._pulledRankIndex, self._rankStats.cum, self._rankStats.pulls)
+        self._rankStats.mark(self._pulledRankIndex)
+
+    def updateAggregate(self, arms, delays, sums, counts):
+        '''Repeated passes of the rank schedule past its calibration: counts[j] pulls of arms[j] with total reward sums[j].'''
+        assert self._learnedPO and self._t - self._freezedTime >= self._calibration, "ORE.py, updateAggregate(): calibration pulls can't be aggregated"
+        self._t += int(counts.sum())
+        self._rankStats.add(arms, self._pulledRankIndex, sums, counts)
+
+    def phase(self):
+        if not self._learnedPO:
+            return 'ordering'
+        return 'exploitation' if len(self._activeRanks) == 1 else 'rank'
+
+    def counters(self):
+        # Unbiased (delay tau) samples of the ordering, samples past the calibration of the rank schedules
+        if not self._activeRanks: # Not initialized yet
+            return {}
+        return {'accepted': sum(self._nbPullsArms) + int(self._rankStats.pulls.sum()), 'activeArms': len(self._activeArms),
+                'activeRanks': len(self._activeRanks)}
+
     def overwriteArmMeans(self, means):
         assert self.LP == 2, "ORE.py, OVERWRITING ARM MEANS IN WRONG MOD"
         self._meanArms = means
-        c_print(4, "Setting Arm Means {}".format(means))
+        c_print(4, "Setting Arm Means {}", means)
         return
 
     def _bucketing(self, indexes):
@@ -292,28 +279,34 @@ class ORE2(Policy):
         bucketed = []
 
         if len(indexes) != self._tau:
-            c_print(1, "Number of full chunks {}".format(n_full_chunks))
+            if TRACE:
+                c_print(1, "Number of full chunks {}", n_full_chunks)
             # Bucketing the full chunks 
             for i in range(n_full_chunks):
-                c_print(1, "Inserting in full chunks")
+                if TRACE:
+                    c_print(1, "Inserting in full chunks")
                 l = min((len_idx, (i+1)*self._tau))
                 returned_list += indexes[i*self._tau : l]
                 returned_list += indexes[i*self._tau : l]
 
         # Fill the eventual last partial piece of the list with not pulled active arms
         if ceil(len(indexes)/self._tau) != int(len_idx/self._tau) or self._tau == len(indexes):
-            c_print(1, "ORE.py, bucketing(), Completing the last chunk")
+            if TRACE:
+                c_print(1, "ORE.py, bucketing(), Completing the last chunk")
             remaining_indexes = indexes[n_full_chunks*self._tau : min(len_idx, (n_full_chunks+1)*self._tau)]
-            c_print(1, "ORE.py, bucketing(), Remaining indexes {}".format(remaining_indexes))
+            if TRACE:
+                c_print(1, "ORE.py, bucketing(), Remaining indexes {}", remaining_indexes)
             i = 0
             bucketed = remaining_indexes
             while len(bucketed) < self._tau:
                 if self._activeArms[i] not in remaining_indexes:
                     bucketed.append(self._activeArms[i])
-                    c_print(1, "Index i {}, bucketed {}".format(self._activeArms[i], bucketed))
+                    if TRACE:
+                        c_print(1, "Index i {}, bucketed {}", self._activeArms[i], bucketed)
                 i = i + 1
             returned_list += bucketed + bucketed
-        c_print(1, "ORE.py, bucketing(), Bucketed List: {}".format(returned_list))
+        if TRACE:
+            c_print(1, "ORE.py, bucketing(), Bucketed List: {}", returned_list)
 
         assert len(returned_list) == 2*self._tau*ceil(len_idx/self._tau), "Inconsistent bucketing"
         return returned_list
@@ -1,4 +1,6 @@
 class Policy:
+    COST = 1.0 # Relative cost of a round, used by the Scheduler to start the longest tasks first
+
     def __init__(self, MOD, T):
         pass
     
@@ -7,3 +9,11 @@ class Policy:
 
     def update(self, choice, rwd, delay):
         pass
+
+    def phase(self):
+        '''Name of the current learning phase (PhaseProfiler).'''
+        return 'play'
+
+    def counters(self):
+        '''Samples accepted so far and sizes of the active sets (PhaseProfiler).'''
+        return {}
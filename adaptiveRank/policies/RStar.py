@@ -7,6 +7,8 @@ from adaptiveRank.policies.Policy import Policy
 from adaptiveRank.tools.io import c_print
 
 class RStar(Policy):
+    COST = 1.0 # Per round, relative to RStar
+
     def __init__(self, T, MOD):
         self.MOD = MOD
         self.cIndex = -1
@@ -14,7 +16,7 @@ class RStar(Policy):
 
     def initialize(self, r_star):
         self.r_star = r_star
-        c_print(4, "RStar, r_star setted to {}".format(r_star))
+        c_print(4, "RStar, r_star setted to {}", r_star)
 
     def choice(self, arms):
         index = self.cIndex + 1
@@ -24,3 +26,8 @@ class RStar(Policy):
         self.cIndex = index
         return [index]
 
+
+    def cycle(self):
+        '''Next pulls, repeated forever: round robin over the arms 0..r_star.'''
+        L = self.r_star + 1
+        return [(self.cIndex + 1 + i) % L for i in range(L)]
@@ -0,0 +1,72 @@
+''' Rank statistics shared by FPO_UCB and ORE2'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from numpy import arange, array, errstate, full, ix_, minimum, nan, sqrt, zeros
+
+
+class RankStats:
+    '''Rewards collected by each arm when pulled within each rank, and mean reward of every rank:
+    (1/(r+1)) sum over the first r+1 arms of the order of alpha * cumulated reward / pulls.
+    Pulls only touch their (arm, rank) entry and mark the rank; a rank mean is summed again, in order,
+    only when it is read after a change, so the values are the same of a full recomputation. A single changed
+    rank is summed in Python, several ones (all of them after setOrder()) with one cumulative sum down the order.'''
+
+    def __init__(self, nbArms, nbRanks, alpha = 1):
+        self.cum = zeros((nbArms, nbRanks)) # cumulated reward of (arm, rank)
+        self.pulls = zeros((nbArms, nbRanks)) # accepted pulls of (arm, rank)
+        self.alpha = alpha
+        self._source = None # order given to setOrder()
+        self._order = list(range(nbArms))
+        self._means = full(nbRanks, nan)
+        self._dirty = set(range(nbRanks))
+
+    def setOrder(self, order):
+        '''Arms sorted by decreasing mean: rank r is made of the first r+1 ones. No-op for the same object.'''
+        if order is self._source:
+            return
+        self._source = order
+        self._order = list(order)
+        self._dirty = set(range(len(self._means)))
+
+    def update(self, arm, rank, rwd):
+        self.cum[arm, rank] += rwd
+        self.pulls[arm, rank] += 1
+        self._dirty.add(rank)
+
+    def add(self, arms, rank, sums, counts):
+        '''Aggregated pulls within rank: counts[j] of the (distinct) arms[j] with total reward sums[j].'''
+        self.cum[arms, rank] += sums
+        self.pulls[arms, rank] += counts
+        self._dirty.add(rank)
+
+    def mark(self, rank):
+        '''The entries of rank were changed in place (compiled updates).'''
+        self._dirty.add(rank)
+
+    def means(self):
+        '''Mean reward of every rank (nan while one of its arms has no pull).'''
+        if len(self._dirty) > 1 and self._order:
+            # Sequential sums down the order, as the loop: rank r is read at the row of its last arm
+            ranks = array(sorted(self._dirty))
+            order = self._order[:ranks[-1] + 1]
+            with errstate(divide = 'ignore', invalid = 'ignore'):
+                sums = (self.alpha * self.cum[ix_(order, ranks)] / self.pulls[ix_(order, ranks)]).cumsum(axis = 0)
+            self._means[ranks] = sums[minimum(ranks, len(order) - 1), arange(len(ranks))] / (ranks + 1)
+        else:
+            for rank in self._dirty:
+                mean_rank = 0.0
+                for i in self._order[:(rank+1)]:
+                    mean_rank = mean_rank + self.alpha * self.cum[i, rank] / self.pulls[i, rank]
+                self._means[rank] = mean_rank / (rank + 1)
+        self._dirty.clear()
+        return self._means
+
+    def ucb(self, logTerm, rankPulls):
+        '''Upper confidence index of every rank: mean + sqrt(logTerm / pulls of the rank).'''
+        return self.means() + sqrt(logTerm / rankPulls)
+
+    def sampled(self, rank):
+        '''True when every arm of rank has been pulled within it.'''
+        return bool((self.pulls[self._order[:(rank+1)], rank] != 0).all())
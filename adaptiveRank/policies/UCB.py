@@ -3,20 +3,23 @@
 __author__ = "Leonardo Cella"
 __version__ = "0.1"
 
-from numpy import argmax, where, zeros
+from numpy import arange, argmax, asarray, sqrt as vsqrt, where, zeros
 from random import choice
 from math import log, sqrt
 
 from adaptiveRank.policies.Policy import Policy
-from adaptiveRank.tools.io import c_print
+from adaptiveRank.tools.io import c_print, c_enabled
 
 class UCB(Policy):
+    COST = 4.5 # Per round, relative to RStar
+
     '''UCB1 Policy'''
 
     def __init__(self, T, MOD):
         self.t = 0
         self.MOD = MOD
         self.T = T
+        self._verbose = c_enabled(MOD) # Level check hoisted out of the rounds
 
     def choice(self, arms):
         # New round
@@ -24,7 +27,8 @@ class UCB(Policy):
 
         if self.t > 1:
             not_pulled_idx = where(self._nbPulls==0)
-            c_print(self.MOD, "Round {} Not pulled Indexes: {}".format(self.t, not_pulled_idx[0]))
+            if self._verbose:
+                c_print(self.MOD, "Round {} Not pulled Indexes: {}", self.t, not_pulled_idx[0])
             if len(not_pulled_idx[0]) > 0:
                 index = choice(not_pulled_idx[0])
             else:
@@ -32,17 +36,73 @@ class UCB(Policy):
                 for i in range(len(arms)):
                     ucb_values[i] = (self._cumRwds[i]/self._nbPulls[i]) + sqrt((2*log(self.t))/self._nbPulls[i])
                 index = argmax(ucb_values)
-                c_print(self.MOD, "Round {} UCB {}".format(self.t, ucb_values))
+                if self._verbose:
+                    c_print(self.MOD, "Round {} UCB {}", self.t, ucb_values)
         else: #First run only
             self._cumRwds = zeros(len(arms))
             self._nbPulls = zeros(len(arms))
             index = choice(range(len(arms)))
 
-        c_print(self.MOD, "Round {} CumRwds {} NbPulls {}".format(self.t, self._cumRwds, self._nbPulls))
-        c_print(self.MOD, "Index: {}\n".format(index))
+        if self._verbose:
+            c_print(self.MOD, "Round {} CumRwds {} NbPulls {}", self.t, self._cumRwds, self._nbPulls)
+            c_print(self.MOD, "Index: {}\n", index)
 
         self._nbPulls[index] = self._nbPulls[index] + 1
         return [index]
 
     def update(self, arm, rwd, delay):
         self._cumRwds[arm] = self._cumRwds[arm] + rwd
+
+    @staticmethod
+    def batch(policies, nbArms, randoms):
+        '''Vectorized counterpart of the (new) policies for MAB.play_batch(), None when printing the rounds.'''
+        assert all(policy.t == 0 for policy in policies), "UCB.py, batch(): policies already played"
+        if any(policy._verbose for policy in policies):
+            return None
+        return UCBBatch(policies, nbArms, randoms)
+
+
+class UCBBatch:
+    '''UCB1 of R repetitions stepped together: R x K reward sums and pulls, one argmax per round for all of them.
+    The first nbArms choices, among the arms never pulled, do not depend on the rewards: they are drawn upfront,
+    repetition after repetition from randoms[r] (the global random state of play()), so the choices are those of
+    the policies played one by one.'''
+
+    def __init__(self, policies, nbArms, randoms):
+        self.policies = policies
+        self.t = 0
+        self._rows = arange(len(policies))
+        self._cumRwds = zeros((len(policies), nbArms))
+        self._nbPulls = zeros((len(policies), nbArms))
+        self._first = [self._unpulled(random, nbArms) for random in randoms]
+
+    @staticmethod
+    def _unpulled(random, nbArms):
+        # Choices of the rounds 1..nbArms, as in choice()
+        pulls = zeros(nbArms)
+        chosen = [random.choice(range(nbArms))]
+        pulls[chosen[0]] = 1
+        for _ in range(1, nbArms):
+            chosen.append(random.choice(where(pulls == 0)[0]))
+            pulls[chosen[-1]] = 1
+        return chosen
+
+    def choice(self, states):
+        '''Arm chosen by every repetition, as an array (states() gives the R x K states, unused).'''
+        self.t = self.t + 1
+        if self.t <= self._nbPulls.shape[1]: # One pull per round: arms never pulled left in every repetition
+            chosen = [first[self.t - 1] for first in self._first]
+        else:
+            # Same operations as choice(), elementwise
+            chosen = argmax(self._cumRwds / self._nbPulls + vsqrt((2*log(self.t)) / self._nbPulls), axis = 1)
+        chosen = asarray(chosen)
+        self._nbPulls[self._rows, chosen] += 1
+        return chosen
+
+    def update(self, chosen, rewards):
+        self._cumRwds[self._rows, chosen] += rewards
+
+    def close(self):
+        # Final state back into the policies
+        for r, policy in enumerate(self.policies):
+            policy.t, policy._cumRwds, policy._nbPulls = self.t, self._cumRwds[r].copy(), self._nbPulls[r].copy()
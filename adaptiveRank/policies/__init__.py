@@ -2,3 +2,27 @@
 
 __author__ = "Leonardo Cella"
 __version__ = "0.1"
+
+from importlib import import_module
+
+# Name -> "module:class", imported only when the policy is requested
+REGISTRY = {
+    'RStar': 'adaptiveRank.policies.RStar:RStar',
+    'FPO_UCB': 'adaptiveRank.policies.FPO_UCB:FPO_UCB',
+    'ORE2': 'adaptiveRank.policies.Ore:ORE2',
+    'UCB': 'adaptiveRank.policies.UCB:UCB',
+    'Greedy': 'adaptiveRank.policies.Greedy:Greedy',
+    'Ghost': 'adaptiveRank.policies.Ghost:Ghost',
+}
+
+
+def policy_class(name):
+    '''Class of the registered policy name, its module is imported on the first request.'''
+    assert name in REGISTRY, "policies/__init__.py, policy_class(): unknown policy {}, registered {}".format(name, sorted(REGISTRY))
+    module, attribute = REGISTRY[name].split(':')
+    return getattr(import_module(module), attribute)
+
+def register(name, path):
+    '''Makes the class at path ("module:class") available as name.'''
+    assert ':' in path, "policies/__init__.py, register(): {} is not a module:class path".format(path)
+    REGISTRY[name] = path
@@ -0,0 +1,36 @@
+'''Shape preserving downsampling of the curves to plot.'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from numpy import absolute, add, arange, argmax, asarray, diff, empty, geomspace, linspace, unique
+
+
+def lttb(x, y, n):
+    '''Indexes of the n points of the curve (x, y) kept by Largest-Triangle-Three-Buckets: the first and the
+    last points, then in each of n - 2 buckets the point making the largest triangle with the point kept in the
+    previous bucket and the average of the next one. Peaks and steps survive, unlike with a plain stride.'''
+    x, y = asarray(x, dtype = float), asarray(y, dtype = float)
+    size = len(x)
+    if size <= n or n < 3:
+        return arange(size)
+    edges = linspace(1, size - 1, n - 1).astype(int) # buckets [edges[i], edges[i+1]) over the inner points
+    counts = diff(edges)
+    avgX, avgY = add.reduceat(x[:-1], edges[:-1]) / counts, add.reduceat(y[:-1], edges[:-1]) / counts
+    kept = empty(n, dtype = int)
+    kept[0], kept[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i+1]
+        cX, cY = (avgX[i+1], avgY[i+1]) if i + 1 < n - 2 else (x[-1], y[-1])
+        areas = absolute((x[a] - cX) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cY - y[a]))
+        a = lo + int(argmax(areas))
+        kept[i+1] = a
+    return kept
+
+
+def log_indexes(size, n):
+    '''About n indexes of a curve with size points, evenly spaced on a log scale (first and last included).'''
+    if size <= n:
+        return arange(size)
+    return unique(geomspace(1, size, n).astype(int) - 1)
@@ -1,10 +1,23 @@
+import os
+import sys
 import numpy as np
 
-PRINT_THRESHOLD = 2 
+# Messages are printed when their score is above the threshold, ADAPTIVERANK_VERBOSITY overrides it
+PRINT_THRESHOLD = int(os.environ.get('ADAPTIVERANK_VERBOSITY', 2))
 
-def c_print(score, string):
+# Debug tracing (score 1) is switched on or off once, at import time: hot paths guard on TRACE
+TRACE = PRINT_THRESHOLD < 1
+
+def c_enabled(score):
+    return score > PRINT_THRESHOLD
+
+def c_print(score, string, *args):
+    # Lazy formatting: string.format(*args) runs for printed messages only
     if score > PRINT_THRESHOLD:
-        print(string)
+        print(string.format(*args) if args else string)
+
+if TRACE:
+    np.set_printoptions(threshold = sys.maxsize) # Avoid truncations in print
 
 def np_save(path, obj):
     with open(path, 'w') as f:
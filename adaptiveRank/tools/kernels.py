@@ -0,0 +1,61 @@
+'''Compiled per-pull kernels. Numba is optional: without it the same functions run as plain Python.'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+try:
+    from numba import njit
+    NUMBA = True
+except ImportError:
+    NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+@njit(cache = True)
+def pull_choice(choice, start, t, horizon, table, lastPull, maxDelay, buffers, positions, arms, delays, rewards, expected):
+    '''Pulls choice[start:] from round t on, writing the outcome of pull j at index j of arms, delays, rewards
+    and expected. Stops at the horizon or when the uniforms buffered for the next arm are over (the caller
+    refills buffers[arm] from the arm stream and resets positions[arm]). Returns the number of pulls done.'''
+    n = 0
+    for j in range(start, len(choice)):
+        c = choice[j]
+        if t + n >= horizon or positions[c] == buffers.shape[1]:
+            break
+        last = lastPull[c]
+        delay = 0 if last == -1 else min(t + n - last, maxDelay + 1)
+        mean = table[c, delay]
+        u = buffers[c, positions[c]]
+        positions[c] += 1
+        arms[j] = c
+        delays[j] = delay
+        rewards[j] = 1.0 if u < mean else 0.0
+        expected[j] = mean
+        lastPull[c] = t + n
+        n += 1
+    return n
+
+@njit(cache = True)
+def fpo_rank_update(arms, rewards, t, freezedTime, pulledRank, cumRwdArmDelay, nbPullsArmDelay):
+    '''FPO_UCB.update() over a block of max-rank pulls: returns the round counter.'''
+    for j in range(len(arms)):
+        t += 1
+        gap = t - freezedTime
+        if gap > pulledRank + 1 and gap <= 2 * (pulledRank + 1): # Window of acceptance
+            cumRwdArmDelay[arms[j], pulledRank] += rewards[j]
+            nbPullsArmDelay[arms[j], pulledRank] += 1
+    return t
+
+@njit(cache = True)
+def ore_rank_update(arms, rewards, t, freezedTime, calibration, rank, cumRwdArmDelay, nbPullsArmDelay):
+    '''ORE2.update() over a block of rank elimination pulls: returns the round counter.'''
+    for j in range(len(arms)):
+        gap = t - freezedTime
+        t += 1
+        if gap >= calibration: # Calibration pulls are skipped
+            cumRwdArmDelay[arms[j], rank] += rewards[j]
+            nbPullsArmDelay[arms[j], rank] += 1
+    return t
@@ -0,0 +1,146 @@
+'''Opt-in phase profiling of the policies played by MAB.play().'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+import json
+import resource
+import time
+import tracemalloc
+
+
+class PhaseProfiler:
+    '''Per phase (policy.phase()) rounds, choices, seconds spent in policy.choice() and in the policy updates,
+    accepted samples (policy.counters()) and resident high-water mark of the process at its end, plus the elimination
+    events: an active set of policy.counters() shrinking. The environment time is the rest of the wall time. With memory,
+    the traced allocations peak of every phase, reset at its boundaries, is measured too (tracemalloc, slow).'''
+
+    def __init__(self, memory = False):
+        self.memory = memory
+        self.phases = {}
+        self.events = []
+        self._phase = None
+        self._counters = {}
+        self._rounds = 0
+        self._pending = 0 # Rounds played since the last choice
+        self._policy = None
+        self._start = None
+
+    def wrap(self, policy):
+        '''Policy whose choices and updates are measured, to be played instead of policy.'''
+        if self._start is None:
+            self._start = time.perf_counter()
+            if self.memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+        self._policy = policy
+        return Profiled(policy, self)
+
+    def _stats(self, phase):
+        if phase not in self.phases:
+            self.phases[phase] = {'rounds': 0, 'choices': 0, 'choice_s': 0.0, 'update_s': 0.0, 'start_round': self._rounds, 'start_s': time.perf_counter() - self._start}
+        return self.phases[phase]
+
+    def _close(self, phase):
+        stats = self.phases[phase]
+        stats['end_round'] = self._rounds
+        stats['end_s'] = time.perf_counter() - self._start
+        # High-water mark of the process so far, kB on Linux: monotone, the earlier phases included
+        stats['process_peak_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        if self.memory:
+            stats['traced_peak_mb'] = max(stats.get('traced_peak_mb', 0.0), tracemalloc.get_traced_memory()[1] / 2.0**20)
+            if hasattr(tracemalloc, 'reset_peak'): # Python 3.9
+                tracemalloc.reset_peak()
+            else: # The peak is only reset with the traces
+                tracemalloc.stop()
+                tracemalloc.start()
+
+    def _account(self, policy):
+        # Samples of the rounds played since the last choice, shrunk active sets
+        counters = policy.counters()
+        if self._phase is not None and 'accepted' in counters: # Policies filtering their samples only
+            stats = self.phases[self._phase]
+            accepted = counters['accepted'] - self._counters.get('accepted', 0)
+            stats['accepted'] = stats.get('accepted', 0) + accepted
+            stats['discarded'] = stats.get('discarded', 0) + self._pending - accepted
+        for name, size in counters.items():
+            if name != 'accepted' and size < self._counters.get(name, size):
+                self.events.append({'round': self._rounds, 'seconds': time.perf_counter() - self._start, 'phase': self._phase,
+                        'set': name, 'from': self._counters[name], 'to': size})
+        self._counters = counters
+        self._pending = 0
+
+    def chosen(self, policy, seconds):
+        '''After every choice: the rounds of the previous one are accounted, then the phase is checked.'''
+        self._account(policy)
+        phase = policy.phase()
+        if phase != self._phase:
+            if self._phase is not None:
+                self._close(self._phase)
+            self._phase = phase
+        stats = self._stats(phase)
+        stats['choices'] += 1
+        stats['choice_s'] += seconds
+
+    def updated(self, rounds, seconds):
+        stats = self._stats(self._phase)
+        stats['rounds'] += rounds
+        stats['update_s'] += seconds
+        self._rounds += rounds
+        self._pending += rounds
+
+    def report(self, **metadata):
+        '''Phases, events and wall time split, metadata included.'''
+        if self._phase is not None:
+            self._account(self._policy)
+            self._close(self._phase)
+        total = time.perf_counter() - self._start
+        choice = sum(stats['choice_s'] for stats in self.phases.values())
+        update = sum(stats['update_s'] for stats in self.phases.values())
+        report = dict(metadata)
+        report.update({'rounds': self._rounds, 'wall_s': total, 'choice_s': choice, 'update_s': update,
+                'environment_s': total - choice - update, 'phases': self.phases, 'events': self.events})
+        return report
+
+    def save(self, path, **metadata):
+        with open(path, 'w') as f:
+            json.dump(self.report(**metadata), f, indent = 1, sort_keys = True, default = repr)
+
+
+class Profiled:
+    '''Policy proxy timing choice() and the updates, the other attributes are the policy ones.'''
+
+    def __init__(self, policy, profiler):
+        self.policy = policy
+        self.profiler = profiler
+
+    def choice(self, arms):
+        start = time.perf_counter()
+        choice = self.policy.choice(arms)
+        self.profiler.chosen(self.policy, time.perf_counter() - start)
+        return choice
+
+    def update(self, arm, rwd, delay):
+        start = time.perf_counter()
+        self.policy.update(arm, rwd, delay)
+        self.profiler.updated(1, time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        # Only reached for the attributes missing here: updateBlock() and updateAggregate() exist iff the policy has them
+        if name.startswith('__') or name in ('policy', 'profiler'):
+            raise AttributeError(name)
+        attribute = getattr(self.policy, name)
+        if name == 'updateBlock':
+            return lambda arms, *args: self._timed(attribute, len(arms), arms, *args)
+        if name == 'updateAggregate':
+            return lambda arms, delays, sums, counts: self._timed(attribute, int(counts.sum()), arms, delays, sums, counts)
+        return attribute
+
+    def _timed(self, method, rounds, *args):
+        start = time.perf_counter()
+        method(*args)
+        self.profiler.updated(rounds, time.perf_counter() - start)
+
+
+def unwrapped(policy):
+    '''The profiled policy, or policy itself.'''
+    return policy.policy if isinstance(policy, Profiled) else policy
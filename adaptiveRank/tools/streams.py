@@ -0,0 +1,93 @@
+'''Block-buffered random streams: one numpy Generator per (repetition, arm).'''
+
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+from numpy import arange, array, concatenate, empty, flatnonzero, full
+from numpy.random import Generator, PCG64, SeedSequence
+
+BLOCK_SIZE = 4096 # Uniforms pre-generated at each refill
+
+
+def generator(seed, rep, arm):
+    '''Generator of the (rep, arm) stream: it only depends on the seed and on its own indexes.'''
+    return Generator(PCG64(SeedSequence(seed, spawn_key = (int(rep), int(arm)))))
+
+
+def read(generator, buffer, position, m):
+    '''Next m uniforms of the stream whose current block is buffer, read up to position.
+    The blocks drawn meanwhile are the ones successive refills would draw, the last one is left in buffer.
+    Returns the uniforms and the position reached in buffer.'''
+    head = buffer[position:position + m].copy()
+    if len(head) == m:
+        return head, position + m
+    rest = m - len(head)
+    nbBlocks = -(-rest // len(buffer))
+    fresh = generator.random(nbBlocks * len(buffer))
+    buffer[:] = fresh[-len(buffer):]
+    return concatenate((head, fresh[:rest])), rest - (nbBlocks - 1) * len(buffer)
+
+
+class Stream:
+    '''Uniform stream of a single (repetition, arm) pair, read one value at a time.'''
+
+    def __init__(self, seed, rep, arm, blockSize = BLOCK_SIZE):
+        self._generator = generator(seed, rep, arm)
+        self._size = blockSize
+        self._block = []
+        self._pos = 0
+
+    def _refill(self):
+        self._block = self._generator.random(self._size).tolist()
+        self._pos = 0
+
+    def uniform(self):
+        if self._pos == len(self._block):
+            self._refill()
+        u = self._block[self._pos]
+        self._pos += 1
+        return u
+
+    def bernoulli(self, p):
+        return 1 if self.uniform() < p else 0
+
+    def uniforms(self, m):
+        '''Next m uniforms, as an array.'''
+        if self._pos == len(self._block):
+            self._refill()
+        block = array(self._block)
+        u, self._pos = read(self._generator, block, self._pos, m)
+        self._block = block.tolist()
+        return u
+
+
+def repetition_streams(seed, rep, nbArms, blockSize = BLOCK_SIZE):
+    '''One stream per arm of the repetition rep.'''
+    return [Stream(seed, rep, arm, blockSize) for arm in range(nbArms)]
+
+
+class StreamBank:
+    '''Streams of several repetitions x arms, read one arm per repetition at a time.
+    Stream (rep, arm) yields the same values as Stream(seed, rep, arm).'''
+
+    def __init__(self, seed, repIndexes, nbArms, blockSize = BLOCK_SIZE):
+        self._generators = [[generator(seed, rep, arm) for arm in range(nbArms)] for rep in repIndexes]
+        self._size = blockSize
+        self._rows = arange(len(repIndexes))
+        self._buffer = empty((len(repIndexes), nbArms, blockSize))
+        self._position = full((len(repIndexes), nbArms), blockSize) # Empty buffers, filled on first read
+        self._safe = 0 # Reads every buffer still has: below, no exhausted buffer to look for
+
+    def uniforms(self, arms):
+        '''Next uniform of the stream arms[r] for every repetition r.'''
+        position = self._position[self._rows, arms]
+        if self._safe == 0:
+            for r in flatnonzero(position == self._size):
+                self._generators[r][arms[r]].random(self._size, out = self._buffer[r, arms[r]])
+                position[r] = 0
+        self._position[self._rows, arms] = position + 1
+        self._safe = self._size - self._position.max() if self._safe == 0 else self._safe - 1
+        return self._buffer[self._rows, arms, position]
+
+    def bernoulli(self, arms, p):
+        return 1.0 * (self.uniforms(arms) < p)
@@ -0,0 +1,8 @@
+__author__ = "Leonardo Cella"
+__version__ = "0.1"
+
+# Same as: python -m adaptiveRank sweep [options]
+import sys
+from adaptiveRank.cli import main
+
+sys.exit(main(['sweep'] + sys.argv[1:]))
@@ -0,0 +1,98 @@
+'''Aggregator moments and P-square quantiles against numpy on the stored curves'''
+
+import numpy as np
+import pytest
+
+from adaptiveRank.Aggregator import EXACT, Aggregator, P2Quantile, sampled_rounds
+
+
+def _curves(seed, repetitions, horizon, stride):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.random((repetitions, horizon)), axis = 1)[:, sampled_rounds(horizon, stride)]
+
+def _p2(xs, p):
+    # Textbook one column P-square (Jain and Chlamtac, 1985)
+    q, n = sorted(xs[:5]), [0, 1, 2, 3, 4]
+    desired, increment = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0], [0.0, p / 2, p, (1 + p) / 2, 1.0]
+    for x in xs[5:]:
+        q[0], q[4] = min(q[0], x), max(q[4], x)
+        k = max([j for j in range(4) if q[j] <= x] or [0])
+        for j in range(k + 1, 5):
+            n[j] += 1
+        desired = [a + b for a, b in zip(desired, increment)]
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i+1] - n[i] > 1) or (d <= -1 and n[i-1] - n[i] < -1):
+                s = 1 if d > 0 else -1
+                parabolic = q[i] + s / (n[i+1] - n[i-1]) * ((n[i] - n[i-1] + s) * (q[i+1] - q[i]) / (n[i+1] - n[i]) + (n[i+1] - n[i] - s) * (q[i] - q[i-1]) / (n[i] - n[i-1]))
+                q[i] = parabolic if q[i-1] < parabolic < q[i+1] else q[i] + s * (q[i+s] - q[i]) / (n[i+s] - n[i])
+                n[i] += s
+    return q[2]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_moments_and_quantiles(seed):
+    horizon, stride, quantiles = 500, 5, (0.1, 0.25, 0.5, 0.75, 0.9)
+    curves = _curves(seed, 1000, horizon, stride)
+    aggregator = Aggregator(horizon, stride, quantiles)
+    for curve in curves:
+        aggregator.push(curve)
+    assert aggregator.count == len(curves)
+    assert list(aggregator.rounds) == list(range(0, horizon, stride)) + [horizon - 1]
+    assert np.allclose(aggregator.mean(), np.mean(curves, axis = 0), rtol = 1e-12, atol = 0)
+    assert np.allclose(aggregator.std() ** 2, np.var(curves, axis = 0), rtol = 1e-9, atol = 1e-12)
+    assert np.allclose(aggregator.std(), np.std(curves, axis = 0), rtol = 1e-9, atol = 1e-12)
+    spread = np.std(curves, axis = 0)
+    for p, value in aggregator.quantiles().items():
+        # P-square is an estimate: within a fraction of the spread of every sampled round
+        assert (np.abs(value - np.quantile(curves, p, axis = 0)) <= 0.25 * spread).all()
+
+
+def test_quantiles_are_the_p2_sketch():
+    horizon, stride = 200, 50
+    curves = _curves(3, 600, horizon, stride)
+    aggregator = Aggregator(horizon, stride, (0.05, 0.95))
+    for curve in curves:
+        aggregator.push(curve)
+    for p, value in aggregator.quantiles().items():
+        assert np.allclose(value, [_p2(list(curves[:, j]), p) for j in range(curves.shape[1])], rtol = 1e-12, atol = 0)
+
+
+@pytest.mark.parametrize('repetitions', [1, 3, 4, 5, 6, 10, EXACT])
+def test_few_repetitions_are_exact(repetitions):
+    curves = _curves(4, repetitions, 30, 1)
+    aggregator = Aggregator(30, 1, (0.05, 0.5, 0.95))
+    for curve in curves:
+        aggregator.push(curve)
+    quantiles = aggregator.quantiles()
+    for p, value in quantiles.items():
+        assert np.allclose(value, np.quantile(curves, p, axis = 0), rtol = 1e-12, atol = 0)
+    if repetitions > 1: # The bands do not collapse on the median
+        assert (quantiles[0.05][1:] < quantiles[0.5][1:]).all() and (quantiles[0.5][1:] < quantiles[0.95][1:]).all()
+
+
+@pytest.mark.parametrize('repetitions', [EXACT + 1, 2 * EXACT])
+def test_sketches_take_over_beyond_exact(repetitions):
+    horizon, stride = 200, 50
+    curves = _curves(5, repetitions, horizon, stride)
+    aggregator = Aggregator(horizon, stride, (0.05, 0.5, 0.95))
+    for curve in curves:
+        aggregator.push(curve)
+    quantiles = aggregator.quantiles()
+    for p, value in quantiles.items():
+        assert np.allclose(value, [_p2(list(curves[:, j]), p) for j in range(curves.shape[1])], rtol = 1e-12, atol = 0)
+    assert (quantiles[0.05] < quantiles[0.5]).all() and (quantiles[0.5] < quantiles[0.95]).all()
+
+
+@pytest.mark.parametrize('p', [0.05, 0.5, 0.95])
+def test_p2_is_exact_on_five_observations(p):
+    curves = _curves(6, 5, 30, 1)
+    sketch = P2Quantile(p, curves.shape[1])
+    for curve in curves:
+        sketch.push(curve)
+    assert np.allclose(sketch.value(), np.quantile(curves, p, axis = 0), rtol = 1e-12, atol = 0)
+
+
+def test_wrong_sampling_is_refused():
+    with pytest.raises(AssertionError):
+        Aggregator(100, 10).push(np.zeros(100))
@@ -0,0 +1,60 @@
+'''ArmBank payoff tables and MAB states against the per-arm Bernoulli and HashBernoulli classes they replaced'''
+
+import numpy as np
+import pytest
+
+from adaptiveRank.arm.ArmBank import ArmBank
+from adaptiveRank.arm.Bernoulli import Bernoulli
+from adaptiveRank.arm.HashBernoulli import HashBernoulli
+from adaptiveRank.environment import MAB
+
+T = 100
+
+
+def _bernoullis(bank):
+    return [Bernoulli(mean, gamma, minDelay, maxDelay, False) for mean, gamma, minDelay, maxDelay in
+            zip(bank.means.tolist(), bank.gammas.tolist(), bank.minDelays.tolist(), bank.maxDelays.tolist())]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_discounted_rows(seed):
+    rng = np.random.default_rng(seed)
+    nbArms, maxDelay = 12, 8
+    means, gammas = rng.random(nbArms), rng.choice([0.9, 0.99, 0.999], nbArms)
+    minDelays = rng.integers(0, 3, nbArms)
+    maxDelays = minDelays + rng.integers(0, maxDelay - 2, nbArms)
+    bank = ArmBank.discounted(means, gammas, minDelays, maxDelays, maxDelay + 2)
+    arms = _bernoullis(bank)
+    for d in range(maxDelay + 6): # Past the table: its last column, the delay maxDelay + 1
+        expected = [arm.computeState(min(d, maxDelay + 1)) for arm in arms]
+        assert bank.states(np.full(nbArms, d)).tolist() == expected
+    indexes = np.array([3, 0, 7])
+    assert bank.states(np.array([0, 4, 20]), indexes).tolist() == [arms[3].computeState(0), arms[0].computeState(4), arms[7].computeState(maxDelay + 1)]
+
+
+@pytest.mark.parametrize('rep', [0, 3, 5])
+def test_mab_states_saturate(rep):
+    env = MAB(T, 8, 0.999, 0.2, 6, 1, 0, 'UCB1', 0, 0)
+    nbArms = env._arm_creation(rep)
+    arms = _bernoullis(env.arms)
+    env._armsIndexes = np.arange(nbArms)
+    env._lastPull = [-1] * nbArms
+    assert env.compute_states(10).tolist() == [arm.computeState(0) for arm in arms] # Never pulled: null delay
+    env._lastPull = [0] * nbArms
+    for t in range(1, env.maxDelay + 5):
+        delay = min(t, env.maxDelay + 1)
+        assert [env._delay(arm, t) for arm in range(nbArms)] == [delay] * nbArms
+        assert env.compute_states(t).tolist() == [arm.computeState(delay) for arm in arms]
+
+
+def test_given_rows():
+    env = MAB(T, 8, 0.999, 0.2, 6, 1, 0, 'UCB1', 1, 0)
+    nbArms = env._arm_creation(0)
+    arms = [HashBernoulli(0.7, 0.75, 1.0, 1), HashBernoulli(0.606, 0.65, 0.86, 1)] # Former switching arms
+    assert nbArms == len(arms) and env.maxDelay == 2
+    env._armsIndexes = np.arange(nbArms)
+    env._lastPull = [0] * nbArms
+    for t in range(1, 6): # Past maxDelay, the switching arms are back to their delay 0 payoff
+        delay = t if t <= env.maxDelay else 0
+        assert env.compute_states(t).tolist() == [arm.computeState(delay) for arm in arms]
+    assert ArmBank.given([[1.0, 0.7, 0.75]], 6).states(np.arange(6), np.zeros(6, dtype = int)).tolist() == [arms[0].computeState(min(d, 2)) for d in range(6)]
@@ -0,0 +1,48 @@
+'''Benchmark report layout and regression flagging, on tiny cases'''
+
+import json
+
+from adaptiveRank import Benchmark
+from adaptiveRank.cli import bench
+
+BASE = dict(Benchmark.BASE, T = 300, k = 4)
+
+
+def _report(rates):
+    return {'cases': dict((label, {'pulls_per_s': rate} if rate is not None else {'error': 'ValueError: failed'}) for label, rate in rates.items())}
+
+
+def test_report_layout(tmp_path):
+    report = Benchmark.run(['UCB', 'RStar'], BASE, {'n_rep': [2]}, micro = False)
+    for key in ('version', 'python', 'numpy', 'numba', 'machine', 'date'):
+        assert key in report
+    assert sorted(report['cases']) == sorted(label for label, _, _ in Benchmark.cases(['UCB', 'RStar'], BASE, {'n_rep': [2]}))
+    assert len(report['cases']) == 4
+    for label, entry in report['cases'].items():
+        assert 'error' not in entry, entry
+        assert entry['pulls'] == BASE['T'] * entry['params']['n_rep']
+        assert entry['pulls_per_s'] > 0 and entry['peak_mb'] > 0
+    path = str(tmp_path / 'bench.json')
+    Benchmark.save(path, report)
+    assert Benchmark.load(path) == json.loads(json.dumps(report))
+
+
+def test_regressions_beyond_threshold():
+    baseline = _report({'a': 100.0, 'b': 100.0, 'c': 100.0, 'd': 100.0, 'gone': 100.0})
+    report = _report({'a': 80.0, 'b': 95.0, 'c': 150.0, 'd': None, 'new': 1.0})
+    assert Benchmark.regressions(report, baseline, 0.1) == [('a', 100.0, 80.0)]
+    assert Benchmark.regressions(report, baseline, 0.01) == [('a', 100.0, 80.0), ('b', 100.0, 95.0)]
+    assert Benchmark.regressions(report, baseline, 0.5) == []
+
+
+def test_command_fails_on_regression(tmp_path):
+    options = ['-T', '300', '--policies', 'UCB', '--scale', '0', '--micro', '0']
+    baseline = str(tmp_path / 'baseline.json')
+    assert bench(options + ['--output', baseline]) == 0
+    report = Benchmark.load(baseline)
+    assert list(report['cases']) == ["play/UCB/k8_ft0.2_d6_tau7_T300_rep1"]
+    for entry in report['cases'].values(): # Baseline 100 times faster
+        entry['pulls_per_s'] *= 100
+    Benchmark.save(baseline, report)
+    assert bench(options + ['--output', str(tmp_path / 'new.json'), '--baseline', baseline]) == 1
+    assert bench(options + ['--output', str(tmp_path / 'again.json'), '--baseline', baseline, '--threshold', '1']) == 0
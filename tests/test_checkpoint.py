@@ -0,0 +1,96 @@
+'''Repetitions resumed from a checkpoint against the same repetitions played without interruption'''
+
+import sys
+from math import sqrt
+
+import numpy as np
+import pytest
+
+from adaptiveRank import Checkpoint
+from adaptiveRank.environment import MAB
+from adaptiveRank.policies.FPO_UCB import FPO_UCB
+from adaptiveRank.policies.Ore import ORE2
+from adaptiveRank.policies.UCB import UCB
+
+T = 30000
+POLICIES = [('UCB1', lambda: UCB(T, 2)), ('PI ucb', lambda: FPO_UCB(T, 7, 0.1, 5, 5, 1, 2, sqrt(2))),
+        ('PI Low', lambda: ORE2(T, 7, 0.1, 1, 5, 5, 1, 2))]
+
+
+class Crash(Exception):
+    pass
+
+
+def _play(monkeypatch, name, make, binary, sc, kernel, directory = None, crashAt = None, crashIf = lambda state: True):
+    '''Result, policy and rounds of the snapshots written, the crash (with the round) is raised after the crashAt-th
+    one among those satisfying crashIf.'''
+    saves, crashable = [], []
+    save = Checkpoint.Checkpoint.save
+    def counted(self, state):
+        save(self, state)
+        saves.append(state['t'])
+        if crashIf(state):
+            crashable.append(state['t'])
+            if len(crashable) == crashAt:
+                raise Crash(state['t'])
+    monkeypatch.setattr(Checkpoint.Checkpoint, 'save', counted)
+    env = MAB(T, 8, 0.999, 0.2, 6, binary, 2, name, 0, sc, kernel = kernel, checkpointDir = directory, checkpointInterval = 0.0)
+    policy = make()
+    return env.play(policy, T, 1), policy, saves
+
+
+@pytest.mark.parametrize('name, make', POLICIES)
+@pytest.mark.parametrize('binary, sc', [(1, 0), (0, 1), (1, 1)])
+@pytest.mark.parametrize('kernel', [False, True])
+def test_resume_is_bit_for_bit(monkeypatch, tmp_path, name, make, binary, sc, kernel):
+    monkeypatch.setattr(Checkpoint, 'CHECK_ROUNDS', 997) # Snapshots every 997 rounds
+    monkeypatch.setattr(Checkpoint, 'OVERHEAD', 1e12)
+    reference, _, _ = _play(monkeypatch, name, make, binary, sc, kernel)
+
+    directory = str(tmp_path)
+    with pytest.raises(Crash) as crash:
+        _play(monkeypatch, name, make, binary, sc, kernel, directory, crashAt = 2)
+    resumed, _, saves = _play(monkeypatch, name, make, binary, sc, kernel, directory)
+    assert 0 < crash.value.args[0] < T
+    assert saves[0] == crash.value.args[0] # Resumed from the last snapshot, not from the start
+    assert list(tmp_path.iterdir()) == [] # Snapshot removed with the result handed back
+    _same(resumed, reference)
+
+
+def _same(result, reference):
+    assert np.array_equal(result.choices, reference.choices)
+    assert np.array_equal(result.rewards, reference.rewards)
+    assert (result.costs is None) == (reference.costs is None)
+    if reference.costs is not None:
+        assert np.array_equal(result.costs, reference.costs)
+
+
+@pytest.mark.parametrize('binary, sc', [(1, 0), (0, 1)])
+@pytest.mark.parametrize('kernel', [False, True])
+def test_resume_within_repeated_passes(monkeypatch, tmp_path, binary, sc, kernel):
+    # Chunks of 4096 rounds: the long rank schedules of ORE2 are snapshotted between two of them
+    monkeypatch.setattr(Checkpoint, 'CHECK_ROUNDS', 997)
+    monkeypatch.setattr(Checkpoint, 'OVERHEAD', 1e12)
+    monkeypatch.setattr(sys.modules['adaptiveRank.environment.MAB'], 'BULK', 4096)
+    name, make = POLICIES[2]
+    reference, _, _ = _play(monkeypatch, name, make, binary, sc, kernel)
+
+    directory = str(tmp_path)
+    pending = lambda state: 'pending' in state
+    with pytest.raises(Crash) as crash:
+        _play(monkeypatch, name, make, binary, sc, kernel, directory, crashAt = 2, crashIf = pending)
+    resumed, _, saves = _play(monkeypatch, name, make, binary, sc, kernel, directory)
+    assert 0 < crash.value.args[0] < T and saves[0] > crash.value.args[0]
+    assert list(tmp_path.iterdir()) == []
+    _same(resumed, reference)
+
+
+def test_other_run_is_ignored(monkeypatch, tmp_path):
+    monkeypatch.setattr(Checkpoint, 'CHECK_ROUNDS', 997)
+    monkeypatch.setattr(Checkpoint, 'OVERHEAD', 1e12)
+    name, make = POLICIES[2]
+    with pytest.raises(Crash):
+        _play(monkeypatch, name, make, 1, 0, False, str(tmp_path), crashAt = 2)
+    # Another environment in the same directory starts from scratch
+    _, _, saves = _play(monkeypatch, name, make, 0, 1, False, str(tmp_path))
+    assert saves[0] < 2 * 997
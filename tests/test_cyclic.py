@@ -0,0 +1,64 @@
+'''MAB.play_cyclic() of the periodic baselines against the rounds simulated by MAB.play()'''
+
+import sys
+
+import numpy as np
+import pytest
+
+from adaptiveRank.Aggregator import sampled_rounds
+from adaptiveRank.environment import MAB
+from adaptiveRank.policies.Ghost import Ghost
+from adaptiveRank.policies.RStar import RStar
+
+T = 5000
+ROUNDS = sampled_rounds(T, 7)
+POLICIES = [('Ghost', lambda: RStar(T, 2)), ('Ghost RR', lambda: Ghost(T, 2))] # RStar is initialized as the Ghost benchmark
+
+
+def _mab(name, binary, sc, switching):
+    return MAB(T, 8, 0.999, 0.2, 6, binary, 0, name, switching, sc, kernel = False)
+
+def _played(monkeypatch, name, make, binary, sc, switching, rep):
+    # play_cyclic() outcome and the periodic part it evaluated in closed form
+    module = sys.modules['adaptiveRank.environment.MAB']
+    built = []
+    class Recorded(module.Cyclic):
+        def __init__(self, *args):
+            super().__init__(*args)
+            built.append(self)
+    monkeypatch.setattr(module, 'Cyclic', Recorded)
+    reward, curve, expected = _mab(name, binary, sc, switching).play_cyclic(make(), T, rep, ROUNDS)
+    assert len(built) == 1
+    return reward, curve, expected, built[0]
+
+
+@pytest.mark.parametrize('name, make', POLICIES)
+@pytest.mark.parametrize('sc, switching', [(0, 0), (1, 0), (0, 1)])
+@pytest.mark.parametrize('rep', [0, 3])
+def test_expected_rewards_and_choices(monkeypatch, name, make, sc, switching, rep):
+    # Expected rewards: the closed form is the simulated curve, stored there as float32
+    played = _mab(name, 0, sc, switching).play(make(), T, rep)
+    reward, curve, expected, cyclic = _played(monkeypatch, name, make, 0, sc, switching, rep)
+    assert np.allclose(curve, played.getCumSumRwd(ROUNDS), rtol = 1e-6, atol = 1e-3)
+    assert np.allclose(expected, curve, rtol = 1e-12, atol = 1e-8)
+    assert reward == pytest.approx(played.getReward(), rel = 1e-6)
+
+    # Pulls past the explicit rounds: the block, repeated up to the horizon
+    assert 0 < cyclic.t0 < T
+    assert np.array_equal(played.choices[cyclic.t0:], np.resize(cyclic.block, T - cyclic.t0))
+
+
+@pytest.mark.parametrize('name, make', POLICIES)
+@pytest.mark.parametrize('rep', [0, 3])
+def test_binary_rewards(monkeypatch, name, make, rep):
+    played = _mab(name, 1, 0, 0).play(make(), T, rep)
+    reference = _mab(name, 0, 0, 0).play(make(), T, rep) # Same pulls, expected rewards
+    reward, curve, expected, cyclic = _played(monkeypatch, name, make, 1, 0, 0, rep)
+    explicit = ROUNDS < cyclic.t0
+    # Same samples up to the cycle, then same expected curve
+    assert np.array_equal(curve[explicit], played.getCumSumRwd(ROUNDS[explicit]))
+    assert np.allclose(expected, reference.getCumSumRwd(ROUNDS), rtol = 1e-6, atol = 1e-3)
+    assert np.array_equal(played.choices, reference.choices)
+    # Binomial draws of the periodic part: within a few standard deviations of the expected total
+    spread = 5 * np.sqrt(T) / 2
+    assert abs(reward - reference.getReward()) < spread and abs(reward - played.getReward()) < 2 * spread
@@ -0,0 +1,102 @@
+'''GapIndex against the argsort and gap scans it replaced in FPO_UCB and ORE2'''
+
+import pickle
+from math import inf
+
+import numpy as np
+import pytest
+
+from adaptiveRank.Experiment import configuration
+from adaptiveRank.Task import Task
+from adaptiveRank.policies.GapIndex import GapIndex
+
+ROUNDING = 5
+
+
+def _sorted_idx(means):
+    # Order of the replaced argsort(means)[::-1]. The default kind does not order ties the same way on every
+    # numpy build (SIMD sorts), the stable one is the reference.
+    return np.argsort(means, kind = 'stable')[::-1]
+
+def _gaps(means):
+    idx = _sorted_idx(means)
+    return [round(means[idx[k]] - means[idx[k+1]], ROUNDING) for k in range(len(means) - 1)]
+
+def _discarded(means, cb, activeArms):
+    # Replaced FPO_UCB._discarded() scan: first position whose gaps both exceed cb
+    sorted_idx, gaps = _sorted_idx(means), _gaps(means)
+    last = len(activeArms) - 1
+    for i in range(len(means) - 1):
+        if i == 0:
+            separated = gaps[0] > cb
+        elif i == last:
+            separated = gaps[i-1] > cb
+        else:
+            separated = gaps[i-1] > cb and gaps[i] > cb
+        if separated and sorted_idx[i] in activeArms:
+            return sorted_idx[i]
+    return None
+
+def _tied_means(rng, n):
+    # Empirical Bernoulli means of few pulls: frequent exact ties
+    pulls = rng.integers(1, 6, n)
+    return list(rng.integers(0, pulls + 1) / pulls)
+
+
+@pytest.mark.parametrize('n', [2, 5, 12, 40, 100])
+def test_random_updates(n):
+    rng = np.random.default_rng(n)
+    means = _tied_means(rng, n)
+    index = GapIndex(means, ROUNDING)
+    activeArms = list(range(n))
+    for step in range(300):
+        for arm in rng.choice(n, rng.integers(1, min(n, 3) + 1), replace = False): # Few changes: incremental moves
+            pulls = rng.integers(1, 6)
+            means[arm] = rng.integers(0, pulls + 1) / pulls
+            index.update(arm, means[arm])
+        if step % 50 == 49 and len(activeArms) > 2:
+            arm = activeArms[rng.integers(len(activeArms))]
+            activeArms.remove(arm)
+            index.deactivate(arm)
+        if step == 150: # As resumed from a checkpoint
+            index = pickle.loads(pickle.dumps(index))
+
+        assert index.order() == list(_sorted_idx(means))
+        gaps = _gaps(means)
+        for stop in range(n + 1):
+            assert index.minGap(stop) == min(gaps[:stop], default = inf)
+        assert index.minGap() == min(gaps, default = inf)
+        for cb in (0.0, 0.1, 0.3):
+            assert index.discardable(cb, len(activeArms)) == _discarded(means, cb, activeArms)
+
+
+def test_ties_order_by_decreasing_index():
+    # Arms 10 and 11 tied, as in FPO_UCB stage 0 with 12 arms: with arm 0 discarded the tied pair ends the
+    # active positions and the replaced scan discarded arm 11
+    means = [0.5 - 0.001 * arm for arm in range(10)] + [0.21033210332103322] * 2
+    index = GapIndex([0.0] * 12, ROUNDING)
+    for arm, mean in enumerate(means):
+        index.update(arm, mean)
+    index.deactivate(0)
+    assert index.order()[-2:] == [11, 10]
+    assert index.discardable(0.01, 11) == _discarded(means, 0.01, list(range(1, 12))) == 11
+
+    # Same tie reached by moving one arm only
+    index = GapIndex(list(range(40)), ROUNDING)
+    index.update(3, 7.0)
+    index.update(20, 7.0)
+    assert index.order()[31:34] == [20, 7, 3]
+
+
+@pytest.mark.parametrize('stage', [0, 1])
+@pytest.mark.parametrize('kernel', [False, True])
+def test_ore2_orders_then_eliminates_ranks(stage, kernel):
+    # Arm ordering through the GapIndex, then the rank phase entered past the first round
+    T = 20000
+    task = Task('ORE2', 'PI Low', configuration(T = T, k = 4, stage = stage), kernel = kernel)
+    policy = task.policy()
+    result = task.environment().play(policy, T, 0)
+    assert result.getReward() > 0
+    assert policy.phase() in ('rank', 'exploitation') and policy._roundLearnedPO > 0
+    assert policy._r > 1 # Rank eliminations ran
+    assert min(policy._nbPullsRanks) >= 1 # Every rank sampled before the first elimination
@@ -0,0 +1,30 @@
+'''MAB.play_batch() of the vectorized policies against MAB.play() of each repetition'''
+
+import random
+
+import pytest
+
+from adaptiveRank.environment import MAB
+from adaptiveRank.policies.Greedy import Greedy
+from adaptiveRank.policies.UCB import UCB
+
+T = 2000
+REPETITIONS = [0, 1, 2]
+
+
+def _mab(name, binary, sc, switching):
+    return MAB(T, 4, 0.999, 0.2, 6, binary, 2, name, switching, sc)
+
+@pytest.mark.parametrize('name, make', [('UCB1', lambda: UCB(T, 2)), ('Greedy', lambda: Greedy(T))])
+@pytest.mark.parametrize('binary, sc, switching', [(1, 0, 0), (0, 1, 0), (1, 0, 1)])
+def test_same_trajectories(name, make, binary, sc, switching):
+    random.seed(1) # Given means: the global random state is not reseeded by the arm creation
+    played = [_mab(name, binary, sc, switching).play(make(), T, rep) for rep in REPETITIONS]
+    random.seed(1)
+    policies = [make() for _ in REPETITIONS]
+    batched = _mab(name, binary, sc, switching).play_batch(policies, T, REPETITIONS)
+    for one, other in zip(played, batched):
+        assert (one.choices == other.choices).all()
+        assert (one.rewards == other.rewards).all()
+    if name == 'UCB1': # Final state back into the policies
+        assert policies[0].t == T and policies[0]._nbPulls.sum() == T
@@ -0,0 +1,27 @@
+'''Percentile bands of render() with the quantile levels actually stored'''
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('matplotlib')
+from adaptiveRank.Experiment import DEFAULTS
+from adaptiveRank.Plot import render
+
+
+def _stored(levels):
+    rounds = np.arange(100)
+    mean = np.cumsum(np.ones((2, len(rounds))), axis = 1)
+    stored = {'config': dict(DEFAULTS, stage = 0), 'names': ['Ghost', 'PI Low'], 'rounds': rounds, 'mean': mean,
+            'std': np.ones_like(mean)}
+    if levels is not None:
+        stored['levels'] = np.array(levels)
+        stored['quantiles'] = np.array([[curve * (0.5 + level) for level in levels] for curve in mean])
+    return stored
+
+
+@pytest.mark.parametrize('levels', [(0.05, 0.95), (0.1, 0.5, 0.9), (0.25,), None])
+def test_bands_of_any_stored_levels(tmp_path, levels):
+    paths = render(_stored(levels), str(tmp_path), bands = 1, points = 50)
+    assert len(paths) == 2 and all(os.path.getsize(path) for path in paths)
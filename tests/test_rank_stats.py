@@ -0,0 +1,76 @@
+'''RankStats against the per-pull loops and full recomputations it replaced'''
+
+import numpy as np
+
+from adaptiveRank.policies.RankStats import RankStats
+
+K = 6
+ALPHA = 1.5
+
+
+def _means(cum, pulls, order):
+    # Former double loop of FPO_UCB._maxrank() and ORE2._rankElimination()
+    means = np.zeros(K)
+    for rank in range(K):
+        mean_rank = 0.0
+        for i in order[:(rank+1)]:
+            mean_rank = mean_rank + ALPHA * cum[i, rank] / pulls[i, rank]
+        means[rank] = mean_rank / (rank + 1)
+    return means
+
+
+def test_incremental_means_are_bit_identical():
+    rng = np.random.default_rng(0)
+    stats = RankStats(K, K, ALPHA)
+    cum, pulls = np.zeros((K, K)), np.zeros((K, K))
+    order = list(range(K))
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        for step in range(2000):
+            rank = int(rng.integers(K))
+            if step % 3: # Single pull
+                arm, rwd = int(rng.integers(K)), float(rng.random())
+                stats.update(arm, rank, rwd)
+                cum[arm, rank] += rwd
+                pulls[arm, rank] += 1
+            else: # Aggregated pulls, as from the bulk passes
+                arms = rng.choice(K, 3, replace = False)
+                rewards = [rng.random(n) for n in (2, 1, 4)]
+                stats.add(arms, rank, np.array([r.sum() for r in rewards]), np.array([len(r) for r in rewards]))
+                for arm, values in zip(arms, rewards):
+                    cum[arm, rank] += values.sum()
+                    pulls[arm, rank] += len(values)
+            if step % 400 == 399:
+                order = list(rng.permutation(K))
+                stats.setOrder(order)
+            if step % 7 == 0:
+                assert np.array_equal(stats.means(), _means(cum, pulls, order), equal_nan = True)
+                for r in range(K):
+                    assert stats.sampled(r) == bool((pulls[order[:r+1], r] != 0).all())
+        assert np.array_equal(stats.means(), _means(cum, pulls, order), equal_nan = True)
+        assert np.array_equal(stats.ucb(3.0, pulls.sum(axis = 0)), _means(cum, pulls, order) + np.sqrt(3.0 / pulls.sum(axis = 0)), equal_nan = True)
+
+
+def test_in_place_changes_need_mark():
+    stats = RankStats(2, 2)
+    stats.update(0, 0, 1.0)
+    stats.update(0, 1, 1.0)
+    stats.update(1, 1, 0.0)
+    assert stats.means()[1] == 0.5
+    stats.cum[1, 1] += 1.0 # As the compiled updates
+    stats.pulls[1, 1] += 1
+    assert stats.means()[1] == 0.5
+    stats.mark(1)
+    assert stats.means()[1] == 0.75
+
+
+def test_short_order():
+    # Fewer ordered arms than ranks: the last ranks sum all of them
+    rng = np.random.default_rng(1)
+    stats = RankStats(K, K, ALPHA)
+    stats.cum[:], stats.pulls[:] = rng.random((K, K)), rng.integers(1, 5, (K, K))
+    order = [4, 0, 2]
+    stats.setOrder(order)
+    assert np.array_equal(stats.means(), _means(stats.cum, stats.pulls, order))
+    stats.cum[2, 1] += 1.0
+    stats.mark(1) # Single rank: summed in Python
+    assert np.array_equal(stats.means(), _means(stats.cum, stats.pulls, order))
@@ -0,0 +1,59 @@
+'''Policy registry: lazy lookups, policies registered at run time played from the command line'''
+
+import pytest
+
+from adaptiveRank import Benchmark
+from adaptiveRank.cli import bench
+from adaptiveRank.policies import REGISTRY, policy_class, register
+from adaptiveRank.policies.Policy import Policy
+
+
+class Cycling(Policy):
+    '''Round robin over all the arms, registered by the tests only.'''
+
+    def __init__(self, T, MOD):
+        self._next = 0
+
+    def choice(self, arms):
+        arm = self._next
+        self._next = (arm + 1) % len(arms)
+        return [arm]
+
+    def update(self, arm, rwd, delay):
+        pass
+
+
+@pytest.fixture
+def cycling():
+    register('Cycling', __name__ + ':Cycling')
+    yield 'Cycling'
+    REGISTRY.pop('Cycling')
+
+
+def test_lookups():
+    from adaptiveRank.policies.Ore import ORE2
+    assert policy_class('ORE2') is ORE2
+    assert sorted(REGISTRY) == sorted(['RStar', 'FPO_UCB', 'ORE2', 'UCB', 'Greedy', 'Ghost'])
+
+
+def test_registered_policy_runs_from_the_command_line(tmp_path, cycling):
+    assert policy_class(cycling) is Cycling
+    output = str(tmp_path / 'bench.json')
+    # The play case runs in a spawned process, which is given the registry entry
+    assert bench(['-T', '300', '--policies', cycling, '--scale', '0', '--micro', '0', '--output', output]) == 0
+    entries = list(Benchmark.load(output)['cases'].values())
+    assert len(entries) == 1 and 'error' not in entries[0], entries
+    assert entries[0]['pulls'] == 300
+
+
+def test_unknown_names_fail_cleanly(tmp_path, capsys):
+    with pytest.raises(AssertionError, match = 'unknown policy Nope'):
+        policy_class('Nope')
+    with pytest.raises(SystemExit) as exit:
+        bench(['--policies', 'UCB,Nope', '--output', str(tmp_path / 'bench.json')])
+    assert exit.value.code == 2
+    assert 'unknown policies Nope' in capsys.readouterr().err
+    assert not (tmp_path / 'bench.json').exists()
+    with pytest.raises(AssertionError):
+        register('Broken', 'adaptiveRank.policies.UCB.UCB') # Not a module:class path
+    assert 'Broken' not in REGISTRY
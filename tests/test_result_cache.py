@@ -0,0 +1,94 @@
+'''ResultCache keys and least recently used eviction'''
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from adaptiveRank.environment import MAB
+from adaptiveRank.policies.FPO_UCB import FPO_UCB
+from adaptiveRank.policies.Ore import ORE2
+from adaptiveRank.policies.UCB import UCB
+from adaptiveRank.ResultCache import ResultCache
+
+T = 1000
+ROUNDS = [0, 10, T - 1]
+QUANTILES = (0.05, 0.95)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+KEYS = '''
+from adaptiveRank.environment import MAB
+from adaptiveRank.policies.FPO_UCB import FPO_UCB
+from adaptiveRank.policies.Ore import ORE2
+from adaptiveRank.policies.UCB import UCB
+from adaptiveRank.ResultCache import ResultCache
+env = MAB(1000, 8, 0.9, 0.2, 6, 1, 2, 'PI Low', 0, 1)
+for pol in (FPO_UCB(1000, 7), ORE2(1000, 7), UCB(1000, 2)):
+    print('KEY', ResultCache.key(env, pol, 1000, 3, [0, 10, 999], (0.05, 0.95)))
+'''
+
+
+def _env(**changes):
+    args = dict(horizon = T, nbBuckets = 8, gamma = 0.9, fraTop = 0.2, maxDelay = 6, binary = 1, modality = 2,
+            name = 'PI Low', switching = 0, sc = 1)
+    args.update(changes)
+    return MAB(*args.values())
+
+def _key(env = None, pol = None, **changes):
+    args = dict(horizon = T, nbRepetitions = 3, rounds = ROUNDS, quantiles = QUANTILES)
+    args.update(changes)
+    return ResultCache.key(env or _env(), pol or FPO_UCB(T, 7), **args)
+
+
+def test_key_is_stable():
+    assert _key() == _key()
+    assert _key(quantiles = QUANTILES[::-1]) == _key()
+    assert _key(rounds = np.array(ROUNDS, dtype = np.int32)) == _key()
+    # Same digest in another interpreter: no object addresses or hash randomization in the content
+    env = _env()
+    expected = [ResultCache.key(env, pol, T, 3, ROUNDS, QUANTILES) for pol in (FPO_UCB(T, 7), ORE2(T, 7), UCB(T, 2))]
+    out = subprocess.run([sys.executable, '-c', KEYS], cwd = ROOT, capture_output = True, text = True, check = True,
+            env = dict(os.environ, PYTHONPATH = ROOT, PYTHONHASHSEED = '123')).stdout
+    assert [line.split()[1] for line in out.splitlines() if line.startswith('KEY ')] == expected
+
+
+@pytest.mark.parametrize('other', [
+    lambda: _key(env = _env(gamma = 0.8)),
+    lambda: _key(env = _env(switching = 1)),
+    lambda: _key(env = _env(binary = 0)),
+    lambda: _key(env = _env(seed = 1)),
+    lambda: _key(pol = FPO_UCB(T, 8)),
+    lambda: _key(pol = FPO_UCB(T, 7, 0.2)),
+    lambda: _key(pol = ORE2(T, 7)),
+    lambda: _key(horizon = T + 1),
+    lambda: _key(nbRepetitions = 4),
+    lambda: _key(rounds = ROUNDS[:-1] + [T - 2]),
+    lambda: _key(quantiles = (0.05, 0.9)),
+    lambda: _key(engine = 'play_batch'),
+])
+def test_key_changes_with_the_content(other):
+    assert other() != _key()
+
+
+def test_least_recently_used_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    curve = np.arange(1000.0)
+    for key in 'abc':
+        cache.put(key, mean = curve)
+    size = os.path.getsize(os.path.join(str(tmp_path), 'a.npz'))
+    for when, key in enumerate('abc'): # Written in this order, one second apart
+        os.utime(os.path.join(str(tmp_path), key + '.npz'), (1000 + when, 1000 + when))
+
+    assert (cache.get('a')['mean'] == curve).all() # Now the most recent one
+    assert cache.get('z') is None
+    cache.maxBytes = 3 * size
+    cache.put('d', mean = curve)
+    assert sorted(os.listdir(str(tmp_path))) == ['a.npz', 'c.npz', 'd.npz']
+    assert cache.get('b') is None
+
+    cache.maxAge = 60 # c was last used long ago
+    cache.evict()
+    assert sorted(os.listdir(str(tmp_path))) == ['a.npz', 'd.npz']
+    assert (cache.get('d')['mean'] == curve).all()
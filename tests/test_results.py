@@ -0,0 +1,77 @@
+'''Compact Result storage against the plain per round arrays it encodes'''
+
+import numpy as np
+import pytest
+
+from adaptiveRank import Results
+from adaptiveRank.Results import Result
+
+HORIZON = 203 # Not a multiple of 8: partial last byte
+
+
+def _trace(rng, binary, costs):
+    choices = rng.integers(0, 5, HORIZON)
+    rewards = rng.integers(0, 2, HORIZON) if binary else rng.random(HORIZON).astype(np.float32)
+    paid = rng.integers(0, 2, HORIZON) * (rng.random(HORIZON) < 0.3) if costs else np.zeros(HORIZON, dtype = int)
+    return choices, rewards, paid
+
+def _fill(result, trace, rng):
+    # Single rounds and ranges mixed, ranges starting on and off the byte boundaries
+    choices, rewards, costs = trace
+    t = 0
+    while t < HORIZON:
+        if rng.random() < 0.4:
+            result.store(t, choices[t], rewards[t], costs[t])
+            t += 1
+        else:
+            t1 = min(HORIZON, t + int(rng.integers(1, 40)))
+            result.storeRange(t, choices[t:t1], rewards[t:t1], costs[t:t1])
+            t = t1
+
+def _expected(trace, binary):
+    _, rewards, costs = trace
+    return rewards.astype(np.float64) - costs if binary else (rewards - costs.astype(np.float32)).astype(np.float64)
+
+
+@pytest.mark.parametrize('binary, costs', [(True, False), (True, True), (False, False), (False, True)])
+@pytest.mark.parametrize('chunk', [Results.CHUNK, 16])
+@pytest.mark.parametrize('memmap', [False, True])
+def test_round_trip(monkeypatch, tmp_path, binary, costs, chunk, memmap):
+    monkeypatch.setattr(Results, 'CHUNK', chunk)
+    rng = np.random.default_rng(7)
+    trace = _trace(rng, binary, costs)
+    result = Result(HORIZON, 5, binary, costs, str(tmp_path / 'run') if memmap else None)
+    _fill(result, trace, rng)
+    assert result.choices.dtype == np.uint8
+    assert result.rewards.nbytes == ((HORIZON + 7) >> 3 if binary else 4 * HORIZON)
+    assert (result.choices == trace[0]).all()
+    expected = _expected(trace, binary)
+    rounds = np.array([0, 1, 7, 8, 15, 16, 100, HORIZON - 1])
+    assert np.allclose(result.getCumSumRwd(), np.cumsum(expected), rtol = 1e-12, atol = 0)
+    assert np.allclose(result.getCumSumRwd(rounds), np.cumsum(expected)[rounds], rtol = 1e-12, atol = 0)
+    assert np.isclose(result.getReward(), expected.sum(), rtol = 1e-12, atol = 0)
+    if memmap:
+        assert (np.load(str(tmp_path / 'run.choices.npy')) == trace[0]).all()
+
+
+@pytest.mark.parametrize('binary', [True, False])
+@pytest.mark.parametrize('t', [0, 5, 8, 77, HORIZON])
+def test_snapshot_restore(binary, t):
+    rng = np.random.default_rng(t)
+    trace = _trace(rng, binary, binary)
+    result = Result(HORIZON, 5, binary, binary)
+    _fill(result, trace, rng)
+    interrupted = Result(HORIZON, 5, binary, binary) # Same run stopped at round t
+    interrupted.storeRange(0, trace[0][:t], trace[1][:t], trace[2][:t])
+    snapshot = interrupted.snapshot(t)
+
+    # Resumed run: the restored prefix, then the rounds from t on
+    resumed = Result(HORIZON, 5, binary, binary)
+    resumed.restore(snapshot)
+    if t < HORIZON:
+        resumed.storeRange(t, trace[0][t:], trace[1][t:], trace[2][t:])
+    assert (resumed.choices == result.choices).all()
+    assert (resumed.rewards == result.rewards).all()
+    assert binary or resumed.costs is None
+    if binary:
+        assert (resumed.costs == result.costs).all()
@@ -0,0 +1,44 @@
+'''Run-length encoded schedules and their bulk passes against the pulls one at a time'''
+
+import numpy as np
+import pytest
+
+from adaptiveRank.environment import MAB
+from adaptiveRank.policies.Ore import ORE2
+from adaptiveRank.Schedule import Schedule, distinct, segments
+
+
+@pytest.mark.parametrize('block, count, prefix', [([3, 1, 2], 4, [0, 0, 5]), ([2], 3, []), ([4, 5], 0, [1]), ([1, 2], 1, [])])
+def test_schedule_is_its_list(block, count, prefix):
+    schedule = Schedule(block, count, prefix)
+    pulls = prefix + block * count
+    assert len(schedule) == len(pulls)
+    assert list(schedule) == pulls
+    assert [schedule[i] for i in range(-len(pulls), len(pulls))] == pulls + pulls
+    assert distinct(schedule) == len(set(pulls)) == distinct(pulls)
+    assert list(np.concatenate(list(segments(schedule)) or [np.zeros(0, dtype = int)])) == pulls
+    with pytest.raises(IndexError):
+        schedule[len(pulls)]
+
+
+@pytest.mark.parametrize('binary', [0, 1])
+@pytest.mark.parametrize('switching', [0, 1])
+@pytest.mark.parametrize('kernel', [False, True])
+def test_bulk_passes_match_single_pulls(monkeypatch, binary, switching, kernel):
+    T = 30000
+    runs = []
+    for bulk in (True, False):
+        if not bulk:
+            monkeypatch.setattr(MAB, '_bulk_passes', lambda self, policy, choice: 0)
+        policy = ORE2(T, 7, 0.1, 1, 5, 5, binary, 2)
+        result = MAB(T, 8, 0.9, 0.2, 6, binary, 2, 'PI Low', switching, 1, kernel = kernel).play(policy, T, 1)
+        runs.append((result, policy))
+    (bulk, bulkPolicy), (single, singlePolicy) = runs
+    assert np.array_equal(bulk.choices, single.choices)
+    assert np.array_equal(bulk.rewards, single.rewards)
+    assert (bulk.costs is None) == (single.costs is None)
+    if bulk.costs is not None:
+        assert np.array_equal(bulk.costs, single.costs)
+    assert np.array_equal(bulkPolicy._rankStats.cum, singlePolicy._rankStats.cum)
+    assert np.array_equal(bulkPolicy._rankStats.pulls, singlePolicy._rankStats.pulls)
+    assert bulkPolicy._t == singlePolicy._t and list(bulkPolicy._activeRanks) == list(singlePolicy._activeRanks)
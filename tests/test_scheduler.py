@@ -0,0 +1,65 @@
+'''Scheduled evaluations: outcomes aggregated in repetition order, curve files removed when the run fails'''
+
+import random
+import tempfile
+
+import numpy as np
+import pytest
+
+from adaptiveRank.Aggregator import EXACT
+from adaptiveRank.Experiment import configuration
+
+from adaptiveRank.Evaluation import Evaluation
+from adaptiveRank.Scheduler import Scheduler
+from adaptiveRank.environment import MAB
+from adaptiveRank.Task import Task
+from adaptiveRank.policies.UCB import UCB
+
+T = 100
+
+
+class Failure(Exception):
+    pass
+
+
+class FailingTask:
+    def environment(self):
+        return MAB(T, 4, 0.999, 0.2, 6, 1, 2, 'UCB1', 0, 0)
+
+    def policy(self):
+        raise Failure()
+
+
+@pytest.mark.parametrize('nbWorkers', [1, 2])
+def test_failed_run_leaves_no_curves(monkeypatch, tmp_path, nbWorkers):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    task = FailingTask()
+    evals = [Evaluation(task.environment(), UCB(T, 2), T, 'UCB1', 3, run = False, task = task) for _ in range(2)]
+    with Scheduler(nbWorkers) as scheduler:
+        with pytest.raises(Failure):
+            scheduler.run(evals)
+    assert list(tmp_path.iterdir()) == []
+
+
+def _evaluation(task, nbRepetitions):
+    return Evaluation(task.environment(), task.policy(), T, 'UCB1', nbRepetitions, run = False, task = task)
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_completion_order_does_not_change_the_quantiles(seed):
+    nbRepetitions = EXACT + 20 # P-square markers past the first EXACT repetitions
+    # Past max_delay repetitions, the delay bounds of the arms can't be drawn (randint(repetition, max_delay - 1))
+    task = Task('UCB', 'UCB1', configuration(T = T, k = 4, n_rep = nbRepetitions, max_delay = nbRepetitions))
+    reference = _evaluation(task, nbRepetitions)
+    Scheduler(1).run([reference])
+
+    shuffled = _evaluation(task, nbRepetitions)
+    tasks = shuffled.tasks()
+    random.Random(seed).shuffle(tasks)
+    for _, worker, args in tasks:
+        shuffled.collect(worker(*args))
+    shuffled.finalize()
+
+    assert np.array_equal(shuffled.rewards, reference.rewards)
+    for p, value in reference.getQuantiles().items():
+        assert np.array_equal(shuffled.getQuantiles()[p], value)
+    assert np.array_equal(shuffled.meanCumSumRwd, reference.meanCumSumRwd)
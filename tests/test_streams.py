@@ -0,0 +1,59 @@
+'''Per-(repetition, arm) random streams: reproducible, and independent of block sizes and of the scheduling'''
+
+import numpy as np
+import pytest
+
+from adaptiveRank.Aggregator import sampled_rounds
+from adaptiveRank.Evaluation import SharedCurves, batch_repetitions, parallel_repetitions
+from adaptiveRank.Experiment import configuration
+from adaptiveRank.Task import Task
+from adaptiveRank.tools.streams import Stream, StreamBank, generator
+
+T = 3000
+
+
+def _read(stream, sizes):
+    # Mixed single and vector reads
+    return np.concatenate([[stream.uniform()] if m == 1 else stream.uniforms(m) for m in sizes])
+
+
+@pytest.mark.parametrize('blockSize', [1, 7, 4096])
+def test_stream_values(blockSize):
+    sizes = [1, 3, 1, 20, 1, 1, 50, 9]
+    reference = generator(5, 2, 1).random(sum(sizes))
+    assert np.array_equal(_read(Stream(5, 2, 1, blockSize), sizes), reference)
+    assert np.array_equal(_read(Stream(5, 2, 1, blockSize), sizes), _read(Stream(5, 2, 1), sizes))
+    # Other pairs, other seed: other values
+    for other in [(5, 2, 0), (5, 1, 1), (6, 2, 1)]:
+        assert not np.array_equal(_read(Stream(*other, blockSize), sizes), reference)
+
+
+def test_bank_rows_are_the_streams():
+    reps, nbArms = [4, 0, 9], 3
+    bank = StreamBank(1, reps, nbArms, blockSize = 5)
+    streams = [[Stream(1, rep, arm) for arm in range(nbArms)] for rep in reps]
+    rng = np.random.default_rng(0)
+    for _ in range(40):
+        arms = rng.integers(0, nbArms, len(reps))
+        assert bank.uniforms(arms).tolist() == [streams[r][arm].uniform() for r, arm in enumerate(arms)]
+
+
+def _outcomes(worker, task, indexes, stride = 10):
+    curves = SharedCurves(max(indexes) + 1, len(sampled_rounds(T, stride)))
+    try:
+        summaries = worker(task, T, indexes, stride, curves)
+        return dict((i, (reward, np.array(curves.read(i)))) for i, _, reward in summaries)
+    finally:
+        curves.close()
+
+@pytest.mark.parametrize('name, label', [('ORE2', 'PI Low'), ('FPO_UCB', 'PI ucb'), ('UCB', 'UCB1')])
+def test_repetition_alone_or_in_a_chunk(name, label):
+    task = Task(name, label, configuration(T = T, k = 4, stage = 2)) # Binary rewards, drawn from the streams
+    alone = _outcomes(parallel_repetitions, task, [3])[3]
+    for chunk in ([0, 1, 2, 3], [3, 1], [5, 3, 0]):
+        reward, curve = _outcomes(parallel_repetitions, task, chunk)[3]
+        assert reward == alone[0] and np.array_equal(curve, alone[1])
+    if name == 'UCB': # Stepped together with other repetitions
+        for chunk in ([3], [0, 3], [1, 2, 3, 4]):
+            reward, curve = _outcomes(batch_repetitions, task, chunk)[3]
+            assert reward == alone[0] and np.array_equal(curve, alone[1])
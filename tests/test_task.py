@@ -0,0 +1,45 @@
+'''Task specs: pickled for the workers, fresh environment and policy for every repetition'''
+
+import pickle
+
+import numpy as np
+import pytest
+
+from adaptiveRank.Experiment import configuration
+from adaptiveRank.Task import Task
+
+T = 3000
+
+
+def _state(policy):
+    # Comparable attributes of a policy
+    return pickle.dumps(vars(policy))
+
+
+@pytest.mark.parametrize('name, label', [('ORE2', 'PI Low'), ('FPO_UCB', 'PI ucb'), ('RStar', 'Ghost'), ('UCB', 'UCB1')])
+def test_round_trip(tmp_path, name, label):
+    task = Task(name, label, configuration(T = T, k = 4), recordChoices = False, checkpointDir = str(tmp_path))
+    data = pickle.dumps(task)
+    assert len(data) < 2048 # The spec, not the objects
+    copy = pickle.loads(data)
+    assert (copy.name, copy.label, copy.config, copy.options) == (task.name, task.label, task.config, task.options)
+    assert repr(copy) == repr(task)
+    assert copy.environment().config() == task.environment().config()
+    assert _state(copy.policy()) == _state(task.policy())
+
+
+@pytest.mark.parametrize('name, label', [('ORE2', 'PI Low'), ('FPO_UCB', 'PI ucb'), ('UCB', 'UCB1')])
+def test_no_state_shared_between_repetitions(name, label):
+    task = pickle.loads(pickle.dumps(Task(name, label, configuration(T = T, k = 4))))
+    fresh = _state(task.policy())
+    environment, policy = task.environment(), task.policy()
+    assert environment is not task.environment() and policy is not task.policy()
+    first = environment.play(policy, T, 1)
+    assert _state(policy) != fresh # Played
+    assert _state(task.policy()) == fresh
+
+    # Repetitions played one after the other by the same worker: each as if it were the first
+    results = [task.environment().play(task.policy(), T, rep) for rep in (0, 1, 0, 1)]
+    for one, again in ((results[0], results[2]), (results[1], results[3]), (first, results[1])):
+        assert np.array_equal(one.choices, again.choices)
+        assert np.array_equal(one.rewards, again.rewards)